@@ -1,8 +1,4 @@
 import streamlit as st
-from ui.upload_section import render_upload_section
-from ui.risk_section import render_risk_section
-from ui.summary_section import render_summary_section
-from ui.dashboard import render_dashboard_section
 import sys
 import os
 sys.path.append(os.path.dirname(__file__))
@@ -20,23 +16,34 @@ analysis_type = st.sidebar.radio(
         "Upload Contract",
         "Compliance Score",
         "Risk Analysis",
-        "Summary & Insights"
+        "Summary & Insights",
+        "Performance"
     ]
 )
 
 st.title("⚖️ AI-Powered Regulatory Compliance Checker")
 
+# Each page is imported only when it is shown, so a page never pays for
+# another page's dependencies (plotly, ReportLab, the analysis pipeline).
 if analysis_type == "Upload Contract":
+    from ui.upload_section import render_upload_section
     render_upload_section()
 
 elif analysis_type == "Risk Analysis":
+    from ui.risk_section import render_risk_section
     render_risk_section()
     
 elif analysis_type == "Summary & Insights":
+    from ui.summary_section import render_summary_section
     render_summary_section()
     
 elif analysis_type == "Integrations":
     st.info("Coming soon — Google Sheets / Slack integration.")
 
 elif analysis_type == "Compliance Score":
+    from ui.dashboard import render_dashboard_section
     render_dashboard_section()
+
+elif analysis_type == "Performance":
+    from ui.performance_section import render_performance_section
+    render_performance_section()
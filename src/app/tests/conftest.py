@@ -0,0 +1,79 @@
+# conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.dirname(APP_DIR))
+SAMPLE_CONTRACT = os.path.join(REPO_DIR, "test", "SampleContract-Shuttle.pdf")
+
+# The app imports its modules as `utils.*` from src/app, and every config dict reads the
+# environment at import time, so both are set up before any test module is collected.
+sys.path.insert(0, APP_DIR)
+_state_dir = tempfile.mkdtemp(prefix="compliance_checker_tests_")
+os.environ.update({
+    "EMBEDDING_BACKEND": "hashing",
+    "CLAUSE_CACHE_ENABLED": "false",
+    "CLAUSE_INDEX_ENABLED": "false",
+    "RESULTS_BACKEND": "sqlite",
+    "RESULTS_DB_PATH": os.path.join(_state_dir, "results.db"),
+    "JOBS_DB_PATH": os.path.join(_state_dir, "jobs.db"),
+    "JOBS_UPLOAD_DIR": os.path.join(_state_dir, "uploads"),
+    "SHEETS_SPOOL_PATH": os.path.join(_state_dir, "sheet_spool.jsonl"),
+    "GROQ_API_KEY": "test",
+    "GITHUB_PAT": "test",
+})
+
+TOPICS = [
+    "data protection personal data processor controller breach notification",
+    "payment invoices fees late interest currency net thirty days",
+    "termination notice material breach cure period insolvency",
+    "confidential information disclosure recipient obligations return destroy",
+    "indemnification claims losses third party defense settlement",
+    "governing law jurisdiction courts venue disputes arbitration",
+    "insurance coverage liability policy certificate insurer limits",
+    "intellectual property ownership license deliverables background",
+    "audit records inspection access regulators retention years",
+    "force majeure events beyond control delay suspension performance",
+]
+
+
+def clause_paragraph(topic, seed, sentences=5):
+    """A paragraph of clause-like sentences built from one topic's vocabulary."""
+    import random
+    words = topic.split()
+    rng = random.Random(seed)
+    return " ".join(
+        f"The {rng.choice(words)} {rng.choice(words)} shall apply to the {rng.choice(words)} {rng.choice(words)}."
+        for _ in range(sentences)
+    )
+
+
+@pytest.fixture
+def write_docx(tmp_path):
+    """Writes paragraphs to a .docx under tmp_path and returns its path."""
+    import docx
+
+    def write(paragraphs, name="contract.docx"):
+        document = docx.Document()
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+        path = str(tmp_path / name)
+        document.save(path)
+        return path
+    return write
+
+
+@pytest.fixture
+def contract_paragraphs():
+    return [clause_paragraph(topic, seed) for seed, topic in enumerate(TOPICS)]
+
+
+@pytest.fixture
+def mock_llm():
+    """A mock chat-completions server with every model pointed at it (see utils.benchmark)."""
+    from utils.benchmark import MockLLMServer, mock_environment
+    with MockLLMServer(latency_s=0.05, jitter=0.0) as server, mock_environment(server):
+        yield server
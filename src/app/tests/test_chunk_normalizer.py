@@ -0,0 +1,70 @@
+from utils.chunk_normalizer import TextLocator, count_tokens, normalize_chunks, page_of, with_provenance
+
+
+def _words(texts):
+    return " ".join(texts).split()
+
+
+def test_normalize_chunks_merges_small_and_splits_large():
+    small = ["Heading.", "Short fragment.", "Another short one."]
+    large = " ".join(f"Sentence number {i} describes an obligation of the supplier." for i in range(60))
+    chunks = small + [large]
+    normalized = normalize_chunks(chunks, min_tokens=20, max_tokens=120)
+
+    assert _words(normalized) == _words(chunks)
+    assert all(count_tokens(chunk) <= 120 for chunk in normalized)
+    # The three fragments end up in one request instead of three.
+    assert normalized[0].startswith("Heading. Short fragment. Another short one.")
+    assert len(normalized) < len(chunks) + large.count(". ")
+
+
+def test_normalize_chunks_drops_blank_chunks():
+    assert normalize_chunks(["  ", "A clause long enough to stand on its own as a chunk.", "\n"], 1, 100) == [
+        "A clause long enough to stand on its own as a chunk."
+    ]
+
+
+def test_text_locator_maps_collapsed_matches_to_original_offsets():
+    text = "Article 1.\n\n  The  supplier shall\tdeliver.\nArticle 2.  The buyer shall pay.\n"
+    locator = TextLocator(text)
+    first = locator.locate("Article 1. The supplier shall deliver.")
+    second = locator.locate("Article 2. The buyer shall pay.")
+
+    assert first == (0, text.index("deliver.") + len("deliver."))
+    assert text[second[0]:second[1]] == "Article 2.  The buyer shall pay."
+
+
+def test_text_locator_searches_forward_from_the_last_match():
+    text = "Fees apply. Taxes apply. Fees apply."
+    locator = TextLocator(text)
+    assert locator.locate("Fees apply.") == (0, 11)
+    assert locator.locate("Fees apply.") == (25, 36)
+    assert locator.locate("Fees apply.") is None
+
+
+def test_text_locator_prefix_fallback():
+    text = "The licensee shall keep the software confidential at all times and shall not disclose it."
+    altered = "The licensee shall keep the software confidential at all times, and never disclose it."
+    assert TextLocator(text).locate(altered, prefix_fallback=False) is None
+    start, end = TextLocator(text).locate(altered)
+    assert start == 0 and end <= len(text)
+
+
+def test_with_provenance_pages_and_offsets():
+    pages = ["Page one clause about payment terms. ", "Page two clause about termination rights. "]
+    page_starts = [0, len(pages[0])]
+    text = "".join(pages)
+    clauses = with_provenance(
+        ["Page one clause about payment terms.", "Page two clause about termination rights.", "Not in the text."],
+        text, page_starts,
+    )
+
+    assert [clause["page_start"] for clause in clauses] == [1, 2, None]
+    assert clauses[1]["char_start"] == page_starts[1]
+    assert text[clauses[0]["char_start"]:clauses[0]["char_end"]] == clauses[0]["clause"]
+    assert page_of(0, page_starts) == 1 and page_of(page_starts[1], page_starts) == 2
+
+
+def test_with_provenance_base_offset():
+    clauses = with_provenance(["Second window clause."], "Second window clause.", [0, 50], base_offset=60)
+    assert clauses[0]["char_start"] == 60 and clauses[0]["page_start"] == 2
@@ -0,0 +1,110 @@
+import json
+import sqlite3
+
+import pytest
+
+from utils import clause_cache, llm_analyzer
+from utils.clause_cache import ClauseCache, make_cache_key
+from utils.config import CACHE_CONFIG, MODEL_CONFIG
+
+ANALYSIS = {"regulation": "GDPR", "summary": "s", "risk_level": "High", "risk_percent": "80%", "key_clauses": "k"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ClauseCache(str(tmp_path / "cache.db"), max_bytes=10_000, flush_every=1000, flush_interval_s=3600)
+    yield cache
+    cache.close()
+
+
+def _on_disk(path, sql):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_cache_key_ignores_whitespace_but_not_model_or_prompt_version():
+    key = make_cache_key("structured", "model-a", "v1", "The processor shall  notify\nthe controller.")
+    assert key == make_cache_key("structured", "model-a", "v1", " The processor shall notify the controller. ")
+    assert key != make_cache_key("structured", "model-b", "v1", "The processor shall notify the controller.")
+    assert key != make_cache_key("structured", "model-a", "v2", "The processor shall notify the controller.")
+
+
+def test_get_returns_what_put_stored(cache):
+    assert cache.get("structured", "model-a", "v1", "clause") is None
+    cache.put("structured", "model-a", "v1", "clause", ANALYSIS)
+    assert cache.get("structured", "model-a", "v1", "  clause ") == ANALYSIS
+    assert cache.get("structured", "model-a", "v2", "clause") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lookups_are_counted_in_memory_until_flushed(cache):
+    cache.put("structured", "model-a", "v1", "clause", ANALYSIS)
+    for _ in range(5):
+        cache.get("structured", "model-a", "v1", "clause")
+    cache.get("structured", "model-a", "v1", "other clause")
+    assert _on_disk(cache.path, "SELECT value FROM cache_counters ORDER BY name") == [(0,), (0,)]
+
+    stats = cache.stats()
+    assert (stats["total_hits"], stats["total_misses"]) == (5, 1)
+    assert _on_disk(cache.path, "SELECT name, value FROM cache_counters ORDER BY name") == [("hits", 5), ("misses", 1)]
+
+
+def test_close_writes_pending_counters(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ClauseCache(path, max_bytes=10_000, flush_every=1000, flush_interval_s=3600)
+    cache.get("structured", "model-a", "v1", "clause")
+    cache.close()
+    reopened = ClauseCache(path, max_bytes=10_000)
+    assert reopened.stats()["total_misses"] == 1
+    reopened.close()
+
+
+def test_flush_every_lookups(tmp_path):
+    cache = ClauseCache(str(tmp_path / "cache.db"), max_bytes=10_000, flush_every=3, flush_interval_s=3600)
+    for _ in range(3):
+        cache.get("structured", "model-a", "v1", "clause")
+    assert _on_disk(cache.path, "SELECT value FROM cache_counters WHERE name = 'misses'") == [(3,)]
+    cache.close()
+
+
+def test_eviction_drops_least_recently_used_entries(tmp_path):
+    entry_size = len(json.dumps(ANALYSIS))
+    cache = ClauseCache(str(tmp_path / "cache.db"), max_bytes=int(entry_size * 3.5), flush_every=1000)
+    for name in ("a", "b", "c"):
+        cache.put("structured", "model-a", "v1", name, ANALYSIS)
+    # Reading "a" makes "b" the least recently used entry, even though the read is not yet on disk.
+    assert cache.get("structured", "model-a", "v1", "a") == ANALYSIS
+    cache.put("structured", "model-a", "v1", "d", ANALYSIS)
+
+    assert cache.get("structured", "model-a", "v1", "b") is None
+    for name in ("a", "c", "d"):
+        assert cache.get("structured", "model-a", "v1", name) == ANALYSIS
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    cache.close()
+
+
+def test_invalidate_by_prompt_version(cache):
+    cache.put("structured", "model-a", "v1", "one", ANALYSIS)
+    cache.put("structured", "model-a", "v2", "two", ANALYSIS)
+    assert cache.invalidate(prompt_version="v1") == 1
+    assert cache.get("structured", "model-a", "v1", "one") is None
+    assert cache.get("structured", "model-a", "v2", "two") == ANALYSIS
+    assert cache.stats()["entries"] == 1
+
+
+def test_structured_analysis_is_served_from_the_cache(cache, monkeypatch):
+    monkeypatch.setitem(CACHE_CONFIG, "enabled", True)
+    monkeypatch.setattr(clause_cache, "_cache", cache)
+    config = MODEL_CONFIG["primary"]
+    replies = []
+
+    def complete(config, prompt, max_tokens, json_mode=False):
+        replies.append(prompt)
+        return ('{"regulation": "GDPR", "summary": "Breach notice.", "risk_level": "High", "risk_percent": 80, '
+                '"key_phrases": ["notify"]}')
+    monkeypatch.setattr(llm_analyzer, "_complete", complete)
+
+    first = llm_analyzer.analyze_clause_structured(config, "The processor shall notify the controller.", rewrite=False)
+    second = llm_analyzer.analyze_clause_structured(config, "The processor shall notify  the controller.", rewrite=False)
+    assert first == second and first["risk_percent"] == "80%"
+    assert len(replies) == 1
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from utils import clause_index
+from utils.clause_index import ClauseIndex, get_clause_index, index_key, salient_terms
+from utils.config import EMBEDDING_CONFIG, INDEX_CONFIG, REWRITE_CONFIG
+from utils.llm_analyzer import CLASSIFY_PROMPT_VERSION, STRUCTURED_PROMPT_VERSION
+
+ANALYSIS = {"regulation": "GDPR", "summary": "s", "risk_level": "High", "risk_percent": "80%", "key_clauses": "k"}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ClauseIndex(str(tmp_path / "index.db"), "hashing:model", "v1")
+
+
+@pytest.fixture
+def fresh_index(tmp_path, monkeypatch):
+    monkeypatch.setitem(INDEX_CONFIG, "enabled", True)
+    monkeypatch.setitem(INDEX_CONFIG, "path", str(tmp_path / "index.db"))
+    monkeypatch.setattr(clause_index, "_index", None)
+
+
+def test_search_ranks_by_cosine_similarity(index):
+    index.add([1.0, 0.0, 0.0], "first", ANALYSIS, contract="a.pdf", clause_id=1)
+    index.add([0.0, 1.0, 0.0], "second", ANALYSIS, contract="a.pdf", clause_id=2)
+    (hits,) = index.search([[0.9, 0.1, 0.0]], k=2)
+    assert [entry["clause_id"] for _, entry in hits] == [1, 2]
+    assert hits[0][0] > hits[1][0]
+    assert index.search([[1.0, 0.0, 0.0]], k=5)[0][0][0] == pytest.approx(1.0)
+
+
+def test_find_matches_applies_the_threshold(index):
+    index.add([1.0, 0.0], "The Supplier shall notify the Customer.", ANALYSIS, contract="a.pdf", clause_id=7)
+    close, far = index.find_matches([[1.0, 0.01], [0.0, 1.0]], threshold=0.95)
+    assert close["clause_id"] == 7 and close["analysis"] == ANALYSIS and close["similarity"] >= 0.95
+    assert far is None
+
+
+def test_differing_numbers_or_terms_are_not_reused(index):
+    clause = "The Supplier shall pay $5,000 within 30 days."
+    index.add([1.0, 0.0], clause, ANALYSIS)
+    matches = index.find_matches(
+        [[1.0, 0.0]] * 3,
+        threshold=0.9,
+        clauses=[clause, "The Supplier shall pay $50,000 within 30 days.", "The Vendor shall pay $5,000 within 30 days."],
+    )
+    assert matches[0] is not None and matches[1:] == [None, None]
+    assert index.term_mismatches == 2
+    assert salient_terms('The "Company" owes 30% to Party A.') == ({"30%"}, {"The", "Company", "Party", "A"})
+
+
+def test_entries_persist_for_the_same_key_only(tmp_path):
+    path = str(tmp_path / "index.db")
+    ClauseIndex(path, "hashing:model", "v1").add([0.6, 0.8], "clause", {**ANALYSIS, "ai_modified_clause": "x"})
+    reloaded = ClauseIndex(path, "hashing:model", "v1")
+    assert reloaded.size == 1
+    assert reloaded.search([[0.6, 0.8]])[0][0][1]["analysis"] == ANALYSIS  # the rewrite is not stored
+    assert ClauseIndex(path, "onnx:model", "v1").size == 0
+    assert ClauseIndex(path, "hashing:model", "v2").size == 0
+
+
+def test_matrix_grows_past_its_initial_capacity(index):
+    vectors = np.eye(100, dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        index.add(vector, f"clause {i}", ANALYSIS, clause_id=i)
+    assert index.size == 100
+    hits = index.search(vectors[[0, 63, 64, 99]])
+    assert [row[0][1]["clause_id"] for row in hits] == [0, 63, 64, 99]
+
+
+def test_index_is_keyed_on_the_embedding_backend(fresh_index, monkeypatch):
+    monkeypatch.setitem(EMBEDDING_CONFIG, "backend", "onnx")
+    monkeypatch.setitem(REWRITE_CONFIG, "two_phase", False)
+    index = get_clause_index()
+    assert index.model_name == f"onnx:{EMBEDDING_CONFIG['model_name']}"
+    assert index.prompt_version == STRUCTURED_PROMPT_VERSION
+    index.add([1.0, 0.0], "clause", ANALYSIS)
+
+    monkeypatch.setattr(clause_index, "_index", None)
+    monkeypatch.setitem(EMBEDDING_CONFIG, "backend", "hashing")
+    assert get_clause_index().size == 0
+
+
+def test_two_phase_keys_on_the_classification_prompt(fresh_index, monkeypatch):
+    monkeypatch.setitem(REWRITE_CONFIG, "two_phase", True)
+    assert index_key()[1] == CLASSIFY_PROMPT_VERSION
+    assert get_clause_index().prompt_version == CLASSIFY_PROMPT_VERSION
+    monkeypatch.setitem(REWRITE_CONFIG, "two_phase", False)
+    assert index_key()[1] == STRUCTURED_PROMPT_VERSION
+
+
+def test_disabled_index_is_none(monkeypatch):
+    monkeypatch.setitem(INDEX_CONFIG, "enabled", False)
+    assert get_clause_index() is None
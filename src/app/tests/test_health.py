@@ -0,0 +1,125 @@
+import asyncio
+import json
+import re
+import time
+
+import pytest
+
+from utils import contract_analyzer, health
+from utils.config import MODEL_CONFIG, MODEL_PREFERENCE_ORDER
+from utils.health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, get_breaker, healthy_model_order, wait_for_model
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(health, "_breakers", {})
+
+
+def _breaker(cooldown_s=30.0):
+    return CircuitBreaker("model", window=4, min_requests=4, failure_rate_threshold=0.5, cooldown_s=cooldown_s)
+
+
+def test_breaker_opens_at_the_failure_rate_and_probes_after_the_cooldown():
+    breaker = _breaker(cooldown_s=0.05)
+    for _ in range(2):
+        breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED  # 1 of 3: below min_requests
+    breaker.record_failure()
+    assert breaker.state == OPEN  # 2 of 4 failed
+    assert not breaker.allow_request() and not breaker.is_available()
+    assert 0.0 < breaker.available_in() <= 0.05
+
+    time.sleep(0.06)
+    assert breaker.available_in() == 0.0
+    assert breaker.allow_request() and breaker.state == HALF_OPEN
+    # Only one probe at a time.
+    assert not breaker.allow_request() and breaker.available_in() is None
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.times_opened == 2
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow_request()
+
+
+def test_released_probe_can_be_claimed_again():
+    breaker = _breaker(cooldown_s=0.0)
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.allow_request() and not breaker.allow_request()
+    breaker.release()
+    assert breaker.allow_request()
+
+
+def _open(model_name):
+    breaker = get_breaker(model_name)
+    for _ in range(breaker.min_requests):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_healthy_model_order_skips_open_circuits():
+    configured = [name for name in MODEL_PREFERENCE_ORDER if name in MODEL_CONFIG]
+    assert healthy_model_order() == configured
+    _open(configured[0])
+    assert healthy_model_order() == configured[1:]
+
+
+def test_healthy_model_order_offers_the_first_to_cool_down_when_all_are_open():
+    configured = [name for name in MODEL_PREFERENCE_ORDER if name in MODEL_CONFIG]
+    for name in reversed(configured):
+        _open(name)
+    assert healthy_model_order() == [configured[-1]]
+
+
+def test_wait_for_model_returns_when_a_cooldown_ends(monkeypatch):
+    configured = [name for name in MODEL_PREFERENCE_ORDER if name in MODEL_CONFIG]
+    for name in configured:
+        _open(name)
+        get_breaker(name).cooldown_s = 0.2
+    assert not asyncio.run(wait_for_model(time.monotonic() + 0.05))
+    started = time.monotonic()
+    assert asyncio.run(wait_for_model(time.monotonic() + 5))
+    assert time.monotonic() - started < 1
+
+
+class _BatchClient:
+    """Answers packed batch prompts, failing every request to the models in `down`."""
+
+    def __init__(self, down):
+        self.down = down
+        self.requests = []
+
+    async def complete(self, config, prompt, max_tokens, json_mode=False):
+        self.requests.append(config["model_id"])
+        if config["model_id"] in self.down:
+            raise ConnectionError("provider outage")
+        results = [
+            {"clause_id": int(clause_id), "regulation": "GDPR", "summary": "Breach notice.", "risk_level": "High",
+             "risk_percent": 80, "key_phrases": ["notify"]}
+            for clause_id in re.findall(r"\[Clause (\d+)\]", prompt)
+        ]
+        return json.dumps({"results": results})
+
+
+def test_batch_mode_records_breaker_outcomes_and_falls_through():
+    configured = [name for name in MODEL_PREFERENCE_ORDER if name in MODEL_CONFIG]
+    primary, backup = (MODEL_CONFIG[name]["model_id"] for name in configured[:2])
+    client = _BatchClient(down={primary})
+    batch = [(1, "The processor shall notify the controller of a breach."), (2, "Fees are due in 30 days.")]
+    min_requests = get_breaker(configured[0]).min_requests
+
+    for number in range(min_requests):
+        pairs, report = asyncio.run(contract_analyzer._run_clause_batch(client, number, batch))
+        assert sorted(result["clause_id"] for result, _ in pairs) == [1, 2]
+        assert report["model"] == backup and report["retried_individually"] == 0
+    assert client.requests == [primary, backup] * min_requests
+    assert get_breaker(configured[0]).state == OPEN
+    assert get_breaker(configured[1]).successes == min_requests
+
+    # Once the circuit is open, batches go straight to the backup.
+    client.requests.clear()
+    asyncio.run(contract_analyzer._run_clause_batch(client, min_requests, batch))
+    assert client.requests == [backup]
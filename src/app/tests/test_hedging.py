@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from utils import contract_analyzer, health, hedging
+from utils.config import HEDGE_CONFIG
+from utils.hedging import HedgePolicy
+
+ANALYSIS = {"regulation": "GDPR", "summary": "s", "risk_level": "High", "risk_percent": "80%", "key_clauses": "k"}
+
+
+def _policy(**overrides):
+    settings = dict(percentile=90, window=10, min_samples=5, initial_delay_s=2.0, min_delay_s=0.5,
+                    max_extra_ratio=0.1, burst=2)
+    return HedgePolicy(**{**settings, **overrides})
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    policy = _policy(initial_delay_s=0.05, min_delay_s=0.0)
+    monkeypatch.setitem(HEDGE_CONFIG, "enabled", True)
+    monkeypatch.setattr(hedging, "_policy", policy)
+    monkeypatch.setattr(health, "_breakers", {})
+    return policy
+
+
+def test_hedge_delay_follows_the_latency_percentile():
+    policy = _policy()
+    assert policy.hedge_delay("m") == 2.0  # initial_delay_s until min_samples
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        policy.record_latency("m", seconds)
+    assert policy.hedge_delay("m") == 2.0
+    policy.record_latency("m", 10.0)
+    assert policy.hedge_delay("m") == pytest.approx(6.16)
+    assert policy.hedge_delay("other") == 2.0
+
+    for _ in range(10):  # the window only keeps the newest latencies
+        policy.record_latency("m", 0.1)
+    assert policy.hedge_delay("m") == 0.5  # never below min_delay_s
+
+
+def test_hedges_are_capped_at_a_fraction_of_primaries_plus_burst():
+    policy = _policy()
+    assert policy.try_acquire() and policy.try_acquire()
+    assert not policy.try_acquire()  # only the burst before any primary requests
+    for _ in range(20):
+        policy.record_primary()
+    assert policy.try_acquire() and policy.try_acquire()
+    assert not policy.try_acquire()
+    policy.release()
+    assert policy.try_acquire()
+    assert policy.stats()["hedged_requests"] == 4 and policy.stats()["hedges_denied"] == 2
+
+
+def test_estimate_saved_uses_the_slow_tail():
+    policy = _policy()
+    for seconds in (1.0, 1.0, 5.0, 7.0):
+        policy.record_latency("m", seconds)
+    assert policy.estimate_saved("m", delay_s=2.0, elapsed_s=2.5) == pytest.approx(3.5)
+    assert policy.estimate_saved("m", delay_s=10.0, elapsed_s=2.5) == 0.0
+    assert policy.estimate_saved("m", delay_s=2.0, elapsed_s=9.0) == 0.0
+
+
+def test_outcomes_are_counted():
+    policy = _policy()
+    for _ in range(4):
+        policy.record_primary()
+    policy.try_acquire()
+    policy.record_outcome("backup", saved_s=1.25)
+    policy.record_outcome("primary")
+    policy.record_outcome(None)
+    assert policy.stats() == {
+        "primary_requests": 4, "hedged_requests": 1, "hedge_rate": 0.25, "hedges_denied": 0,
+        "backup_wins": 1, "primary_wins": 1, "estimated_saved_s": 1.25,
+    }
+
+
+def _fake_models(monkeypatch, seconds_by_model):
+    calls = []
+
+    async def analyze_with_model(client, config, clause):
+        model_name = next(name for name in seconds_by_model if config is contract_analyzer.MODEL_CONFIG[name])
+        calls.append(model_name)
+        await asyncio.sleep(seconds_by_model[model_name])
+        return dict(ANALYSIS)
+    monkeypatch.setattr(contract_analyzer, "analyze_with_model", analyze_with_model)
+    return calls
+
+
+def test_slow_primary_is_hedged_to_the_backup(policy, monkeypatch):
+    calls = _fake_models(monkeypatch, {"primary": 5.0, "groq_fallback_1": 0.01})
+    model_name, analysis = asyncio.run(
+        contract_analyzer._analyze_hedged(None, "clause", 1, "primary", ["groq_fallback_1"], tried := set())
+    )
+    assert (model_name, analysis) == ("groq_fallback_1", ANALYSIS)
+    assert calls == ["primary", "groq_fallback_1"] and tried == {"primary", "groq_fallback_1"}
+    assert policy.stats()["backup_wins"] == 1
+
+
+def test_fast_primary_is_not_hedged(policy, monkeypatch):
+    calls = _fake_models(monkeypatch, {"primary": 0.0, "groq_fallback_1": 0.0})
+    model_name, _ = asyncio.run(
+        contract_analyzer._analyze_hedged(None, "clause", 1, "primary", ["groq_fallback_1"], set())
+    )
+    assert model_name == "primary" and calls == ["primary"]
+    assert policy.stats()["hedged_requests"] == 0 and policy.stats()["primary_requests"] == 1
@@ -0,0 +1,107 @@
+import os
+import socket
+import time
+
+import pytest
+
+from conftest import SAMPLE_CONTRACT
+from utils.benchmark import MockLLMServer, mock_environment
+from utils.config import LLM_CLIENT_CONFIG
+from utils.contract_analyzer import needs_rewrite
+from utils.job_queue import JobQueue, JobStore
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return JobQueue(store=JobStore(str(tmp_path / "jobs.db")), workers=1, upload_dir=str(tmp_path / "uploads"))
+
+
+def _analyzed_at(store, job_id):
+    return {
+        row["clause_id"]: row["analyzed_at"]
+        for row in store._query("SELECT clause_id, analyzed_at FROM job_clauses WHERE job_id = ?", (job_id,))
+        if row["analyzed_at"] is not None
+    }
+
+
+def test_job_cancel_and_resume_from_checkpoints(jobs, monkeypatch):
+    # Two requests at a time, so the job is still running when it is cancelled.
+    monkeypatch.setitem(LLM_CLIENT_CONFIG, "max_concurrency", 2)
+    with MockLLMServer(latency_s=0.2, jitter=0.0) as server, mock_environment(server):
+        job_id = jobs.submit(os.path.basename(SAMPLE_CONTRACT), file_path=SAMPLE_CONTRACT)
+        deadline = time.monotonic() + 60
+        while jobs.status(job_id)["analyzed"] < 3:
+            assert time.monotonic() < deadline, "no clause was checkpointed"
+            time.sleep(0.05)
+        assert jobs.cancel(job_id)
+        cancelled = jobs.wait(job_id, timeout=60)
+        assert cancelled["state"] == "cancelled"
+        assert cancelled["pending"] or not cancelled["chunked"]
+        checkpointed = _analyzed_at(jobs.store, job_id)
+        assert len(checkpointed) == cancelled["analyzed"] >= 3
+        # Checkpoints cut off before their rewrite get it (and a new timestamp) on resume.
+        unrewritten = {result["clause_id"] for result in jobs.results(job_id) if needs_rewrite(result)}
+
+        assert jobs.resume(job_id)
+        finished = jobs.wait(job_id, timeout=120)
+
+    assert finished["state"] == "completed"
+    assert finished["chunked"] and finished["pending"] == 0
+    assert finished["analyzed"] == finished["total"]
+    # Clauses saved before the cancel were neither re-analyzed nor renumbered.
+    resumed = _analyzed_at(jobs.store, job_id)
+    for clause_id, analyzed_at in checkpointed.items():
+        assert clause_id in unrewritten or resumed[clause_id] == analyzed_at
+    results = jobs.results(job_id)
+    assert not any(needs_rewrite(result) for result in results)
+    assert len({result["clause_id"] for result in results}) == len(results) == finished["total"]
+    # The streamed upload is only dropped once the whole contract has been chunked.
+    assert not os.path.exists(finished["file_path"])
+
+
+def test_resume_refuses_active_or_unknown_jobs(jobs):
+    assert not jobs.resume("does-not-exist")
+    job_id = jobs.store.create_job("contract.pdf", "/nonexistent.pdf", False)
+    jobs.store.update_job(job_id, state="running")
+    assert not jobs.resume(job_id)
+
+
+def test_revision_job_carries_unchanged_clauses_forward(jobs, mock_llm, write_docx, contract_paragraphs):
+    base = write_docx(contract_paragraphs, "base.docx")
+    edited = list(contract_paragraphs)
+    edited[3] = edited[3].replace("shall", "must")
+    edited_path = write_docx(edited, "edited.docx")
+
+    first = jobs.wait(jobs.submit("base.docx", file_path=base), timeout=60)
+    assert first["state"] == "completed"
+    requests_before = mock_llm.stats["requests"]
+
+    second = jobs.wait(jobs.submit("base.docx", file_path=edited_path, prior_job_id=first["job_id"]), timeout=60)
+    assert second["state"] == "completed"
+    assert second["revision"]["unchanged"] >= 1
+    assert second["revision"]["modified"] + second["revision"]["added"] >= 1
+    results = jobs.results(second["job_id"])
+    carried = [result for result in results if result["revision_status"] == "unchanged"]
+    assert carried and all(result["prior_clause_id"] is not None for result in carried)
+    # Only the clauses that changed (and their rewrites) went to the LLM.
+    assert mock_llm.stats["requests"] - requests_before < first["total"]
+
+
+def test_interrupt_stale_spares_live_owners(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    host = socket.gethostname()
+    live = store.create_job("live.pdf", None, False, owner=f"{host}:{os.getpid()}:live")
+    dead = store.create_job("dead.pdf", None, False, owner=f"{host}:999999999:dead")
+    silent = store.create_job("silent.pdf", None, False, owner="elsewhere:1:silent")
+    legacy = store.create_job("legacy.pdf", None, False)
+    store._execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (time.time() - 3600, silent))
+
+    assert store.interrupt_stale(f"{host}:{os.getpid()}:me", stale_after_s=60) == 3
+    states = {job["job_id"]: job["state"] for job in store.jobs()}
+    assert states[live] == "queued"
+    assert states[dead] == states[silent] == states[legacy] == "interrupted"
+
+    # A heartbeat keeps an owner's jobs fresh for other processes.
+    store._execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (time.time() - 3600, live))
+    store.heartbeat(f"{host}:{os.getpid()}:live")
+    assert store.interrupt_stale("elsewhere:2:other", stale_after_s=60) == 0
@@ -0,0 +1,141 @@
+import json
+
+import pytest
+
+from utils.llm_analyzer import (
+    ANALYSIS_SCHEMA, CLASSIFICATION_SCHEMA, StructuredOutputError, _batch_prompt, _parse_batch_reply,
+    pack_clause_batches, parse_structured_analysis, validate_analysis,
+)
+from utils.scheduler import estimate_tokens
+
+REPLY = {
+    "regulation": "gdpr", "summary": " Requires breach notice. ", "risk_level": "high", "risk_percent": "85%",
+    "key_phrases": ["notify the controller", " 72 hours "], "ai_modified_clause": " Safer clause. ",
+    "ai_modified_risk_level": "LOW",
+}
+
+
+def test_validate_analysis_normalizes_values():
+    assert validate_analysis(REPLY) == {
+        "regulation": "GDPR",
+        "summary": "Requires breach notice.",
+        "risk_level": "High",
+        "risk_percent": "85%",
+        "key_clauses": "notify the controller, 72 hours",
+        "ai_modified_clause": "Safer clause.",
+        "ai_modified_risk_level": "Low",
+    }
+
+
+@pytest.mark.parametrize("regulation, expected", [
+    (["GDPR", "HIPAA"], "GDPR, HIPAA"),
+    ("GDPR/HIPAA", "GDPR, HIPAA"),
+    ("gdpr, GDPR", "GDPR"),
+])
+def test_validate_analysis_accepts_several_regulations(regulation, expected):
+    assert validate_analysis({**REPLY, "regulation": regulation})["regulation"] == expected
+
+
+def test_validate_analysis_accepts_numeric_and_comma_separated_fields():
+    analysis = validate_analysis({**REPLY, "risk_percent": 42.7, "key_phrases": "a, b"})
+    assert analysis["risk_percent"] == "42%" and analysis["key_clauses"] == "a, b"
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"risk_level": "Severe"}, "risk_level"),
+    ({"regulation": "SOX"}, "regulation"),
+    ({"regulation": ""}, "regulation"),
+    ({"risk_percent": 140}, "out of range"),
+    ({"risk_percent": "high"}, "not a number"),
+    ({"summary": "  "}, "summary"),
+    ({"key_phrases": {"a": 1}}, "key_phrases"),
+    ({"ai_modified_clause": None}, "ai_modified_clause"),
+    ({"ai_modified_risk_level": "Unknown"}, "ai_modified_risk_level"),
+])
+def test_validate_analysis_rejects_invalid_fields(change, message):
+    with pytest.raises(StructuredOutputError, match=message):
+        validate_analysis({**REPLY, **change})
+
+
+def test_validate_analysis_reports_missing_fields():
+    reply = {key: value for key, value in REPLY.items() if key not in ("summary", "risk_level")}
+    with pytest.raises(StructuredOutputError, match="Missing fields: summary, risk_level"):
+        validate_analysis(reply)
+
+
+def test_classification_schema_leaves_the_rewrite_empty():
+    reply = {key: value for key, value in REPLY.items() if not key.startswith("ai_modified_")}
+    analysis = validate_analysis(reply, CLASSIFICATION_SCHEMA)
+    assert analysis["ai_modified_clause"] is None and analysis["ai_modified_risk_level"] is None
+    with pytest.raises(StructuredOutputError, match="ai_modified_clause"):
+        validate_analysis(reply, ANALYSIS_SCHEMA)
+
+
+def test_parse_structured_analysis_unwraps_fenced_json():
+    reply = 'Here is the analysis:\n```json\n{"regulation": "None", "summary": "Boilerplate.", ' \
+            '"risk_level": "Low", "risk_percent": 5, "key_phrases": []}\n```'
+    assert parse_structured_analysis(reply, CLASSIFICATION_SCHEMA)["risk_level"] == "Low"
+
+
+@pytest.mark.parametrize("reply", ["Risk: High", '{"regulation": "GDPR",}', "[]"])
+def test_parse_structured_analysis_rejects_non_json(reply):
+    with pytest.raises(StructuredOutputError):
+        parse_structured_analysis(reply)
+
+
+BUDGET = {"model_id": "test-model", "batch_max_input_tokens": 1200, "batch_max_output_tokens": 900}
+
+
+def _clauses(count, words=40):
+    return [(i, " ".join(f"obligation{i}-{w}" for w in range(words))) for i in range(1, count + 1)]
+
+
+def test_pack_clause_batches_respects_both_token_budgets():
+    items = _clauses(12)
+    batches = pack_clause_batches(items, BUDGET)
+    assert [pair for batch in batches for pair in batch] == items
+    assert len(batches) > 1
+    for batch in batches:
+        prompt, max_tokens = _batch_prompt(BUDGET, batch)
+        assert len(batch) == 1 or estimate_tokens(prompt) <= BUDGET["batch_max_input_tokens"]
+        assert max_tokens <= BUDGET["batch_max_output_tokens"]
+
+
+def test_pack_clause_batches_fits_more_clauses_without_the_rewrite():
+    items = _clauses(12)
+    assert len(pack_clause_batches(items, BUDGET, rewrite=False)) < len(pack_clause_batches(items, BUDGET))
+
+
+def test_oversized_clause_gets_a_batch_of_its_own():
+    items = [(1, "short clause"), (2, "word " * 5000), (3, "another short clause")]
+    assert pack_clause_batches(items, BUDGET) == [[items[0]], [items[1]], [items[2]]]
+
+
+def _entry(clause_id, **fields):
+    return {"clause_id": clause_id, "regulation": "GDPR", "summary": "Notice.", "risk_level": "High",
+            "risk_percent": 70, "key_phrases": ["notify"], **fields}
+
+
+def test_parse_batch_reply_keeps_valid_entries_only():
+    pending = [(1, "first clause"), (2, "second clause"), (3, "third clause")]
+    reply = json.dumps({"results": [
+        _entry("1"),
+        _entry(2, risk_level="Catastrophic"),  # invalid: retried on its own by the caller
+        _entry(9),  # not one of the clauses sent
+        {"summary": "no id"},
+    ]})
+    analyses = _parse_batch_reply(BUDGET, reply, pending, rewrite=False)
+    assert list(analyses) == [1]
+    assert analyses[1]["risk_percent"] == "70%" and analyses[1]["ai_modified_clause"] is None
+
+
+def test_parse_batch_reply_requires_a_results_list():
+    with pytest.raises(StructuredOutputError, match="results"):
+        _parse_batch_reply(BUDGET, '{"analyses": []}', [(1, "clause")], rewrite=False)
+
+
+def test_batch_prompt_labels_every_clause():
+    pending = [(4, "first clause"), (7, "second clause")]
+    prompt, _ = _batch_prompt(BUDGET, pending, rewrite=False)
+    assert "[Clause 4]\nfirst clause" in prompt and "[Clause 7]\nsecond clause" in prompt
+    assert "ai_modified_clause" not in prompt
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+
+from onnx import TensorProto, helper, numpy_helper  # noqa: E402
+from tokenizers import Tokenizer, models, pre_tokenizers  # noqa: E402
+
+from utils.embedding_service import OnnxEmbeddings, ResidentEmbeddings  # noqa: E402
+
+WORDS = ["[PAD]", "[UNK]", "the", "supplier", "shall", "notify", "customer", "of", "any", "data", "breach", "within",
+         "days", "personal", "is", "processed"]
+DIM = 8
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """A one-layer ONNX "encoder" (an embedding lookup) and a word-level tokenizer.json."""
+    table = np.random.default_rng(7).normal(size=(len(WORDS), DIM)).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "embedding_lookup",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "sequence"]),
+         helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "sequence"])],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "sequence", DIM])],
+        [numpy_helper.from_array(table, "table")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(tmp_path / "model.onnx"))
+
+    tokenizer = Tokenizer(models.WordLevel({word: i for i, word in enumerate(WORDS)}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    return tmp_path, table
+
+
+def _reference(table, text):
+    ids = [WORDS.index(word) if word in WORDS else 1 for word in text.split()]
+    pooled = table[ids].mean(axis=0)
+    return pooled / np.linalg.norm(pooled)
+
+
+TEXTS = [
+    "the supplier shall notify the customer of any personal data breach within days",
+    "data",
+    "personal data is processed",
+    "the customer shall notify the supplier",
+    "breach",
+]
+
+
+def test_onnx_embeddings_match_mean_pooling(model_dir):
+    path, table = model_dir
+    embeddings = OnnxEmbeddings("tiny", "model.onnx", onnx_path=str(path), batch_size=2)
+    vectors = embeddings.embed_documents(TEXTS)
+    # Texts are batched by length but come back in the order given, unaffected by padding.
+    for text, vector in zip(TEXTS, vectors):
+        np.testing.assert_allclose(vector, _reference(table, text), atol=1e-5)
+    np.testing.assert_allclose(embeddings.embed_query(TEXTS[2]), vectors[2], atol=1e-6)
+
+
+def test_resident_service_loads_the_onnx_backend_once(model_dir):
+    path, table = model_dir
+    service = ResidentEmbeddings("tiny", backend="onnx", onnx_file="model.onnx", onnx_path=str(path), batch_size=4)
+    assert not service.is_loaded and service.embed_documents([]) == []
+    vectors = service.embed_documents(TEXTS[:3])
+    model = service._model
+    assert isinstance(model, OnnxEmbeddings)
+    service.embed_query("unknown words")
+    assert service._model is model
+    np.testing.assert_allclose(vectors[1], _reference(table, "data"), atol=1e-5)
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from utils import report_cache
+from utils.report_cache import ReportCache, report_key
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Replaces the CSV builder with a fast one that counts its calls and can be held back."""
+    calls = []
+    release = threading.Event()
+    release.set()
+
+    def build(df):
+        release.wait(5)
+        calls.append(len(df))
+        return f"report of {len(df)} rows".encode()
+    monkeypatch.setitem(report_cache.REPORT_FORMATS, "csv", (build, "text/csv", "report.csv"))
+    return calls, release
+
+
+def _frame(rows):
+    return pd.DataFrame({
+        "clause_id": range(rows), "risk_level": ["High"] * rows, "clause": ["c"] * rows,
+        "AI-Modified Clause": ["m"] * rows, "AI-Modified Risk Level": ["Low"] * rows,
+    })
+
+
+def _wait_for(cache, key, state):
+    deadline = time.monotonic() + 5
+    while cache.status(key, "csv")["state"] != state:
+        assert time.monotonic() < deadline, f"report never became {state}"
+        time.sleep(0.01)
+
+
+def test_report_key_ignores_the_index():
+    df = _frame(3)
+    assert report_key(df) == report_key(df.set_axis([7, 8, 9]))
+    assert report_key(df) != report_key(_frame(4))
+
+
+def test_get_or_build_caches_and_evicts_least_recently_used(builds):
+    calls, _ = builds
+    cache = ReportCache(max_entries=2, workers=1)
+    frames = {key: _frame(rows) for key, rows in (("a", 1), ("b", 2), ("c", 3))}
+
+    cache.get_or_build("a", "csv", frames["a"])
+    cache.get_or_build("b", "csv", frames["b"])
+    cache.get_or_build("a", "csv", frames["a"])  # cached; "a" becomes the most recently used
+    cache.get_or_build("c", "csv", frames["c"])  # evicts "b"
+
+    assert calls == [1, 2, 3]
+    assert cache.get("a", "csv") == b"report of 1 rows"
+    assert cache.get("b", "csv") is None
+
+
+def test_background_build_reports_progress_and_readiness(builds):
+    _, release = builds
+    cache = ReportCache(max_entries=2, workers=1)
+    release.clear()
+    cache.request("a", "csv", _frame(1))
+    assert cache.status("a", "csv")["state"] == "building"
+    cache.request("a", "csv", _frame(1))  # already building; not queued twice
+    release.set()
+    _wait_for(cache, "a", "ready")
+    assert cache.get("a", "csv") == b"report of 1 rows"
+
+
+def test_evicted_report_is_missing_until_requested_again(builds):
+    calls, _ = builds
+    cache = ReportCache(max_entries=1, workers=1)
+    cache.request("a", "csv", _frame(1))
+    _wait_for(cache, "a", "ready")
+    cache.request("b", "csv", _frame(2))
+    _wait_for(cache, "b", "ready")
+
+    assert cache.status("a", "csv") == {"state": "missing", "progress": 0.0, "error": None}
+    cache.request("a", "csv", _frame(1))
+    _wait_for(cache, "a", "ready")
+    assert calls == [1, 2, 1]
+
+
+def test_failed_build_is_reported(monkeypatch):
+    def fail(df):
+        raise RuntimeError("no fonts")
+    monkeypatch.setitem(report_cache.REPORT_FORMATS, "csv", (fail, "text/csv", "report.csv"))
+    cache = ReportCache(max_entries=1, workers=1)
+    cache.request("a", "csv", _frame(1))
+    _wait_for(cache, "a", "failed")
+    assert cache.status("a", "csv")["error"] == "no fonts"
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from utils.config import RESULTS_CONFIG
+from utils.result_store import FanOutSink, ResultStore, open_result_sink, resolve_backend
+from utils.sheet_writer import FakeWorksheet, SheetSink
+
+
+def _result(clause_id, risk_level="High", risk_percent="80%", regulation="GDPR", **fields):
+    return {"clause_id": clause_id, "clause": f"clause {clause_id}", "regulation": regulation, "key_clauses": "k",
+            "risk_level": risk_level, "risk_percent": risk_percent, "summary": "s", **fields}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results.db"))
+
+
+def test_stores_sharing_a_database_never_hand_out_the_same_ids(tmp_path):
+    # Each store stands for a batch or job worker process with its own connection.
+    path = str(tmp_path / "results.db")
+    stores = [ResultStore(path) for _ in range(4)]
+    starts = []
+
+    def allocate(store):
+        for _ in range(50):
+            starts.append(store.allocate_ids(3))
+    threads = [threading.Thread(target=allocate, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [start + offset for start in starts for offset in range(3)]
+    assert len(ids) == len(set(ids)) == 600
+    assert sorted(ids) == list(range(1, 601))
+
+
+def test_ids_continue_after_rows_already_stored(store):
+    store.insert_results("a.pdf", "run", [_result(41), _result(42)])
+    assert store.allocate_ids(2) == 43
+    assert ResultStore(store.path).allocate_ids() == 45
+
+
+def test_history_and_reports(store):
+    store.insert_results("a.pdf", "run-1", [_result(1), _result(2, "Low", "10%", "None")])
+    store.insert_results("b.pdf", "run-2", [_result(3, "Medium", "50%")])
+
+    assert {row["clause_id"] for row in store.history(contract="a.pdf")} == {1, 2}
+    assert [row["clause_id"] for row in store.history(risk_level="Medium")] == [3]
+    assert store.history(contract="a.pdf", regulation="GDPR")[0]["risk_percent"] == 80.0
+    report = {row["contract"]: row for row in store.risk_report()}
+    assert (report["a.pdf"]["high"], report["a.pdf"]["low"], report["a.pdf"]["avg_risk_percent"]) == (1, 1, 45.0)
+    assert {row["regulation"]: row["clauses"] for row in store.regulation_report()} == {"GDPR": 2, "None": 1}
+
+
+def test_latest_only_returns_the_newest_run(store):
+    store.insert_results("a.pdf", "run-1", [_result(1)])
+    store.insert_results("a.pdf", "run-2", [_result(2)])
+    assert [row["clause_id"] for row in store.history(contract="a.pdf", latest_only=True)] == [2]
+
+
+def test_update_rewrites(store):
+    store.insert_results("a.pdf", "run", [_result(1)])
+    store.update_rewrites([{"contract": "a.pdf", "clause_id": 1, "AI-Modified Clause": "safer",
+                            "AI-Modified Risk Level": "Low"}])
+    row = store.history(contract="a.pdf")[0]
+    assert (row["ai_modified_clause"], row["ai_modified_risk_level"]) == ("safer", "Low")
+
+
+def test_writer_inserts_in_batches(store):
+    with store.writer("a.pdf") as writer:
+        writer.batch_size = 2
+        for clause_id in range(1, 4):
+            writer.write(_result(clause_id), None)
+        assert len(store.history()) == 2
+    assert len(store.history()) == 3 and writer.rows_written == 3
+
+
+def test_an_explicit_worksheet_always_receives_results(monkeypatch):
+    monkeypatch.setitem(RESULTS_CONFIG, "backend", "sqlite")
+    assert resolve_backend(wks=FakeWorksheet()) == "sheets"
+    assert resolve_backend("both", wks=FakeWorksheet()) == "both"
+    assert resolve_backend() == "sqlite"
+
+
+def test_auto_backend_depends_on_sheet_credentials(tmp_path, monkeypatch):
+    monkeypatch.delenv("GOOGLE_SHEET_API_CRED", raising=False)
+    assert resolve_backend("auto") == "sqlite"
+    creds = tmp_path / "creds.json"
+    creds.write_text("{}")
+    monkeypatch.setenv("GOOGLE_SHEET_API_CRED", str(creds))
+    assert resolve_backend("auto") == "sheets"
+
+
+def test_open_result_sink_fans_out_to_both_backends():
+    sink = open_result_sink("a.pdf", wks=FakeWorksheet(), backend="both")
+    assert isinstance(sink, FanOutSink) and isinstance(sink.sinks[0], SheetSink)
+    sink.close()
+    with pytest.raises(ValueError):
+        open_result_sink("a.pdf", backend="postgres")
@@ -0,0 +1,74 @@
+from utils.clause_cache import normalize_clause
+from utils.data_handler import chunk_document, read_document
+from utils.revision import align_clauses, chunk_revision
+
+from conftest import clause_paragraph
+
+
+def _prior_results(clauses):
+    return [
+        {"clause_id": 100 + i, "clause": clause, "risk_level": "Medium", "risk_percent": "50%", "summary": "s"}
+        for i, clause in enumerate(clauses)
+    ]
+
+
+def test_align_clauses_statuses():
+    prior = _prior_results([
+        "The processor shall notify the controller of any personal data breach within 72 hours.",
+        "Invoices are payable within thirty days of receipt by the customer.",
+        "Either party may terminate this agreement on ninety days written notice.",
+    ])
+    clauses = [
+        # Same text, different whitespace.
+        "The processor shall notify the controller of any\n personal data breach within 72 hours.",
+        "Invoices are payable within sixty days of receipt by the customer.",
+        "The supplier warrants that the goods are free from defects in materials.",
+    ]
+    matches, removed = align_clauses(clauses, prior, match_threshold=0.6)
+
+    assert [status for status, _, _ in matches] == ["unchanged", "modified", "added"]
+    assert matches[0][1]["clause_id"] == 100 and matches[0][2] == 1.0
+    assert matches[1][1]["clause_id"] == 101 and 0.6 <= matches[1][2] < 1.0
+    assert matches[2][1] is None
+    assert [result["clause_id"] for result in removed] == [102]
+
+
+def test_align_clauses_matches_each_prior_clause_once():
+    prior = _prior_results(["Duplicate clause text about confidentiality obligations."])
+    clauses = ["Duplicate clause text about confidentiality obligations."] * 2
+    matches, removed = align_clauses(clauses, prior, match_threshold=0.6)
+    assert [status for status, _, _ in matches] == ["unchanged", "added"]
+    assert removed == []
+
+
+def test_chunk_revision_of_edited_document(write_docx, contract_paragraphs):
+    base_path = write_docx(contract_paragraphs, "base.docx")
+    prior = _prior_results([clause["clause"] for clause in chunk_document(base_path)])
+
+    edited = list(contract_paragraphs)
+    edited[3] = edited[3].replace("shall", "must", 2)
+    edited.insert(6, clause_paragraph("warranty merchantability fitness purpose disclaimer", 99))
+    del edited[9]
+    edited_path = write_docx(edited, "edited.docx")
+    clauses, carried, summary = chunk_revision(edited_path, prior, "base.docx")
+    text, _ = read_document(edited_path)
+
+    assert summary["prior"] == "base.docx"
+    assert summary["unchanged"] + summary["modified"] + summary["added"] == len(clauses)
+    assert summary["unchanged"] >= 1 and summary["modified"] + summary["added"] >= 1
+    # Every prior clause still present verbatim is carried forward, not re-chunked.
+    verbatim = {result["clause_id"] for result in prior if normalize_clause(result["clause"]) in normalize_clause(text)}
+    assert {result["clause_id"] for result in carried.values()} == verbatim
+    for i, result in carried.items():
+        assert clauses[i]["revision_status"] == "unchanged"
+        assert normalize_clause(clauses[i]["clause"]) == normalize_clause(result["clause"])
+    # Offsets point at the clause text in the edited document, in order.
+    starts = [clause["char_start"] for clause in clauses]
+    assert starts == sorted(starts)
+    for clause in clauses:
+        assert normalize_clause(text[clause["char_start"]:clause["char_end"]]) == normalize_clause(clause["clause"])
+    # Removed or rewritten prior clauses are reported either as removed or as the prior side of a modification.
+    matched = {clause["prior_clause_id"] for clause in clauses if clause["prior_clause_id"] is not None}
+    removed = {result["clause_id"] for result in summary["removed"]}
+    assert matched | removed == {result["clause_id"] for result in prior}
+    assert not matched & removed
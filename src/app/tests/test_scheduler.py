@@ -0,0 +1,125 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+
+from utils import scheduler
+from utils.benchmark import MockLLMServer, mock_environment
+from utils.config import MODEL_CONFIG, SCHEDULER_CONFIG
+from utils.llm_client import AsyncLLMClient
+from utils.scheduler import ModelLane, RateLimitScheduler, TokenBucket, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    return clock
+
+
+def test_token_bucket_waits_out_its_debt_in_order(clock):
+    bucket = TokenBucket(per_minute=60)  # one token a second
+    assert bucket.reserve(59) == 0.0
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(2) == pytest.approx(3.0)  # queued behind the previous reservation
+    clock.now += 3.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_token_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(60)
+    clock.now += 600
+    assert bucket.reserve(60) == 0.0
+    # A request larger than the bucket only waits for a full bucket.
+    assert bucket.reserve(500) == pytest.approx(60.0)
+
+
+def test_parse_retry_after(clock):
+    assert parse_retry_after({"retry-after": "2.5"}, default=5.0) == 2.5
+    assert parse_retry_after({}, default=5.0) == 5.0
+    assert parse_retry_after({"retry-after": "soon"}, default=5.0) == 5.0
+    clock.now = time.time()
+    http_date = formatdate(clock.now + 30, usegmt=True)
+    assert parse_retry_after({"retry-after": http_date}, default=5.0) == pytest.approx(30, abs=1)
+
+
+def test_lane_grows_additively_and_halves_on_throttle(monkeypatch, clock):
+    monkeypatch.setitem(SCHEDULER_CONFIG, "initial_concurrency", 4)
+    monkeypatch.setitem(SCHEDULER_CONFIG, "max_concurrency_per_model", 6)
+    lane = ModelLane("test")
+    for _ in range(4):
+        lane.on_success()
+    assert int(lane.limit) == 4 and lane.limit > 4.8  # about one slot per window of 4 successes
+    for _ in range(40):
+        lane.on_success()
+    assert lane.limit == 6.0
+
+    lane.on_throttle(retry_after=2.0)
+    assert lane.limit == 3.0 and lane.paused_until == clock.now + 2.0
+    for _ in range(5):
+        lane.on_throttle(retry_after=1.0)
+    assert lane.limit == 1.0 and lane.throttle_events == 6
+    # A shorter Retry-After does not cut an existing pause short.
+    assert lane.paused_until == clock.now + 2.0
+
+
+def test_lane_admits_up_to_its_concurrency_limit(monkeypatch):
+    monkeypatch.setitem(SCHEDULER_CONFIG, "initial_concurrency", 2)
+    lane = ModelLane("test")
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        await lane.acquire(tokens=10)
+        peak = max(peak, lane.in_flight)
+        await asyncio.sleep(0.02)
+        lane.release()
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(6)))
+    asyncio.run(run())
+    assert peak == 2 and lane.in_flight == 0 and lane.waiting == 0
+
+
+def test_lane_waits_for_the_request_budget():
+    lane = ModelLane("test", rpm=600)  # ten requests a second
+    lane.requests.reserve(600)
+
+    async def run():
+        started = time.monotonic()
+        await lane.acquire(tokens=1)
+        lane.release()
+        return time.monotonic() - started
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_client_retries_throttled_requests_on_the_same_model(monkeypatch):
+    monkeypatch.setattr(scheduler, "_scheduler", RateLimitScheduler())
+    monkeypatch.setitem(SCHEDULER_CONFIG, "max_throttle_retries", 20)
+    with MockLLMServer(latency_s=0.0, jitter=0.0, throttle_rate=0.5, retry_after_s=0.01) as server, \
+            mock_environment(server):
+        config = MODEL_CONFIG["primary"]
+
+        async def run():
+            async with AsyncLLMClient() as client:
+                return await asyncio.gather(*(client.complete(config, "Say hi.", max_tokens=5) for _ in range(8)))
+        replies = asyncio.run(run())
+
+    assert len(replies) == 8 and all(replies)
+    stats = scheduler.get_scheduler().stats()[0]
+    assert stats["throttle_events"] == server.stats["throttled"] > 0
+    assert stats["completed"] == 8 and stats["in_flight"] == 0
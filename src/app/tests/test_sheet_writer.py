@@ -0,0 +1,97 @@
+import json
+import time
+
+import pytest
+
+from utils import sheet_writer
+from utils.config import RESULTS_CONFIG, SHEETS_CONFIG
+from utils.contract_analyzer import analyze_contract_file
+from utils.sheet_writer import SHEET_HEADER, FakeWorksheet, SheetSink
+
+
+@pytest.fixture(autouse=True)
+def fresh_id_cursors(monkeypatch):
+    monkeypatch.setattr(sheet_writer, "_id_cursors", {})
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_rows_are_flushed_in_one_write_per_batch():
+    wks = FakeWorksheet()
+    with SheetSink(wks, batch_size=3, flush_interval_s=60) as sink:
+        sink.append([[2, "b"], [1, "a"]])
+        time.sleep(0.1)
+        assert wks.rows == []  # below batch_size and within the interval
+        sink.append([[3, "c"]])
+        _wait_for(lambda: len(wks.rows) == 3)
+    assert wks.rows == [[1, "a"], [2, "b"], [3, "c"]]
+    assert wks.calls == {"append_table": 1}
+
+
+def test_rows_are_flushed_once_the_oldest_has_waited_the_interval():
+    wks = FakeWorksheet()
+    with SheetSink(wks, batch_size=100, flush_interval_s=0.1) as sink:
+        time.sleep(0.3)  # idle: the interval only starts with the first row
+        started = time.monotonic()
+        sink.append([[1, "a"]])
+        _wait_for(lambda: wks.rows)
+        assert 0.09 <= time.monotonic() - started < 1
+
+
+def test_idle_sink_does_not_poll():
+    sink = SheetSink(FakeWorksheet(), batch_size=100, flush_interval_s=0.02)
+    wakeups = []
+    wait = sink._condition.wait
+
+    def counting_wait(timeout=None):
+        wakeups.append(timeout)
+        return wait(timeout)
+    sink._condition.wait = counting_wait
+    time.sleep(0.3)
+    assert len(wakeups) <= 1
+    sink.close()
+
+
+def test_close_flushes_what_is_buffered():
+    wks = FakeWorksheet()
+    sink = SheetSink(wks, batch_size=100, flush_interval_s=60)
+    sink.write({"clause_id": 1}, [1, "a"])
+    sink.close()
+    assert wks.rows == [[1, "a"]] and sink.rows_written == 1
+    with pytest.raises(RuntimeError):
+        sink.append([[2, "b"]])
+
+
+def test_failed_writes_are_retried_then_spooled(tmp_path, monkeypatch):
+    spool = tmp_path / "spool.jsonl"
+    monkeypatch.setitem(SHEETS_CONFIG, "spool_path", str(spool))
+    monkeypatch.setitem(SHEETS_CONFIG, "retry_backoff_s", 0.0)
+    wks = FakeWorksheet(fail_rate=1.0)
+    with SheetSink(wks, batch_size=1, max_retries=2) as sink:
+        sink.append([[1, "a"]])
+    assert wks.calls["append_table"] == 3
+    assert sink.failed_rows == [[1, "a"]]
+    assert [json.loads(line)["row"] for line in spool.read_text().splitlines()] == [[1, "a"]]
+
+
+def test_ids_continue_after_the_rows_already_in_the_sheet():
+    wks = FakeWorksheet(rows=[SHEET_HEADER, [1], [2], [7]])
+    with SheetSink(wks) as first, SheetSink(wks) as second:
+        assert first.allocate_ids(3) == 8
+        assert second.allocate_ids() == 11  # cached per worksheet, not re-read
+    assert wks.calls["get_col"] == 1
+
+
+def test_analysis_rows_reach_the_worksheet(mock_llm, write_docx, contract_paragraphs, monkeypatch):
+    monkeypatch.setitem(RESULTS_CONFIG, "backend", "sheets")
+    wks = FakeWorksheet()
+    results = analyze_contract_file(write_docx(contract_paragraphs), wks=wks)
+    header, *rows = wks.rows
+    assert header == SHEET_HEADER
+    assert sorted(row[0] for row in rows) == sorted(result["clause_id"] for result in results)
+    assert all(len(row) == len(SHEET_HEADER) for row in rows)
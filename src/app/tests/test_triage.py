@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from utils import contract_analyzer
+from utils.config import TRIAGE_CONFIG
+from utils.contract_analyzer import ResultCollector, classify_locally
+from utils.triage import has_regulatory_signal, triage_reason
+
+
+@pytest.mark.parametrize("clause, reason", [
+    ("IN WITNESS WHEREOF, the parties have executed this Agreement as of the Effective Date.", "signature block"),
+    ("Acme Corporation, 100 Main Street, Suite 200, Springfield, IL 62701", "address"),
+    ("Page 3 of 12", "page furniture"),
+    ("Article 4. Payment Terms", "heading"),
+    ("CONFIDENTIALITY", None),
+    ("Either party may terminate on thirty days notice.", None),
+    ("The Supplier shall deliver within 5 days.", None),
+    ("Non-compete.", None),
+    ("Waiver of jury trial", None),
+    ("Fees: USD 10,000 per month", None),
+    ("Notices to Acme Corporation, 100 Main Street, Springfield, IL 62701 are effective on receipt, and each party "
+     "agrees to keep its notice address current for the term.", None),
+])
+def test_triage_reason(clause, reason):
+    assert triage_reason(clause) == reason
+
+
+class _EverythingIsNonRegulatory:
+    def __init__(self):
+        self.seen = 0
+
+    def is_non_regulatory(self, vectors):
+        self.seen += len(vectors)
+        return [True] * len(vectors)
+
+
+def test_classifier_never_sees_keyword_bearing_clauses(monkeypatch):
+    classifier = _EverythingIsNonRegulatory()
+    monkeypatch.setitem(TRIAGE_CONFIG, "classifier", True)
+    monkeypatch.setattr(contract_analyzer, "get_triage_classifier", lambda: classifier)
+    monkeypatch.setattr(contract_analyzer, "_embeddings_unavailable", None)
+    clauses = [
+        (1, "Personal data is processed in line with the GDPR."),
+        (2, "The parties meet once a quarter to review the roadmap."),
+        (3, "The Supplier shall keep the records for seven years."),
+        (4, "Each party bears its own costs of negotiating this agreement."),
+    ]
+    collector = ResultCollector()
+    remaining = asyncio.run(classify_locally(clauses, collector))
+
+    assert remaining == [clauses[0], clauses[2]]
+    assert classifier.seen == 2
+    assert sorted(result["clause_id"] for result, _ in collector.pairs) == [2, 4]
+    assert has_regulatory_signal(clauses[0][1]) and not has_regulatory_signal(clauses[1][1])
@@ -0,0 +1,126 @@
+import pytest
+
+from utils import mock_llm as mock_llm_module
+from utils.config import RESULTS_CONFIG, REWRITE_CONFIG
+from utils.contract_analyzer import analyze_contract_file, needs_rewrite, rewrite_results
+from utils.llm_analyzer import _parse_rewrite, _structured_max_tokens, _structured_prompt
+from utils.result_store import save_rewrites
+from utils.sheet_writer import SHEET_HEADER, FakeWorksheet, update_sheet_rewrites
+
+REWRITE_PROMPT = "The following contract clause has been assessed as"
+
+
+@pytest.fixture(autouse=True)
+def both_backends(monkeypatch):
+    """Results go to the worksheet and the local store, as with RESULTS_BACKEND=both."""
+    monkeypatch.setitem(RESULTS_CONFIG, "backend", "both")
+    monkeypatch.setitem(REWRITE_CONFIG, "two_phase", True)
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Every prompt the mock server answers."""
+    seen = []
+    reply = mock_llm_module.mock_reply
+
+    def recording_reply(prompt):
+        seen.append(prompt)
+        return reply(prompt)
+    monkeypatch.setattr(mock_llm_module, "mock_reply", recording_reply)
+    return seen
+
+
+def _sheet_rows(wks):
+    header, *rows = wks.get_all_values()
+    return header, {str(row[0]): dict(zip(SHEET_HEADER, row)) for row in rows}
+
+
+def test_classification_prompt_leaves_the_rewrite_out(monkeypatch):
+    monkeypatch.setitem(REWRITE_CONFIG, "classify_max_tokens", 250)
+    assert "ai_modified_clause" in _structured_prompt("clause", rewrite=True)
+    assert "ai_modified_clause" not in _structured_prompt("clause", rewrite=False)
+    assert _structured_max_tokens(rewrite=False) == 250 < _structured_max_tokens(rewrite=True)
+
+
+def test_parse_rewrite_splits_off_the_risk_level():
+    assert _parse_rewrite("Safer clause.\nRisk Level: low") == ("Safer clause.", "Low")
+    assert _parse_rewrite("Safer clause.\n\n**Risk Level:** Medium (residual)") == ("Safer clause.", "Medium")
+    assert _parse_rewrite("  Safer clause without a level.  ") == ("Safer clause without a level.", "")
+    # Only a last line counts as the level.
+    assert _parse_rewrite("Risk level: high is reduced.\nMore text.") == ("Risk level: high is reduced.\nMore text.", "")
+
+
+def test_needs_rewrite(monkeypatch):
+    monkeypatch.setitem(REWRITE_CONFIG, "levels", ["High", "Medium"])
+    assert needs_rewrite({"risk_level": "High", "AI-Modified Clause": ""})
+    assert needs_rewrite({"risk_level": "Medium"})
+    assert not needs_rewrite({"risk_level": "Medium", "AI-Modified Clause": "safer"})
+    assert not needs_rewrite({"risk_level": "Low", "AI-Modified Clause": ""})
+    assert not needs_rewrite(None)
+
+
+def test_only_high_and_medium_clauses_are_rewritten(mock_llm, prompts, write_docx, contract_paragraphs, monkeypatch):
+    monkeypatch.setitem(REWRITE_CONFIG, "mode", "background")
+    results = analyze_contract_file(write_docx(contract_paragraphs), wks=FakeWorksheet(), batch_mode=False)
+
+    risky = [result for result in results if result["risk_level"] in ("High", "Medium")]
+    rewrites = [prompt for prompt in prompts if prompt.startswith(REWRITE_PROMPT)]
+    classifications = [prompt for prompt in prompts if "matching this JSON schema" in prompt]
+    assert risky and len(rewrites) == len(risky)
+    assert all("ai_modified_clause" not in prompt for prompt in classifications)
+    assert len(prompts) == len(rewrites) + len(classifications) == mock_llm.stats["requests"]
+    assert not any(needs_rewrite(result) for result in results)
+
+
+def test_background_rewrites_are_written_with_their_rows(mock_llm, write_docx, contract_paragraphs, monkeypatch):
+    monkeypatch.setitem(REWRITE_CONFIG, "mode", "background")
+    wks = FakeWorksheet()
+    results = analyze_contract_file(write_docx(contract_paragraphs), wks=wks)
+
+    header, rows = _sheet_rows(wks)
+    assert header == SHEET_HEADER
+    assert sorted(rows) == sorted(str(result["clause_id"]) for result in results)
+    risky = [result for result in results if result["risk_level"] in ("High", "Medium")]
+    assert risky
+    for result in risky:
+        row = rows[str(result["clause_id"])]
+        assert row["AI-Modified Clause"].startswith("Mock rewrite")
+        assert row["AI-Modified Risk Level"] == "Low"
+
+
+def test_lazy_mode_sends_no_rewrites(mock_llm, prompts, write_docx, contract_paragraphs, monkeypatch):
+    monkeypatch.setitem(REWRITE_CONFIG, "mode", "lazy")
+    results = analyze_contract_file(write_docx(contract_paragraphs), wks=FakeWorksheet())
+    assert any(needs_rewrite(result) for result in results)
+    assert not any(prompt.startswith(REWRITE_PROMPT) for prompt in prompts)
+
+
+def test_lazy_rewrites_update_existing_rows(mock_llm, write_docx, contract_paragraphs, monkeypatch):
+    monkeypatch.setitem(REWRITE_CONFIG, "mode", "lazy")
+    wks = FakeWorksheet()
+    results = analyze_contract_file(write_docx(contract_paragraphs), wks=wks)
+    pending = [result for result in results if needs_rewrite(result)]
+    assert pending
+    _, rows = _sheet_rows(wks)
+    assert all(not rows[str(result["clause_id"])]["AI-Modified Clause"] for result in pending)
+
+    rewritten = []
+    assert rewrite_results(results, on_rewrite=rewritten.append) == len(pending)
+    assert save_rewrites(rewritten, wks=wks)
+
+    _, rows = _sheet_rows(wks)
+    for result in pending:
+        row = rows[str(result["clause_id"])]
+        assert row["AI-Modified Clause"] == result["AI-Modified Clause"]
+        assert row["AI-Modified Risk Level"] == "Low"
+
+
+def test_update_sheet_rewrites_skips_unknown_clause_ids():
+    wks = FakeWorksheet(rows=[SHEET_HEADER, ["7", "clause", "GDPR", "Medium", "50%", "summary", "", ""]])
+    results = [
+        {"clause_id": 7, "AI-Modified Clause": "safer clause", "AI-Modified Risk Level": "Low"},
+        {"clause_id": 8, "AI-Modified Clause": "missing row", "AI-Modified Risk Level": "Low"},
+    ]
+    assert update_sheet_rewrites(wks, results) == 1
+    assert wks.rows[1][-2:] == ["safer clause", "Low"]
+    assert len(wks.rows) == 2
@@ -0,0 +1,97 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.telemetry import get_telemetry, stage_summary
+
+def render_performance_section():
+    telemetry = get_telemetry()
+    run_id = st.session_state.get('perf_run_id')
+    spans = telemetry.spans(run_id) if run_id else []
+    if not spans:
+        st.info("Upload and analyze a contract first in the Upload section.")
+        return
+
+    run = telemetry.runs.get(run_id, {})
+    st.header("⏱️ Performance")
+    st.caption(f"Run {run_id} · {run.get('label', '')}")
+
+    df = pd.DataFrame(spans)
+    attempts = df[df['stage'] == 'llm_attempt']
+    clauses = df[df['stage'] == 'clause']
+    fallbacks = df[df['stage'] == 'llm_fallback']
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Wall Time", f"{run['duration_s']:.1f}s" if run.get('duration_s') else "—")
+    with col2:
+        st.metric("LLM Requests", len(attempts))
+    with col3:
+        tokens = attempts.reindex(columns=['prompt_tokens', 'completion_tokens']).fillna(0).to_numpy().sum()
+        st.metric("Tokens", f"{int(tokens):,}")
+    with col4:
+        st.metric("Fallbacks", len(fallbacks))
+
+    st.subheader("Time per Stage")
+    summary = pd.DataFrame(stage_summary(spans))
+    fig = px.bar(summary, x='stage', y='total_s', title="Total Seconds per Stage",
+                 hover_data=['spans', 'mean_s', 'p95_s'])
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption("Stages overlap: extraction, chunking and LLM requests run concurrently, so totals can exceed the wall time.")
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+
+    if not attempts.empty:
+        st.subheader("LLM Requests by Model")
+        attempts = attempts.reindex(columns=[
+            'model', 'status', 'latency_s', 'queue_s', 'prompt_tokens', 'completion_tokens'
+        ])
+        by_model = attempts.groupby('model').agg(
+            requests=('status', 'size'),
+            ok=('status', lambda s: int((s == 'ok').sum())),
+            throttled=('status', lambda s: int((s == 'throttled').sum())),
+            errors=('status', lambda s: int((s == 'error').sum())),
+            mean_latency_s=('latency_s', 'mean'),
+            p95_latency_s=('latency_s', lambda s: s.quantile(0.95)),
+            mean_queue_s=('queue_s', 'mean'),
+            prompt_tokens=('prompt_tokens', 'sum'),
+            completion_tokens=('completion_tokens', 'sum'),
+        ).round(3).reset_index()
+        st.dataframe(by_model, use_container_width=True, hide_index=True)
+
+    if not clauses.empty:
+        served = clauses['model'].fillna('all models failed').value_counts()
+        fig = px.pie(names=served.index, values=served.values, title="Model Serving Each Clause")
+        st.plotly_chart(fig, use_container_width=True)
+
+    if not fallbacks.empty:
+        st.subheader("Retries and Fallbacks")
+        st.dataframe(
+            fallbacks.reindex(columns=['clause_id', 'model', 'fallback_to', 'reason']),
+            use_container_width=True, hide_index=True
+        )
+
+    hedges = df[df['stage'] == 'hedge']
+    if not hedges.empty:
+        st.subheader("Hedged Requests")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Hedge Rate", f"{len(hedges) / max(len(clauses), 1):.0%}")
+        col2.metric("Backup Won", int((hedges['winner'] == 'backup').sum()))
+        col3.metric("Est. Time Saved", f"{hedges['saved_s'].sum():.1f}s")
+        st.dataframe(
+            hedges.reindex(columns=['clause_id', 'model', 'backup', 'delay_s', 'winner', 'saved_s', 'duration_s']),
+            use_container_width=True, hide_index=True
+        )
+
+    with st.expander("All spans"):
+        st.dataframe(df.drop(columns=['run_id']), use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "📥 Download Spans (JSON lines)", telemetry.to_jsonl(run_id),
+            file_name=f"spans_{run_id}.jsonl", mime="application/x-ndjson"
+        )
+    with col2:
+        st.download_button(
+            "📥 Download Prometheus Counters", telemetry.prometheus_text(),
+            file_name="compliance_metrics.prom", mime="text/plain"
+        )
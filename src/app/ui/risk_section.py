@@ -1,25 +1,62 @@
 import streamlit as st
 import pandas as pd
+from ui.session import get_results_frame
+from utils.results_frame import risk_changes
+
+CHANGE_ORDER = {'riskier': 0, 'new': 1, 'same': 2, 'safer': 3}
 
 def render_risk_section():
-    if st.session_state.analysis_results:
-        results = st.session_state.analysis_results
+    df, _ = get_results_frame()
+    if df is not None:
         st.header("⚠️ Risk Analysis")
+        render_revision_changes(df)
 
-        df = pd.DataFrame(results)
         high_risk_df = df[df['risk_level'] == 'High']
         medium_risk_df = df[df['risk_level'] == 'Medium']
 
         st.subheader("High Risk Clauses")
         if not high_risk_df.empty:
-            st.dataframe(high_risk_df[['clause_id', 'clause', 'summary']], use_container_width=True)
+            st.dataframe(high_risk_df[['clause_id', 'page_start', 'clause', 'summary']], use_container_width=True)
         else:
             st.info("✅ No high-risk clauses found.")
 
         st.subheader("Medium Risk Clauses")
         if not medium_risk_df.empty:
-            st.dataframe(medium_risk_df[['clause_id', 'clause', 'summary']], use_container_width=True)
+            st.dataframe(medium_risk_df[['clause_id', 'page_start', 'clause', 'summary']], use_container_width=True)
         else:
             st.info("✅ No medium-risk clauses found.")
     else:
         st.info("Upload and analyze a contract first in the Upload section.")
+
+def render_revision_changes(df):
+    # Only revision runs (a contract analyzed against a prior version) have a diff to show.
+    changes = risk_changes(df)
+    if changes is None:
+        return
+    revision = st.session_state.get('revision') or {}
+    removed = revision.get('removed', [])
+    st.subheader(f"🔁 Changes Since {revision.get('prior') or 'the Previous Version'}")
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Unchanged", int((df['revision_status'] == 'unchanged').sum()), help="Results carried forward without an LLM call.")
+    col2.metric("Modified", int((changes['revision_status'] == 'modified').sum()))
+    col3.metric("Added", int((changes['revision_status'] == 'added').sum()))
+    col4.metric("Removed", len(removed))
+    col5.metric("Riskier", int((changes['change'] == 'riskier').sum()))
+
+    if not changes.empty:
+        changes = changes.assign(_order=changes['change'].map(CHANGE_ORDER))
+        changes = changes.sort_values(['_order', 'clause_id']).drop(columns='_order')
+        st.dataframe(
+            changes[['clause_id', 'revision_status', 'prior_clause_id', 'prior_risk_level', 'risk_level',
+                     'change', 'risk_delta', 'summary']],
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.info("✅ No clauses were added or modified.")
+    if removed:
+        with st.expander(f"Removed clauses ({len(removed)})"):
+            st.dataframe(
+                pd.DataFrame(removed)[['clause_id', 'risk_level', 'risk_percent', 'summary', 'clause']],
+                use_container_width=True, hide_index=True
+            )
@@ -0,0 +1,20 @@
+import streamlit as st
+from utils.results_frame import build_results_frame, risk_summary
+
+def get_results_frame():
+    """
+    The typed results frame and its risk summary for the current analysis, built
+    once per analysis and cached in session state instead of on every rerun.
+    Returns (None, None) before a contract has been analyzed.
+    """
+    results = st.session_state.get('analysis_results')
+    if not results:
+        return None, None
+    # The results list is replaced, not mutated, when a new analysis finishes.
+    key = (id(results), len(results))
+    if st.session_state.get('results_frame_key') != key:
+        df = build_results_frame(results)
+        st.session_state.results_frame = df
+        st.session_state.results_summary = risk_summary(df)
+        st.session_state.results_frame_key = key
+    return st.session_state.results_frame, st.session_state.results_summary
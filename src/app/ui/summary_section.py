@@ -1,23 +1,22 @@
 import streamlit as st
 import pandas as pd
-from utils.pdf_generator import generate_rewritten_pdf
+from ui.session import get_results_frame
 
 def render_summary_section():
-    if not st.session_state.analysis_results:
+    df, summary = get_results_frame()
+    if df is None:
         st.info("Upload and analyze a contract first in the Upload section.")
         return
 
-    results = st.session_state.analysis_results
-
     st.header("📋 Summary & Insights")
 
     # Contract Summary
     st.subheader("Contract Summary")
     st.write("This contract covers data handling, security controls, encryption, and liability.")
 
-    gdpr_issues = len([r for r in results if 'GDPR' in r.get('regulation', '')])
-    hipaa_issues = len([r for r in results if 'HIPAA' in r.get('regulation', '')])
-    high_risk = len([r for r in results if r['risk_level'] == 'High'])
+    gdpr_issues = summary['gdpr']
+    hipaa_issues = summary['hipaa']
+    high_risk = summary['high']
 
     summary_points = []
     if gdpr_issues > 0:
@@ -34,7 +33,7 @@ def render_summary_section():
     recommendations = []
     if gdpr_issues > 0:
         recommendations.append("Update retention policy to match GDPR timelines.")
-    if any('liability' in r.get('key_clauses', '').lower() for r in results):
+    if summary['mentions_liability']:
         recommendations.append("Include liability clause to reduce legal exposure.")
     if recommendations:
         for rec in recommendations:
@@ -44,28 +43,22 @@ def render_summary_section():
 
     # Recommendation
     st.subheader("Recommendation")
-    high_risk_items = [r for r in results if r['risk_level'] == 'High']
-    medium_risk_items = [r for r in results if r['risk_level'] == 'Medium']
-    total_count = len(results)
-    if high_risk_items:
+    if summary['high']:
         st.error("Do NOT accept this contract in current form. Review highlighted clauses before approval.")
-    elif len(medium_risk_items) > total_count * 0.5:
+    elif summary['medium'] > summary['total'] * 0.5:
         st.warning("Review recommended changes before proceeding with contract approval.")
     else:
         st.success("Contract appears acceptable with minor considerations.")
 
     # Results Table
     st.subheader("Analysis Results")
-    display_data = [
-        {
-            'Clause ID': r['clause_id'],
-            'Risk Level': r['risk_level'],
-            'Compliant': '✓' if r['risk_level'] == 'Low' else '✗',
-            'Comments': r['summary'][:50] + '...' if len(r['summary']) > 50 else r['summary']
-        }
-        for r in results
-    ]
-    display_df = pd.DataFrame(display_data)
+    comments = df['summary'].where(df['summary'].str.len() <= 50, df['summary'].str.slice(0, 50) + '...')
+    display_df = pd.DataFrame({
+        'Clause ID': df['clause_id'],
+        'Risk Level': df['risk_level'],
+        'Compliant': df['compliant'].map({True: '✓', False: '✗'}),
+        'Comments': comments,
+    })
     st.dataframe(display_df, use_container_width=True)
 
     st.markdown("---")
@@ -81,8 +74,9 @@ def render_summary_section():
             st.rerun()
 
     if st.session_state.show_rewrites:
-        df = pd.DataFrame(results)
-        high_risk_df = df[df["risk_level"].isin(["High", "Medium"])].copy()
+        if generate_missing_rewrites(df):
+            df, _ = get_results_frame()
+        high_risk_df = df[df["risk_level"].isin(["High", "Medium"])]
         if high_risk_df.empty:
             st.info(" No high-risk clauses were found to rewrite.")
         else:
@@ -95,10 +89,87 @@ def render_summary_section():
             sugg_df = high_risk_df[list(display_columns.keys())].rename(columns=display_columns)
             st.dataframe(sugg_df, use_container_width=True, height=400)
 
-            pdf_data = generate_rewritten_pdf(high_risk_df)
+            render_report_downloads(high_risk_df)
+
+def generate_missing_rewrites(df):
+    """
+    With two-phase analysis the High/Medium rewrites may not exist yet
+    (REWRITE_MODE=lazy, or a run cancelled before its rewrites). They are
+    generated once, when the modifications are first shown, and saved with the
+    job and to the results backends. Returns True when the results changed.
+    """
+    from utils.config import REWRITE_CONFIG
+    results = st.session_state.analysis_results
+    missing = df["risk_level"].isin(REWRITE_CONFIG["levels"]) & (df["AI-Modified Clause"].str.strip() == "")
+    if not missing.any() or st.session_state.get("rewrites_attempted") == id(results):
+        return False
+    with st.spinner(f"Generating AI modifications for {int(missing.sum())} clauses..."):
+        job_id = st.session_state.get("loaded_job_id")
+        if job_id:
+            from utils.job_queue import get_job_queue
+            rewritten = get_job_queue().rewrite(job_id, results)
+        else:
+            from utils.contract_analyzer import rewrite_results
+            from utils.result_store import save_rewrites
+            rewritten_results = []
+            rewrite_results(results, on_rewrite=rewritten_results.append)
+            save_rewrites(rewritten_results)
+            rewritten = len(rewritten_results)
+    # A new list, so the cached results frame is rebuilt; clauses that still failed are not retried on every rerun.
+    st.session_state.analysis_results = list(results)
+    st.session_state.rewrites_attempted = id(st.session_state.analysis_results)
+    return rewritten > 0
+
+def render_report_downloads(report_df):
+    """
+    PDF, CSV and DOCX downloads of the rewritten clauses. Nothing is generated
+    until asked for, and every format is cached by a hash of the result set.
+    """
+    # ReportLab and python-docx are only needed once the modifications are shown.
+    from utils.report_cache import REPORT_FORMATS, get_report_cache, report_key
+    cache = get_report_cache()
+    key = report_key(report_df)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        render_pdf_download(cache, key, report_df)
+    for column, fmt, label in ((col2, "csv", "📊 Download CSV"), (col3, "docx", "📝 Download DOCX")):
+        _, mime, file_name = REPORT_FORMATS[fmt]
+        with column:
+            # A callable is only invoked when the button is clicked.
             st.download_button(
-                label="📄 Download PDF Report",
-                data=pdf_data,
-                file_name="ai_rewritten_clauses_report.pdf",
-                mime="application/pdf",
+                label=label,
+                data=lambda fmt=fmt: cache.get_or_build(key, fmt, report_df),
+                file_name=file_name,
+                mime=mime,
+                on_click="ignore",
             )
+
+def render_pdf_download(cache, key, report_df):
+    # The PDF is built on a background thread. While it runs, only this
+    # fragment reruns to poll its progress, not the whole page.
+    building = cache.status(key, "pdf")["state"] == "building"
+    st.fragment(_pdf_download, run_every=0.5 if building else None)(cache, key, report_df, building)
+
+def _pdf_download(cache, key, report_df, polling):
+    from utils.report_cache import REPORT_FORMATS
+    _, mime, file_name = REPORT_FORMATS["pdf"]
+    status = cache.status(key, "pdf")
+    if status["state"] == "ready":
+        if polling:
+            # A full rerun redraws the fragment without the polling timer.
+            st.rerun()
+        st.download_button(
+            label="📄 Download PDF Report",
+            data=cache.get(key, "pdf"),
+            file_name=file_name,
+            mime=mime,
+            on_click="ignore",
+        )
+    elif status["state"] == "building":
+        st.progress(status["progress"], text="Building PDF report...")
+    else:
+        if status["state"] == "failed":
+            st.error(f"PDF report failed: {status['error']}")
+        if st.button("📄 Prepare PDF Report"):
+            cache.request(key, "pdf", report_df)
+            st.rerun()
@@ -1,6 +1,20 @@
+import time
 import streamlit as st
-import tempfile, os
-from utils.contract_analyzer import analyze_contract_file
+import pandas as pd
+from utils.config import JOBS_CONFIG
+# Only the queue is imported here; the analysis pipeline loads on the first job.
+from utils.job_queue import get_job_queue
+
+RISK_ORDER = {'High': 0, 'Medium': 1, 'Low': 2}
+
+JOB_STATE_LABELS = {
+    "queued": "⏳ Queued",
+    "running": "⚙️ Running",
+    "completed": "✅ Completed",
+    "failed": "❌ Failed",
+    "cancelled": "⏹️ Cancelled",
+    "interrupted": "⚠️ Interrupted",
+}
 
 def render_upload_section():
     if 'analysis_complete' not in st.session_state:
@@ -9,6 +23,10 @@ def render_upload_section():
         st.session_state.analysis_results = None
     if 'contract_name' not in st.session_state:
         st.session_state.contract_name = ""
+    if 'job_id' not in st.session_state:
+        st.session_state.job_id = None
+    if 'loaded_job_id' not in st.session_state:
+        st.session_state.loaded_job_id = None
 
     st.subheader("📁 Upload a Contract")
     uploaded_file = st.file_uploader(
@@ -18,28 +36,138 @@ def render_upload_section():
     )
     if uploaded_file:
         st.success(f"✅ Uploaded: {uploaded_file.name}")
-        st.session_state.contract_name = uploaded_file.name
+        prior_job_id = select_prior_version()
         if st.button("🔍 Submit for Analysis"):
-            results = analyze_contract(uploaded_file)
-            if results:
-                st.session_state.analysis_results = results
-                st.session_state.analysis_complete = True
-                st.success("✅ Contract analyzed successfully!")
-                st.rerun()
+            submit_contract(uploaded_file, prior_job_id)
 
-def analyze_contract(uploaded_file):
+    if st.session_state.job_id:
+        render_job_status(st.session_state.job_id)
+    render_recent_jobs()
+
+def select_prior_version():
+    """Optional earlier analysis the upload revises; only its added or changed clauses are re-analyzed."""
+    completed = [job for job in get_job_queue().jobs(limit=50) if job["state"] == "completed" and job["analyzed"]]
+    if not completed:
+        return None
+    labels = {
+        job["job_id"]: f"{job['contract']} — {time.strftime('%Y-%m-%d %H:%M', time.localtime(job['created_at']))}"
+        for job in completed
+    }
+    return st.selectbox(
+        "Revision of a previous analysis (optional)",
+        [None, *labels],
+        format_func=lambda job_id: "None — analyze every clause" if job_id is None else labels[job_id],
+        help="Clauses unchanged since that version keep its results; only added or modified clauses are analyzed."
+    )
+
+def submit_contract(uploaded_file, prior_job_id=None):
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file_path = tmp_file.name
-        with st.spinner("Analyzing contract... This may take a few minutes."):
-            analysis_results = analyze_contract_file(tmp_file_path)
-        os.unlink(tmp_file_path)
-        if analysis_results:
-            return analysis_results
-        else:
-            st.error("Failed to analyze contract")
-            return None
+        st.session_state.job_id = get_job_queue().submit(
+            uploaded_file.name, data=uploaded_file.getvalue(), prior_job_id=prior_job_id
+        )
     except Exception as e:
         st.error(f"Error during analysis: {str(e)}")
-        return None
+
+def render_job_status(job_id):
+    # The analysis runs on a worker thread. While it runs, only this fragment
+    # reruns to poll the job's checkpoints, not the whole page.
+    status = get_job_queue().status(job_id)
+    if not status:
+        st.session_state.job_id = None
+        return
+    polling = status["state"] in ("queued", "running")
+    st.fragment(_job_status, run_every=JOBS_CONFIG["poll_interval_s"] if polling else None)(job_id, polling)
+
+def _job_status(job_id, polling):
+    jobs = get_job_queue()
+    status = jobs.status(job_id)
+    active = status["state"] in ("queued", "running")
+    if polling and not active:
+        # A full rerun redraws the fragment without the polling timer and loads the results.
+        st.rerun()
+    if status["state"] == "completed" and st.session_state.loaded_job_id != job_id:
+        load_job_results(status, jobs.results(job_id))
+
+    st.markdown(f"**{status['contract']}** — {JOB_STATE_LABELS.get(status['state'], status['state'])}")
+    revision = status["revision"]
+    if revision:
+        st.caption(
+            f"Revision of {revision['prior']}: {revision['unchanged']} clauses unchanged (results carried forward), "
+            f"{revision['modified']} modified, {revision['added']} added, {len(revision['removed'])} removed."
+        )
+    render_job_progress(status, jobs.results(job_id))
+    if status["error"]:
+        st.error(f"Error during analysis: {status['error']}")
+    if status["state"] == "completed" and not status["pending"]:
+        st.success("✅ Contract analyzed successfully!")
+
+    col1, col2 = st.columns(2)
+    if active and col1.button("⏹️ Cancel analysis", key=f"cancel_{job_id}"):
+        jobs.cancel(job_id)
+        st.rerun()
+    # A job stopped while its contract was still streaming in also has clauses left to read.
+    resume_label = f"▶️ Resume ({status['pending']} clauses left)" if status["chunked"] else "▶️ Resume"
+    if not active and (status["pending"] or not status["chunked"]) and col2.button(
+        resume_label, key=f"resume_{job_id}"
+    ):
+        jobs.resume(job_id)
+        st.rerun()
+
+def load_job_results(status, results):
+    """Makes a finished job's results the ones the dashboard pages show."""
+    st.session_state.loaded_job_id = status["job_id"]
+    st.session_state.contract_name = status["contract"]
+    st.session_state.perf_run_id = status["telemetry_run_id"]
+    st.session_state.revision = status["revision"]
+    if results:
+        st.session_state.analysis_results = results
+        st.session_state.analysis_complete = True
+
+def render_job_progress(status, results):
+    """Progress bar, running risk counts and the results so far (highest risk first)."""
+    if status["state"] == "queued":
+        st.progress(0.0, text="Waiting for a free worker...")
+    elif not status["chunked"]:
+        # Clauses are analyzed as they are chunked, so the total is still growing.
+        total = status["total"]
+        st.progress(
+            min(status["analyzed"] / total, 1.0) if total else 0.0,
+            text=f"Reading contract... analyzed {status['analyzed']} of {total} clauses so far"
+        )
+    else:
+        finished = status["analyzed"] + status["failed"] if status["state"] == "running" else status["analyzed"]
+        total = status["total"]
+        st.progress(
+            min(finished / total, 1.0) if total else 1.0,
+            text=f"Analyzed {status['analyzed']} of {total} clauses"
+        )
+
+    risk_counts = pd.Series([r['risk_level'] for r in results], dtype="object").value_counts()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("High Risk", int(risk_counts.get('High', 0)))
+    col2.metric("Medium Risk", int(risk_counts.get('Medium', 0)))
+    col3.metric("Low Risk", int(risk_counts.get('Low', 0)))
+    col4.metric("Failed", status["failed"])
+
+    if results:
+        df = pd.DataFrame(results)[['clause_id', 'risk_level', 'risk_percent', 'summary']]
+        df = df.assign(_order=df['risk_level'].map(RISK_ORDER).fillna(3))
+        df = df.sort_values(['_order', 'clause_id']).drop(columns='_order')
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+def render_recent_jobs():
+    # Jobs outlive the browser session, so a refreshed page can reopen them here.
+    jobs = get_job_queue().jobs(limit=10)
+    if not jobs:
+        return
+    with st.expander("🗂️ Recent analysis jobs"):
+        for job in jobs:
+            col1, col2 = st.columns([4, 1])
+            col1.write(
+                f"**{job['contract']}** — {JOB_STATE_LABELS.get(job['state'], job['state'])}, "
+                f"{job['analyzed']}/{job['total']} clauses"
+            )
+            if job["job_id"] != st.session_state.job_id and col2.button("Open", key=f"open_{job['job_id']}"):
+                st.session_state.job_id = job["job_id"]
+                st.session_state.loaded_job_id = None
+                st.rerun()
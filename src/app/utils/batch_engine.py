@@ -0,0 +1,228 @@
+# batch_engine.py
+import os
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .config import BATCH_ENGINE_CONFIG, BATCH_CONFIG, EMBEDDING_CONFIG, TELEMETRY_CONFIG
+from .llm_client import AsyncLLMClient, run_async
+from .result_store import open_result_sink
+from .telemetry import get_telemetry
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx')
+
+
+def _init_worker(num_threads):
+    # Split the CPU between worker processes instead of letting each one take every core.
+    EMBEDDING_CONFIG["num_threads"] = num_threads
+
+
+def extract_and_chunk(file_path):
+    """
+    Extraction and semantic chunking for one file; runs inside a worker process.
+    Returns clause dicts with page and offset provenance, and the seconds taken.
+    """
+    from .data_handler import chunk_document
+    started = time.perf_counter()
+    clauses = [clause for clause in chunk_document(file_path) if clause["clause"].strip()]
+    return clauses, time.perf_counter() - started
+
+
+def expand_paths(paths):
+    """Expands directories into the PDF/DOCX files they contain."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name) for name in sorted(names)
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS)
+                )
+        else:
+            files.append(path)
+    return files
+
+
+class BatchEngine:
+    """
+    Analyzes many contracts in one run.
+    Extraction and chunking run in a process pool, every document's clauses go
+    through one AsyncLLMClient and the process-wide rate-limit scheduler, and
+    all results go to one results sink (wks forces Google Sheets onto that
+    worksheet). A failing document is recorded in the report and does not stop the others.
+    """
+
+    def __init__(
+        self, workers=None, documents_in_flight=None, batch_mode=None, backend=None, keep_results=False, wks=None
+    ):
+        self.workers = workers or BATCH_ENGINE_CONFIG["workers"]
+        self.documents_in_flight = documents_in_flight or BATCH_ENGINE_CONFIG["documents_in_flight"]
+        self.batch_mode = BATCH_CONFIG["enabled"] if batch_mode is None else batch_mode
+        self.backend = backend
+        self.keep_results = keep_results
+        self.wks = wks
+        self.results = {}
+        self._executor = None
+        self._retry_lock = None
+
+    def _new_executor(self):
+        num_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(num_threads,),
+        )
+
+    async def _chunk(self, file_path):
+        """
+        Chunks one file in the worker pool. When a worker dies (e.g. out of memory
+        on one file) every document in flight on that pool fails with it, so each
+        is retried once on a fresh pool. Retries run one at a time, so a document
+        that breaks the pool again is the culprit and only its BrokenProcessPool
+        is raised.
+        """
+        try:
+            return await self._run_chunk(file_path)
+        except BrokenProcessPool:
+            print(f"⚠️ Worker pool broke while chunking {os.path.basename(file_path)}; retrying it once.")
+        async with self._retry_lock:
+            return await self._run_chunk(file_path)
+
+    async def _run_chunk(self, file_path):
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            return await loop.run_in_executor(executor, extract_and_chunk, file_path)
+        except BrokenProcessPool:
+            # Replace the pool so the remaining documents can still be processed.
+            if self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            raise
+
+    async def _process(self, client, sink, file_path, slots):
+        from .contract_analyzer import ResultCollector, analyze_indexed_clauses
+
+        report = {
+            "file": file_path, "status": "ok", "clauses": 0, "analyzed": 0, "failed": 0, "triaged": 0, "reused": 0,
+        }
+        async with slots:
+            started = time.perf_counter()
+            try:
+                # The span includes waiting for a free worker; worker_s is the work itself.
+                with get_telemetry().span("extract_and_chunk", file=os.path.basename(file_path)) as span:
+                    clauses, report["extract_s"] = await self._chunk(file_path)
+                    span.update(worker_s=round(report["extract_s"], 4), clauses=len(clauses))
+                report["clauses"] = len(clauses)
+                if clauses:
+                    starting_id = sink.allocate_ids(len(clauses))
+                    collector = ResultCollector(
+                        discovered=len(clauses), sink=sink, contract=os.path.basename(file_path)
+                    )
+                    for i, clause in enumerate(clauses):
+                        collector.provenance[starting_id + i] = {k: v for k, v in clause.items() if k != "clause"}
+                    await analyze_indexed_clauses(
+                        client, [(starting_id + i, clause["clause"]) for i, clause in enumerate(clauses)],
+                        collector, self.batch_mode
+                    )
+                    report["analyzed"] = collector.progress["analyzed"]
+                    report["failed"] = collector.progress["failed"]
+                    report["triaged"] = collector.triaged
+                    report["reused"] = collector.reused
+                    if self.keep_results:
+                        self.results[file_path] = sorted(
+                            (result for result, _ in collector.pairs), key=lambda x: x['clause_id']
+                        )
+                    if not collector.pairs:
+                        report["status"] = "failed"
+                        report["error"] = "every clause failed"
+                else:
+                    report["status"] = "empty"
+            except Exception as e:
+                report["status"] = "failed"
+                report["error"] = f"{type(e).__name__}: {e}"
+                print(f"❌ {file_path} failed: {report['error']}")
+            report["total_s"] = round(time.perf_counter() - started, 3)
+        print(f"{file_path}: {report['status']}, {report['analyzed']}/{report['clauses']} clauses in {report['total_s']}s.")
+        return report
+
+    async def run_async(self, file_paths):
+        started = time.perf_counter()
+        telemetry = get_telemetry()
+        run_id = telemetry.start_run(f"batch of {len(file_paths)} contracts")
+        sink = open_result_sink("batch", wks=self.wks, backend=self.backend)
+        if not sink:
+            raise RuntimeError("Could not open the results backend.")
+        slots = asyncio.Semaphore(self.documents_in_flight)
+        self._executor = self._new_executor()
+        self._retry_lock = asyncio.Lock()
+        try:
+            with sink:
+                sink.ensure_header()
+                async with AsyncLLMClient() as client:
+                    reports = await asyncio.gather(
+                        *(self._process(client, sink, file_path, slots) for file_path in file_paths)
+                    )
+        finally:
+            self._executor.shutdown(cancel_futures=True)
+            telemetry.end_run(run_id)
+            if TELEMETRY_CONFIG["prometheus_path"]:
+                telemetry.write_prometheus(TELEMETRY_CONFIG["prometheus_path"])
+
+        elapsed = time.perf_counter() - started
+        succeeded = sum(1 for r in reports if r["status"] == "ok")
+        analyzed = sum(r["analyzed"] for r in reports)
+        summary = {
+            "documents": len(reports),
+            "succeeded": succeeded,
+            "failed": sum(1 for r in reports if r["status"] == "failed"),
+            "empty": sum(1 for r in reports if r["status"] == "empty"),
+            "clauses_analyzed": analyzed,
+            "llm_calls_saved": sum(r["triaged"] + r["reused"] for r in reports),
+            "elapsed_s": round(elapsed, 2),
+            "contracts_per_min": round(succeeded / elapsed * 60, 2) if elapsed else 0.0,
+            "clauses_per_s": round(analyzed / elapsed, 2) if elapsed else 0.0,
+        }
+        print(
+            f"Batch run: {summary['succeeded']}/{summary['documents']} contracts in {summary['elapsed_s']}s "
+            f"({summary['contracts_per_min']} contracts/min, {summary['clauses_per_s']} clauses/s), "
+            f"{summary['failed']} failed."
+        )
+        return {"summary": summary, "documents": reports}
+
+    def run(self, file_paths):
+        return run_async(self.run_async(file_paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many contracts in one batch run.")
+    parser.add_argument("paths", nargs="+", help="Contract files or directories of PDF/DOCX files.")
+    parser.add_argument("--workers", type=int, help="Extraction/chunking processes.")
+    parser.add_argument("--documents-in-flight", type=int, help="Documents being chunked or analyzed at once.")
+    parser.add_argument("--batch-mode", action="store_true", help="Pack several clauses per LLM request.")
+    parser.add_argument("--backend", choices=["auto", "sheets", "sqlite", "both"], help="Results backend.")
+    parser.add_argument("--report", help="Write the run report as JSON to this path.")
+    args = parser.parse_args()
+
+    file_paths = expand_paths(args.paths)
+    if not file_paths:
+        parser.error("no PDF or DOCX files found")
+    engine = BatchEngine(
+        workers=args.workers,
+        documents_in_flight=args.documents_in_flight,
+        batch_mode=args.batch_mode or None,
+        backend=args.backend,
+    )
+    report = engine.run(file_paths)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}.")
+
+
+if __name__ == "__main__":
+    main()
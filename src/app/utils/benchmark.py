@@ -0,0 +1,447 @@
+# benchmark.py
+import os
+import sys
+import json
+import time
+import subprocess
+import argparse
+import platform
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+from . import contract_analyzer
+from .config import MODEL_CONFIG, CACHE_CONFIG, INDEX_CONFIG, EMBEDDING_CONFIG, HEDGE_CONFIG, REWRITE_CONFIG
+from .hedging import hedge_stats
+from .data_handler import extract_text_from_file, semantic_chunking
+from .mock_llm import MockLLMServer
+from .sheet_writer import FakeWorksheet
+from .telemetry import get_telemetry, stage_summary
+
+DEFAULT_CONTRACT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "test")
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a Streamlit page run imports, and the analysis pipeline loaded on the first submit.
+STARTUP_MODULES = [
+    "utils.config", "ui.dashboard", "ui.risk_section", "ui.summary_section", "ui.performance_section",
+    "ui.upload_section", "utils.contract_analyzer",
+]
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies)
+    return {
+        "count": len(latencies),
+        "mean_s": round(float(values.mean()), 4),
+        "p50_s": round(float(np.percentile(values, 50)), 4),
+        "p95_s": round(float(np.percentile(values, 95)), 4),
+        "p99_s": round(float(np.percentile(values, 99)), 4),
+        "max_s": round(float(values.max()), 4),
+    }
+
+
+@contextmanager
+def record_clause_latencies(latencies):
+    """
+    Times every clause analysis (one clause, or one packed batch counted once per
+    clause in it) by wrapping the analysis entry points for the duration of a run.
+    """
+    single = contract_analyzer.analyze_single_clause_async
+    batch = contract_analyzer._run_clause_batch
+
+    async def timed_single(client, clause, clause_id):
+        started = time.perf_counter()
+        try:
+            return await single(client, clause, clause_id)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    async def timed_batch(client, batch_number, items):
+        started = time.perf_counter()
+        try:
+            return await batch(client, batch_number, items)
+        finally:
+            latencies.extend([time.perf_counter() - started] * len(items))
+
+    contract_analyzer.analyze_single_clause_async = timed_single
+    contract_analyzer._run_clause_batch = timed_batch
+    try:
+        yield
+    finally:
+        contract_analyzer.analyze_single_clause_async = single
+        contract_analyzer._run_clause_batch = batch
+
+
+@contextmanager
+def mock_environment(server, keep_rate_limits=False, warm=False, hedge=None):
+    """
+    Points every model at the mock server and makes runs cold and repeatable.
+    hedge turns request hedging on or off for the run (None keeps HEDGE_CONFIG).
+    """
+    saved_models = {name: dict(config) for name, config in MODEL_CONFIG.items()}
+    saved = (CACHE_CONFIG["enabled"], INDEX_CONFIG["enabled"], EMBEDDING_CONFIG["backend"], HEDGE_CONFIG["enabled"])
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("GITHUB_PAT", "benchmark")
+    for config in MODEL_CONFIG.values():
+        config["api_url"] = server.url
+        if not keep_rate_limits:
+            # The real free-tier limits would make the benchmark measure quota, not the pipeline.
+            config["rpm"] = config["tpm"] = None
+    if not warm:
+        CACHE_CONFIG["enabled"] = INDEX_CONFIG["enabled"] = False
+    if hedge is not None:
+        HEDGE_CONFIG["enabled"] = hedge
+    try:
+        yield
+    finally:
+        for name, config in saved_models.items():
+            MODEL_CONFIG[name].clear()
+            MODEL_CONFIG[name].update(config)
+        CACHE_CONFIG["enabled"], INDEX_CONFIG["enabled"], EMBEDDING_CONFIG["backend"], HEDGE_CONFIG["enabled"] = saved
+
+
+def bench_single(paths, batch_mode, sheet_latency_s):
+    """analyze_contract_file per file, with extraction and chunking timed as separate stages."""
+    files, latencies = [], []
+    totals = {"extraction_s": 0.0, "chunking_s": 0.0, "llm_s": 0.0, "sheet_write_s": 0.0, "clauses": 0}
+    for path in paths:
+        wks = FakeWorksheet(latency_s=sheet_latency_s)
+        started = time.perf_counter()
+        text = extract_text_from_file(path)
+        extracted = time.perf_counter()
+        clauses = [clause for clause in semantic_chunking(text) if clause.strip()]
+        chunked = time.perf_counter()
+        with record_clause_latencies(latencies):
+            results = contract_analyzer.analyze_contract_file(
+                path, clauses=clauses, batch_mode=batch_mode, wks=wks
+            ) or []
+        finished = time.perf_counter()
+        stats = {
+            "file": os.path.basename(path),
+            "clauses": len(clauses),
+            "analyzed": len(results),
+            "extraction_s": round(extracted - started, 4),
+            "chunking_s": round(chunked - extracted, 4),
+            "llm_s": round(finished - chunked, 4),
+            "sheet_write_s": round(wks.busy_s, 4),
+        }
+        files.append(stats)
+        for key in ("extraction_s", "chunking_s", "llm_s", "sheet_write_s"):
+            totals[key] += stats[key]
+        totals["clauses"] += stats["analyzed"]
+    elapsed = sum(f["extraction_s"] + f["chunking_s"] + f["llm_s"] for f in files)
+    return {
+        "files": files,
+        "totals": {key: round(value, 4) for key, value in totals.items()},
+        "clauses_per_s": round(totals["clauses"] / elapsed, 2) if elapsed else 0.0,
+        "clause_latency": latency_summary(latencies),
+    }
+
+
+def bench_streaming(paths, batch_mode, sheet_latency_s):
+    """End-to-end streaming analyze_contract_file per file, including time to the first result."""
+    files = []
+    for path in paths:
+        wks = FakeWorksheet(latency_s=sheet_latency_s)
+        started = time.perf_counter()
+        first = []
+
+        def on_result(result, progress):
+            if result and not first:
+                first.append(time.perf_counter() - started)
+
+        results = contract_analyzer.analyze_contract_file(
+            path, batch_mode=batch_mode, on_result=on_result, wks=wks
+        ) or []
+        total = time.perf_counter() - started
+        files.append({
+            "file": os.path.basename(path),
+            "analyzed": len(results),
+            "total_s": round(total, 4),
+            "time_to_first_result_s": round(first[0], 4) if first else None,
+            "clauses_per_s": round(len(results) / total, 2) if total else 0.0,
+        })
+    return {"files": files}
+
+
+def bench_batch(paths, sheet_latency_s):
+    """batch_analyze_contracts over every file at once."""
+    wks = FakeWorksheet(latency_s=sheet_latency_s)
+    latencies = []
+    started = time.perf_counter()
+    with record_clause_latencies(latencies):
+        results = contract_analyzer.batch_analyze_contracts(paths, wks=wks)
+    elapsed = time.perf_counter() - started
+    clauses = sum(len(r) for r in results.values() if r)
+    succeeded = sum(1 for r in results.values() if r)
+    return {
+        "documents": len(paths),
+        "succeeded": succeeded,
+        "clauses": clauses,
+        "total_s": round(elapsed, 4),
+        "sheet_write_s": round(wks.busy_s, 4),
+        "contracts_per_min": round(succeeded / elapsed * 60, 2) if elapsed else 0.0,
+        "clauses_per_s": round(clauses / elapsed, 2) if elapsed else 0.0,
+        "clause_latency": latency_summary(latencies),
+    }
+
+
+def _import_seconds(module):
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _heaviest_imports(module, top=8):
+    """Packages by total import time (python -X importtime self times) when importing module."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    packages = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": package, "seconds": round(us / 1e6, 4)} for package, us in ranked]
+
+
+def bench_startup(modules=STARTUP_MODULES, repeats=3):
+    """Cold import time of each module, measured in a fresh interpreter (median of repeats)."""
+    report = {}
+    for module in modules:
+        samples = [_import_seconds(module) for _ in range(repeats)]
+        report[module] = {"median_s": round(float(np.median(samples)), 4), "min_s": round(min(samples), 4)}
+    report["heaviest_imports"] = {module: _heaviest_imports(module) for module in ("ui.upload_section", "utils.contract_analyzer")}
+    return report
+
+
+def embedding_run(paths, vectors_path, probe_size=256):
+    """
+    Chunks paths with the configured embedding backend; bench_embeddings runs it
+    in a fresh interpreter per backend. The vectors of the first probe_size
+    non-empty lines are saved to vectors_path for the parity check.
+    """
+    import resource
+    from .data_handler import read_document
+    from .chunk_normalizer import with_provenance
+    from .embedding_service import get_embedding_service
+    service = get_embedding_service()
+    started = time.perf_counter()
+    service.embed_query("warm up")
+    load_s = time.perf_counter() - started
+
+    since = time.time()
+    files, probes = {}, []
+    started = time.perf_counter()
+    for path in paths:
+        text, page_starts = read_document(path)
+        clauses = with_provenance(semantic_chunking(text), text, page_starts) if text.strip() else []
+        files[os.path.basename(path)] = {
+            "chunks": len(clauses),
+            "boundaries": [clause["char_end"] for clause in clauses[:-1] if clause["char_end"] is not None],
+        }
+        probes.extend(line.strip() for line in text.splitlines() if line.strip())
+    chunking_s = time.perf_counter() - started
+    spans = get_telemetry().spans(stage="chunking", since=since)
+    windows = sum(span.get("embedded_windows", 0) for span in spans)
+    embedding_s = sum(span.get("embedding_s", 0.0) for span in spans)
+    np.save(vectors_path, np.asarray(service.embed_documents(probes[:probe_size]), dtype=np.float32))
+    return {
+        "load_s": round(load_s, 4),
+        "chunking_s": round(chunking_s, 4),
+        "embedding_s": round(embedding_s, 4),
+        "windows": windows,
+        "windows_per_s": round(windows / embedding_s, 2) if embedding_s else 0.0,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "files": files,
+    }
+
+
+def _boundary_f1(reference, candidate, tolerance):
+    """F1 of candidate chunk boundaries against the reference's, each matching within tolerance chars."""
+    if not reference and not candidate:
+        return 1.0
+    if not reference or not candidate:
+        return 0.0
+    ref, cand = np.asarray(reference), np.asarray(candidate)
+    distances = np.abs(cand[:, None] - ref[None, :])
+    precision = float((distances.min(axis=1) <= tolerance).mean())
+    recall = float((distances.min(axis=0) <= tolerance).mean())
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+
+def bench_embeddings(paths, backends=("hf", "onnx"), tolerance=20):
+    """
+    Chunks the same documents with each embedding backend, each in a fresh
+    interpreter, and compares every backend with the first: chunk boundaries
+    (exact and within tolerance chars), cosine similarity of the vectors, and
+    throughput, load time and peak memory.
+    """
+    report, vectors, boundaries = {}, {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            vectors_path = os.path.join(tmp, f"{backend}.npy")
+            code = (f"import json; from utils.benchmark import embedding_run; "
+                    f"print(json.dumps(embedding_run({paths!r}, {vectors_path!r})))")
+            out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True,
+                                 env={**os.environ, "EMBEDDING_BACKEND": backend})
+            if out.returncode:
+                error = (out.stderr.strip().splitlines() or ["unknown error"])[-1]
+                report[backend] = {"available": False, "error": error}
+                print(f"⚠️ Embedding backend {backend} unavailable: {error}")
+                continue
+            run = json.loads(out.stdout.strip().splitlines()[-1])
+            boundaries[backend] = {name: file.pop("boundaries") for name, file in run["files"].items()}
+            report[backend] = {"available": True, **run}
+            vectors[backend] = np.load(vectors_path)
+
+    reference = backends[0]
+    report["parity"] = {}
+    for backend in backends[1:]:
+        if backend not in vectors or reference not in vectors:
+            continue
+        # Documents neither backend split (e.g. scanned PDFs without text) would count as perfect agreement.
+        names = [name for name in boundaries[reference] if boundaries[reference][name] or boundaries[backend][name]]
+
+        def boundary_f1(within):
+            scores = [_boundary_f1(boundaries[reference][name], boundaries[backend][name], within) for name in names]
+            return round(float(np.mean(scores)), 4) if scores else None
+
+        cosine = np.sum(vectors[backend] * vectors[reference], axis=1)
+        ref_run, run = report[reference], report[backend]
+        report["parity"][f"{backend}_vs_{reference}"] = {
+            "cosine_mean": round(float(cosine.mean()), 4) if len(cosine) else None,
+            "cosine_min": round(float(cosine.min()), 4) if len(cosine) else None,
+            "boundary_f1_exact": boundary_f1(0),
+            f"boundary_f1_within_{tolerance}": boundary_f1(tolerance),
+            "chunk_count_delta": sum(run["files"][name]["chunks"] - ref_run["files"][name]["chunks"] for name in names),
+            "embedding_speedup": round(ref_run["embedding_s"] / run["embedding_s"], 2) if run["embedding_s"] else None,
+            "peak_rss_delta_mb": round(run["peak_rss_mb"] - ref_run["peak_rss_mb"], 1),
+        }
+    return report
+
+
+def compare(current, baseline):
+    """Prints the headline metrics of two benchmark reports side by side."""
+    metrics = [
+        ("single", "clauses_per_s"), ("single", "clause_latency", "p50_s"), ("single", "clause_latency", "p95_s"),
+        ("single", "clause_latency", "p99_s"), ("batch", "clauses_per_s"), ("batch", "contracts_per_min"),
+        ("startup", "ui.dashboard", "median_s"), ("startup", "ui.upload_section", "median_s"),
+        ("startup", "utils.contract_analyzer", "median_s"),
+        ("hedging", "hedge_rate"), ("hedging", "estimated_saved_s"),
+        ("embeddings", "onnx", "windows_per_s"), ("embeddings", "onnx", "peak_rss_mb"),
+        ("mock_server", "requests"), ("mock_server", "completion_tokens"),
+    ]
+    for path in metrics:
+        old, new = baseline, current
+        for key in path:
+            old = old.get(key, {}) if isinstance(old, dict) else None
+            new = new.get(key, {}) if isinstance(new, dict) else None
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+            change = f"{(new - old) / old:+.1%}" if old else "n/a"
+            print(f"{'.'.join(path)}: {old} -> {new} ({change})")
+
+
+def run_benchmark(paths, scenarios=("single", "streaming", "batch"), batch_mode=False, latency_s=0.3, jitter=0.3,
+                  error_rate=0.0, throttle_rate=0.0, sheet_latency_s=0.05, keep_rate_limits=False, warm=False,
+                  hashing_embeddings=False, hedge=False, token_latency_s=0.0):
+    if hashing_embeddings:
+        # Set in the environment too, so the batch engine's worker processes pick it up.
+        os.environ["EMBEDDING_BACKEND"] = "hashing"
+    report = {
+        "config": {
+            "files": [os.path.basename(p) for p in paths], "scenarios": list(scenarios), "batch_mode": batch_mode,
+            "latency_s": latency_s, "jitter": jitter, "error_rate": error_rate, "throttle_rate": throttle_rate,
+            "sheet_latency_s": sheet_latency_s, "keep_rate_limits": keep_rate_limits, "warm": warm, "hedge": hedge,
+            "token_latency_s": token_latency_s, "two_phase": REWRITE_CONFIG["two_phase"],
+            "rewrite_mode": REWRITE_CONFIG["mode"],
+            "embedding_backend": "hashing" if hashing_embeddings else EMBEDDING_CONFIG["backend"],
+            "python": platform.python_version(), "cpu_count": os.cpu_count(),
+        },
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    since = time.time()
+    if "startup" in scenarios:
+        report["startup"] = bench_startup()
+    if "embeddings" in scenarios:
+        report["embeddings"] = bench_embeddings(paths)
+    with MockLLMServer(latency_s, jitter, error_rate, throttle_rate, token_latency_s=token_latency_s) as server:
+        with mock_environment(server, keep_rate_limits, warm, hedge):
+            if hashing_embeddings:
+                EMBEDDING_CONFIG["backend"] = "hashing"
+                from .embedding_service import get_embedding_service
+                get_embedding_service().backend = "hashing"
+            if "single" in scenarios:
+                report["single"] = bench_single(paths, batch_mode, sheet_latency_s)
+            if "streaming" in scenarios:
+                report["streaming"] = bench_streaming(paths, batch_mode, sheet_latency_s)
+            if "batch" in scenarios:
+                report["batch"] = bench_batch(paths, sheet_latency_s)
+        report["mock_server"] = dict(server.stats)
+    if hedge:
+        report["hedging"] = hedge_stats()
+    # Worker processes of the batch scenario keep their own spans; only this process's stages are summarized.
+    report["stages"] = stage_summary(get_telemetry().spans(since=since))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark against a mock LLM server.")
+    parser.add_argument("paths", nargs="*", help="Contracts or directories (default: the repo's test/ PDFs).")
+    parser.add_argument("--scenario", action="append", choices=["single", "streaming", "batch", "startup", "embeddings"],
+                        help="Repeat to run several (default: single, streaming and batch).")
+    parser.add_argument("--batch-mode", action="store_true", help="Pack several clauses per LLM request.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock LLM latency per request in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Lognormal sigma applied to the latency.")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="Extra mock latency per completion token in seconds (generation time).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with a 429.")
+    parser.add_argument("--sheet-latency", type=float, default=0.05, help="Fake worksheet latency per API call.")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Keep the configured rpm/tpm limits.")
+    parser.add_argument("--warm", action="store_true", help="Keep the clause cache and clause index enabled.")
+    parser.add_argument("--hashing-embeddings", action="store_true",
+                        help="Chunk with hashing vectors instead of loading the embedding model.")
+    parser.add_argument("--hedge", action="store_true", help="Hedge slow clause requests to the next model.")
+    parser.add_argument("--output", help="Write the JSON report here.")
+    parser.add_argument("--compare", help="Print changes against an earlier JSON report.")
+    args = parser.parse_args()
+
+    from .batch_engine import expand_paths
+    paths = expand_paths(args.paths or [DEFAULT_CONTRACT_DIR])
+    if not paths:
+        parser.error("no PDF or DOCX files found")
+
+    report = run_benchmark(
+        paths,
+        scenarios=tuple(args.scenario or ("single", "streaming", "batch")),
+        batch_mode=args.batch_mode,
+        latency_s=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        sheet_latency_s=args.sheet_latency,
+        keep_rate_limits=args.keep_rate_limits,
+        warm=args.warm,
+        hashing_embeddings=args.hashing_embeddings,
+        hedge=args.hedge,
+        token_latency_s=args.token_latency,
+    )
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}.")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# chunk_normalizer.py
+import re
+import bisect
+from .config import CHUNK_CONFIG, MODEL_CONFIG, MODEL_PREFERENCE_ORDER
+
+_WORD_PIECES = re.compile(r"[A-Za-z0-9_]+|[^\sA-Za-z0-9_]")
+_SENTENCE_BREAK = re.compile(r"(?<=[.?!;:])\s+")
+_LINE_BREAK = re.compile(r"\s*\n\s*")
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Local token count for chunk sizing. Uses tiktoken's cl100k_base when it is
+    installed; otherwise a BPE-style estimate: one token per punctuation mark
+    and about one per four characters of each word.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return sum((len(piece) + 3) // 4 for piece in _WORD_PIECES.findall(text))
+
+
+def chunk_token_target():
+    """Largest clause, in tokens, for the first configured model (its chunk_max_tokens)."""
+    for name in MODEL_PREFERENCE_ORDER:
+        if name in MODEL_CONFIG:
+            return MODEL_CONFIG[name].get("chunk_max_tokens", CHUNK_CONFIG["max_tokens"])
+    return CHUNK_CONFIG["max_tokens"]
+
+
+def _pack(units, max_tokens, joiner=" "):
+    """Greedily packs consecutive text units into pieces of at most max_tokens."""
+    pieces, current, current_tokens = [], [], 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(joiner.join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        pieces.append(joiner.join(current))
+    return pieces
+
+
+def split_oversized(chunk, max_tokens):
+    """Splits a chunk on sentence boundaries, then line breaks, then words, until every piece fits."""
+    if count_tokens(chunk) <= max_tokens:
+        return [chunk]
+    pieces = []
+    for sentence in _pack(_SENTENCE_BREAK.split(chunk.strip()), max_tokens):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        for line in _pack(_LINE_BREAK.split(sentence), max_tokens, joiner="\n"):
+            pieces.extend([line] if count_tokens(line) <= max_tokens else _pack(line.split(), max_tokens))
+    return pieces
+
+
+def normalize_chunks(chunks, min_tokens=None, max_tokens=None):
+    """
+    Post-processes semantic chunks so each one is worth a request: chunks over
+    max_tokens are split on sentence boundaries, and chunks under min_tokens are
+    merged into their neighbour as long as the result stays within max_tokens.
+    Order and text are preserved; only the boundaries move.
+    """
+    if not CHUNK_CONFIG["enabled"]:
+        return list(chunks)
+    min_tokens = CHUNK_CONFIG["min_tokens"] if min_tokens is None else min_tokens
+    max_tokens = max_tokens or chunk_token_target()
+
+    pieces = [piece for chunk in chunks if chunk.strip() for piece in split_oversized(chunk, max_tokens)]
+    merged, tokens = [], []
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        # Merge a small piece into the previous one, or the next piece into a small previous one.
+        if merged and (piece_tokens < min_tokens or tokens[-1] < min_tokens) and tokens[-1] + piece_tokens <= max_tokens:
+            merged[-1] = f"{merged[-1]} {piece}"
+            tokens[-1] += piece_tokens
+        else:
+            merged.append(piece)
+            tokens.append(piece_tokens)
+    return merged
+
+
+class TextLocator:
+    """
+    Finds chunks in the text they were cut from. The chunker and the normalizer
+    rejoin sentences with single spaces, so matching is done on a
+    whitespace-collapsed copy and mapped back to offsets in the original text.
+    Chunks are located in order, each search starting where the last one ended.
+    """
+
+    def __init__(self, text):
+        words = list(re.finditer(r"\S+", text))
+        self.collapsed = " ".join(match.group() for match in words)
+        self._collapsed_starts, self._original_starts = [], []
+        position = 0
+        for match in words:
+            self._collapsed_starts.append(position)
+            self._original_starts.append(match.start())
+            position += len(match.group()) + 1
+        self._cursor = 0
+
+    def _original(self, collapsed_index):
+        word = max(bisect.bisect_right(self._collapsed_starts, collapsed_index) - 1, 0)
+        return self._original_starts[word] + collapsed_index - self._collapsed_starts[word]
+
+    def locate(self, chunk, prefix_fallback=True):
+        """
+        (start, end) offsets of chunk in the original text, or None if it cannot be
+        found. Without prefix_fallback only an exact (whitespace-insensitive) match counts.
+        """
+        needle = " ".join(chunk.split())
+        if not needle or not self._collapsed_starts:
+            return None
+        index = self.collapsed.find(needle, self._cursor)
+        length = len(needle)
+        if index < 0 and prefix_fallback:
+            # Fall back to the chunk's opening words, e.g. when the chunker altered its text.
+            index = self.collapsed.find(needle[:60], self._cursor)
+            length = min(length, len(self.collapsed) - index)
+        if index < 0:
+            return None
+        self._cursor = index + length
+        return self._original(index), self._original(index + length - 1) + 1
+
+
+def page_of(offset, page_starts):
+    """1-based page holding the character at offset, given each page's starting offset."""
+    return max(bisect.bisect_right(page_starts, offset), 1)
+
+
+def clause_at(clause, start, end, page_starts):
+    """Clause dict for text found at document offsets [start, end)."""
+    return {
+        "clause": clause,
+        "page_start": page_of(start, page_starts),
+        "page_end": page_of(end - 1, page_starts),
+        "char_start": start,
+        "char_end": end,
+    }
+
+
+def with_provenance(chunks, text, page_starts, base_offset=0):
+    """
+    Clause dicts for chunks cut from text: the clause, its first and last page
+    and its character offsets in the document. text starts at base_offset in the
+    document; page_starts are document offsets. Unlocatable chunks get None.
+    """
+    locator = TextLocator(text)
+    clauses = []
+    for chunk in chunks:
+        span = locator.locate(chunk)
+        if span is None:
+            clauses.append({"clause": chunk, "page_start": None, "page_end": None, "char_start": None, "char_end": None})
+            continue
+        clauses.append(clause_at(chunk, base_offset + span[0], base_offset + span[1], page_starts))
+    return clauses
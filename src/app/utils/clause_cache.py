@@ -0,0 +1,242 @@
+# clause_cache.py
+import os
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import argparse
+import threading
+import unicodedata
+from .config import CACHE_CONFIG
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_clause(clause):
+    """Collapses whitespace and unicode variants so re-extracted text hashes the same."""
+    text = unicodedata.normalize("NFKC", clause)
+    return " ".join(text.split())
+
+
+def make_cache_key(kind, model_id, prompt_version, clause):
+    payload = "\x1f".join([kind, model_id, prompt_version, normalize_clause(clause)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClauseCache:
+    """
+    Content-addressed SQLite cache for per-clause LLM results.
+    Entries are keyed by clause text, model id and prompt version, and the
+    least recently used entries are evicted once the cache exceeds max_bytes.
+    Lookups do not write: hit/miss counters and access times are kept in memory
+    and written in one transaction on put, close, or every flush_every lookups /
+    flush_interval_s seconds.
+    """
+
+    def __init__(self, path, max_bytes, flush_every=None, flush_interval_s=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every or CACHE_CONFIG["flush_every"]
+        self.flush_interval_s = CACHE_CONFIG["flush_interval_s"] if flush_interval_s is None else flush_interval_s
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Counter increments and last_access times not yet written to the database.
+        self._counts = {"hits": 0, "misses": 0}
+        self._touched = {}
+        self._last_flush = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS clause_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                model_id TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_clause_cache_access ON clause_cache(last_access);
+            CREATE INDEX IF NOT EXISTS idx_clause_cache_model ON clause_cache(model_id, prompt_version);
+            CREATE TABLE IF NOT EXISTS cache_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO cache_counters(name, value) VALUES ('hits', 0), ('misses', 0);
+            """
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM clause_cache"
+        ).fetchone()[0]
+
+    def get(self, kind, model_id, prompt_version, clause):
+        key = make_cache_key(kind, model_id, prompt_version, clause)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM clause_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self.hits += 1
+                self._counts["hits"] += 1
+                self._touched[key] = time.time()
+            else:
+                self.misses += 1
+                self._counts["misses"] += 1
+            if (
+                sum(self._counts.values()) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval_s
+            ):
+                self._flush()
+                self._conn.commit()
+        return json.loads(row[0]) if row else None
+
+    def _flush(self):
+        """Writes the pending counters and access times; the caller holds the lock and commits."""
+        self._conn.executemany(
+            "UPDATE cache_counters SET value = value + ? WHERE name = ?",
+            [(count, name) for name, count in self._counts.items() if count],
+        )
+        self._conn.executemany(
+            "UPDATE clause_cache SET last_access = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._touched.items()],
+        )
+        self._counts = {"hits": 0, "misses": 0}
+        self._touched = {}
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+            self._conn.commit()
+
+    def close(self):
+        """Writes the pending counters and access times and closes the database."""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush()
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def put(self, kind, model_id, prompt_version, clause, value):
+        key = make_cache_key(kind, model_id, prompt_version, clause)
+        encoded = json.dumps(value)
+        size = len(encoded.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM clause_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO clause_cache "
+                "(key, kind, model_id, prompt_version, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, model_id, prompt_version, encoded, size, now, now),
+            )
+            self._touched.pop(key, None)
+            # Written before eviction, so recently read entries are not taken for stale ones.
+            self._flush()
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops least recently used entries until the cache is back under 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, size FROM clause_cache ORDER BY last_access ASC"
+        )
+        doomed = []
+        total = self._total_bytes
+        for key, size in rows:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM clause_cache WHERE key = ?", doomed)
+        self._total_bytes = total
+        print(f"Clause cache evicted {len(doomed)} entries.")
+
+    def invalidate(self, model_id=None, prompt_version=None, kind=None):
+        """Deletes matching entries (all entries when no filter is given) and returns the count."""
+        filters, params = [], []
+        for column, value in (("model_id", model_id), ("prompt_version", prompt_version), ("kind", kind)):
+            if value is not None:
+                filters.append(f"{column} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        with self._lock:
+            deleted = self._conn.execute(f"DELETE FROM clause_cache{where}", params).rowcount
+            self._total_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM clause_cache"
+            ).fetchone()[0]
+            self._conn.commit()
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            self._flush()
+            self._conn.commit()
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clause_cache"
+            ).fetchone()
+            counters = dict(self._conn.execute("SELECT name, value FROM cache_counters"))
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+            "total_hits": counters.get("hits", 0),
+            "total_misses": counters.get("misses", 0),
+        }
+
+
+def get_clause_cache():
+    """Returns the process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not CACHE_CONFIG["enabled"]:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ClauseCache(CACHE_CONFIG["path"], CACHE_CONFIG["max_bytes"])
+                # Counters and access times still in memory are written when the process exits.
+                atexit.register(_cache.close)
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the clause analysis cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show cache size and hit/miss counters.")
+    clear = subparsers.add_parser("clear", help="Invalidate cached results.")
+    clear.add_argument("--model", help="Only entries produced by this model id.")
+    clear.add_argument("--prompt-version", help="Only entries produced by this prompt version.")
+    clear.add_argument("--kind", help="Only entries of this kind, e.g. 'analysis'.")
+    args = parser.parse_args()
+
+    cache = ClauseCache(CACHE_CONFIG["path"], CACHE_CONFIG["max_bytes"])
+    if args.command == "stats":
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
+    else:
+        deleted = cache.invalidate(model_id=args.model, prompt_version=args.prompt_version, kind=args.kind)
+        print(f"Removed {deleted} cached entries.")
+
+
+if __name__ == "__main__":
+    main()
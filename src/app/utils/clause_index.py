@@ -0,0 +1,216 @@
+# clause_index.py
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import numpy as np
+from .config import INDEX_CONFIG, EMBEDDING_CONFIG, REWRITE_CONFIG
+
+_index = None
+_index_lock = threading.Lock()
+
+# Analysis fields stored with each indexed clause and handed back on reuse. The
+# rewrite is not among them: it belongs to the exact text it was written for.
+ANALYSIS_FIELDS = ["regulation", "summary", "risk_level", "risk_percent", "key_clauses"]
+
+_NUMBER_WORDS = (
+    "one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|fifteen|twenty|thirty|forty|fifty|"
+    "sixty|ninety|hundred|thousand|million|billion|half|double|twice"
+)
+# Amounts, durations and percentages, with any magnitude suffix ($1M, 5,000, 30%).
+_NUMBER_PATTERN = re.compile(
+    rf"[$€£]?\d+(?:[.,]\d+)*(?:\s*%|\s*(?:k|m|bn|million|billion)\b)?|\b(?:{_NUMBER_WORDS})\b", re.IGNORECASE
+)
+# Quoted defined terms and capitalized names ("Company", Party A, Executive).
+_TERM_PATTERN = re.compile(r"[\"“]([^\"”]{1,60})[\"”]|\b([A-Z][\w'-]*)")
+
+
+def salient_terms(clause):
+    """The numbers and defined terms of a clause, which embeddings barely tell apart."""
+    numbers = {re.sub(r"[\s,]", "", match.group(0).lower()) for match in _NUMBER_PATTERN.finditer(clause)}
+    terms = {quoted or name for quoted, name in _TERM_PATTERN.findall(clause)}
+    return numbers, terms
+
+
+def _normalize(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+class ClauseIndex:
+    """
+    Vector index of already-analyzed clauses for near-duplicate reuse.
+    Unit-normalized embeddings live in one in-memory NumPy matrix, so a lookup
+    is a single matrix product (cosine similarity) plus a top-k; entries are
+    persisted in SQLite with their analysis and source. Only entries produced
+    by the current embedding space and prompt version are loaded (see index_key).
+    """
+
+    def __init__(self, path, model_name, prompt_version):
+        self.path = path
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self.reused = 0
+        self.term_mismatches = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS clause_vectors (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model_name TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                contract TEXT,
+                clause_id INTEGER,
+                clause TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_clause_vectors_model ON clause_vectors(model_name, prompt_version);
+            """
+        )
+        self._conn.commit()
+
+        rows = self._conn.execute(
+            "SELECT contract, clause_id, clause, analysis, vector FROM clause_vectors "
+            "WHERE model_name = ? AND prompt_version = ? ORDER BY id",
+            (model_name, prompt_version),
+        ).fetchall()
+        self._entries = [
+            {
+                "contract": contract, "clause_id": clause_id, "clause": clause,
+                # Entries indexed before rewrites were dropped may still carry one.
+                "analysis": {field: value for field, value in json.loads(analysis).items() if field in ANALYSIS_FIELDS},
+            }
+            for contract, clause_id, clause, analysis, _ in rows
+        ]
+        # Rows past self._size are spare capacity, doubled as the index grows.
+        self._matrix = (
+            np.vstack([np.frombuffer(vector, dtype=np.float32) for *_, vector in rows])
+            if rows else None
+        )
+        self._size = len(rows)
+
+    @property
+    def size(self):
+        return self._size
+
+    def search(self, vectors, k=1):
+        """Returns, for each query vector, up to k (similarity, entry) pairs, best first."""
+        queries = _normalize(vectors)
+        with self._lock:
+            if not self._size:
+                return [[] for _ in range(len(queries))]
+            scores = queries @ self._matrix[:self._size].T
+            entries = self._entries
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            ranked = candidates[np.argsort(-row[candidates])]
+            results.append([(float(row[i]), entries[i]) for i in ranked])
+        return results
+
+    def find_matches(self, vectors, threshold, clauses=None):
+        """
+        Best stored entry per vector when its cosine similarity is at least
+        threshold, else None. With the query clauses given, a match must also
+        have exactly the same numbers and defined terms (see salient_terms).
+        """
+        matches = []
+        for i, hits in enumerate(self.search(vectors, k=1)):
+            if not hits or hits[0][0] < threshold:
+                matches.append(None)
+                continue
+            similarity, entry = hits[0]
+            if clauses is not None and salient_terms(clauses[i]) != salient_terms(entry["clause"]):
+                self.term_mismatches += 1
+                matches.append(None)
+                continue
+            matches.append({**entry, "similarity": round(similarity, 4)})
+        return matches
+
+    def add(self, vector, clause, analysis, contract=None, clause_id=None):
+        stored = {field: analysis.get(field) for field in ANALYSIS_FIELDS}
+        normalized = _normalize(vector)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO clause_vectors(model_name, prompt_version, contract, clause_id, clause, "
+                    "analysis, vector, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        self.model_name, self.prompt_version, contract, clause_id, clause,
+                        json.dumps(stored), normalized.tobytes(), time.time(),
+                    ),
+                )
+            self._entries.append({"contract": contract, "clause_id": clause_id, "clause": clause, "analysis": stored})
+            if self._matrix is None:
+                self._matrix = np.zeros((64, normalized.shape[1]), dtype=np.float32)
+            elif self._size == len(self._matrix):
+                self._matrix = np.vstack([self._matrix, np.zeros_like(self._matrix)])
+            self._matrix[self._size] = normalized[0]
+            self._size += 1
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                deleted = self._conn.execute("DELETE FROM clause_vectors").rowcount
+            self._entries = []
+            self._matrix = None
+            self._size = 0
+        return deleted
+
+
+def index_key():
+    """
+    The (model_name, prompt_version) the index is keyed on. Vectors from the
+    hf, onnx and hashing backends live in different spaces even for the same
+    model, so the backend is part of the name; the stored analyses come from
+    the classification prompt under two-phase analysis (see REWRITE_CONFIG).
+    """
+    from .llm_analyzer import CLASSIFY_PROMPT_VERSION, STRUCTURED_PROMPT_VERSION
+    prompt_version = CLASSIFY_PROMPT_VERSION if REWRITE_CONFIG["two_phase"] else STRUCTURED_PROMPT_VERSION
+    return f"{EMBEDDING_CONFIG['backend']}:{EMBEDDING_CONFIG['model_name']}", prompt_version
+
+
+def get_clause_index():
+    """Returns the process-wide clause index, or None when near-duplicate reuse is disabled."""
+    global _index
+    if not INDEX_CONFIG["enabled"]:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ClauseIndex(INDEX_CONFIG["path"], *index_key())
+    return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the near-duplicate clause index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show how many clauses are indexed.")
+    subparsers.add_parser("clear", help="Remove every indexed clause.")
+    args = parser.parse_args()
+
+    index = ClauseIndex(INDEX_CONFIG["path"], *index_key())
+    if args.command == "stats":
+        print(f"indexed clauses: {index.size}")
+        print(f"threshold: {INDEX_CONFIG['threshold']}")
+    else:
+        print(f"Removed {index.clear()} indexed clauses.")
+
+
+if __name__ == "__main__":
+    main()
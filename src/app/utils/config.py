@@ -1,30 +1,56 @@
 # config.py
 import os
-from groq import Groq
 from dotenv import load_dotenv
 
 load_dotenv()
 
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GITHUB_MODELS_API_URL = os.getenv("GITHUB_MODELS_API_URL", "https://models.github.ai/inference/chat/completions")
+
 MODEL_CONFIG = {
     "primary": {
         "provider": "groq",
         "model_id": "llama-3.3-70b-versatile",
-        "client": Groq(api_key=os.getenv("GROQ_API_KEY"))
+        "api_url": GROQ_API_URL,
+        "rpm": 30,
+        "tpm": 12000,
+        "json_mode": True,
+        "batch_max_input_tokens": 6000,
+        "batch_max_output_tokens": 6000,
+        "chunk_max_tokens": 350
     },
     "groq_fallback_1": {
         "provider": "groq",
         "model_id": "llama3-70b-8192", 
-        "client": Groq(api_key=os.getenv("GROQ_API_KEY"))
+        "api_url": GROQ_API_URL,
+        "rpm": 30,
+        "tpm": 6000,
+        "json_mode": True,
+        "batch_max_input_tokens": 3000,
+        "batch_max_output_tokens": 3000,
+        "chunk_max_tokens": 350
     },
     "groq_fallback_2": {
         "provider": "groq",
         "model_id": "gemma-7b-it", 
-        "client": Groq(api_key=os.getenv("GROQ_API_KEY"))
+        "api_url": GROQ_API_URL,
+        "rpm": 30,
+        "tpm": 15000,
+        "json_mode": False,
+        "batch_max_input_tokens": 3000,
+        "batch_max_output_tokens": 3000,
+        "chunk_max_tokens": 300
     },
     "github_fallback": {
         "provider": "github",
         "model_id": "openai/gpt-4o",
-        "api_url": "https://models.github.ai/inference/chat/completions"
+        "rpm": 10,
+        "tpm": 40000,
+        "json_mode": True,
+        "batch_max_input_tokens": 6000,
+        "batch_max_output_tokens": 4000,
+        "chunk_max_tokens": 400,
+        "api_url": GITHUB_MODELS_API_URL
     }
 }
 
@@ -34,4 +60,228 @@ MODEL_PREFERENCE_ORDER = [
     "groq_fallback_1", 
     "groq_fallback_2", 
     "github_fallback"
-]
\ No newline at end of file
+]
+
+
+EMBEDDING_CONFIG = {
+    # "hf" loads model_name with sentence-transformers; "onnx" runs its quantized ONNX export with onnxruntime;
+    # "hashing" needs no model (benchmarks, offline runs).
+    "backend": os.getenv("EMBEDDING_BACKEND", "hf"),
+    "model_name": "sentence-transformers/all-MiniLM-L6-v2",
+    "device": "cpu",
+    "batch_size": int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+    # Intra-op threads for torch or onnxruntime; 0 keeps the library's default.
+    "num_threads": int(os.getenv("EMBEDDING_NUM_THREADS", "0")),
+    # ONNX export within the model's repo; onnx/model_qint8_avx512.onnx suits AVX-512 nodes.
+    "onnx_file": os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx"),
+    # Local directory with onnx_file and tokenizer.json, for nodes without Hugging Face Hub access.
+    "onnx_path": os.getenv("EMBEDDING_ONNX_PATH") or None,
+    # Token limit per text; sentence-transformers truncates all-MiniLM-L6-v2 at 256.
+    "max_length": 256,
+}
+
+
+CACHE_CONFIG = {
+    "enabled": os.getenv("CLAUSE_CACHE_ENABLED", "true").lower() == "true",
+    "path": os.getenv(
+        "CLAUSE_CACHE_PATH",
+        os.path.join(os.path.expanduser("~"), ".cache", "compliance_checker", "clause_cache.db")
+    ),
+    "max_bytes": int(os.getenv("CLAUSE_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    # Lookups only update in-memory hit/miss counters and access times; they are written
+    # out on put, on close, and once flush_every lookups or flush_interval_s have passed.
+    "flush_every": int(os.getenv("CLAUSE_CACHE_FLUSH_EVERY", "256")),
+    "flush_interval_s": float(os.getenv("CLAUSE_CACHE_FLUSH_S", "30")),
+}
+
+
+BATCH_CONFIG = {
+    # Pack several clauses into one prompt, within the model's batch_max_* token budgets.
+    "enabled": os.getenv("LLM_BATCH_MODE", "false").lower() == "true",
+}
+
+
+LLM_CLIENT_CONFIG = {
+    # Upper bound on clause requests in flight across all providers.
+    "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+    "max_keepalive_connections": int(os.getenv("LLM_MAX_KEEPALIVE", "20")),
+    "connect_timeout_s": float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+    "request_timeout_s": float(os.getenv("LLM_REQUEST_TIMEOUT", "60")),
+}
+
+
+SCHEDULER_CONFIG = {
+    # AIMD concurrency per model: grow slowly on success, halve on a 429.
+    "initial_concurrency": int(os.getenv("LLM_INITIAL_CONCURRENCY", "4")),
+    "max_concurrency_per_model": int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "16")),
+    "additive_increase": 1.0,
+    "multiplicative_decrease": 0.5,
+    # 429s are retried on the same model this many times before falling back.
+    "max_throttle_retries": int(os.getenv("LLM_MAX_THROTTLE_RETRIES", "3")),
+    "default_retry_after_s": 5.0,
+    "poll_interval_s": 0.05,
+}
+
+
+HEALTH_CONFIG = {
+    # Circuit breaker per model: open after failure_rate_threshold of the last
+    # `window` calls fail (once min_requests have been seen), probe after cooldown_s.
+    "window": int(os.getenv("CIRCUIT_WINDOW", "20")),
+    "min_requests": int(os.getenv("CIRCUIT_MIN_REQUESTS", "5")),
+    "failure_rate_threshold": float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5")),
+    "cooldown_s": float(os.getenv("CIRCUIT_COOLDOWN", "30")),
+    # When every circuit is open, a clause waits up to this long for a cooldown to end or
+    # a half-open probe to succeed before it is given up as failed.
+    "wait_s": float(os.getenv("CIRCUIT_WAIT", "60")),
+}
+
+
+PIPELINE_CONFIG = {
+    # Bounded queues between the extraction, chunking and LLM stages.
+    "page_queue_size": int(os.getenv("PIPELINE_PAGE_QUEUE", "8")),
+    "clause_queue_size": int(os.getenv("PIPELINE_CLAUSE_QUEUE", "64")),
+    # Characters of page text buffered before each semantic chunking pass.
+    "chunk_window_chars": int(os.getenv("PIPELINE_CHUNK_WINDOW", "20000")),
+    # In batch mode, how long a worker waits for more clauses to fill a batch.
+    "batch_linger_s": float(os.getenv("PIPELINE_BATCH_LINGER", "0.5")),
+}
+
+
+SHEETS_CONFIG = {
+    # Rows are appended in the background once batch_size are waiting or flush_interval_s passes.
+    "batch_size": int(os.getenv("SHEETS_BATCH_SIZE", "200")),
+    "flush_interval_s": float(os.getenv("SHEETS_FLUSH_INTERVAL", "2")),
+    "max_retries": int(os.getenv("SHEETS_MAX_RETRIES", "3")),
+    "retry_backoff_s": 1.0,
+    # Rows that still fail after the retries are kept here instead of being dropped.
+    "spool_path": os.getenv(
+        "SHEETS_SPOOL_PATH",
+        os.path.join(os.path.expanduser("~"), ".cache", "compliance_checker", "unsent_rows.jsonl")
+    ),
+}
+
+
+RESULTS_CONFIG = {
+    # "sheets", "sqlite", "both", or "auto" (Sheets when credentials exist, else SQLite).
+    "backend": os.getenv("RESULTS_BACKEND", "auto"),
+    "path": os.getenv(
+        "RESULTS_DB_PATH",
+        os.path.join(os.path.expanduser("~"), ".cache", "compliance_checker", "results.db")
+    ),
+    "batch_size": int(os.getenv("RESULTS_BATCH_SIZE", "200")),
+}
+
+
+BATCH_ENGINE_CONFIG = {
+    # Processes used for extraction and chunking in batch runs.
+    "workers": int(os.getenv("BATCH_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))),
+    # Documents chunked or analyzed at the same time; bounds memory on large runs.
+    "documents_in_flight": int(os.getenv("BATCH_DOCUMENTS_IN_FLIGHT", "8")),
+}
+
+
+INDEX_CONFIG = {
+    # Reuse the stored analysis of a clause whose embedding is this similar (cosine) to one already analyzed.
+    "enabled": os.getenv("CLAUSE_INDEX_ENABLED", "true").lower() == "true",
+    "threshold": float(os.getenv("CLAUSE_INDEX_THRESHOLD", "0.95")),
+    "path": os.getenv(
+        "CLAUSE_INDEX_PATH",
+        os.path.join(os.path.expanduser("~"), ".cache", "compliance_checker", "clause_index.db")
+    ),
+}
+
+
+TRIAGE_CONFIG = {
+    # Local rules that answer clearly non-regulatory chunks (signatures, headings, addresses) without an LLM call.
+    "enabled": os.getenv("TRIAGE_ENABLED", "true").lower() == "true",
+    # Optional nearest-centroid classifier over the clause embeddings for chunks the rules leave open.
+    "classifier": os.getenv("TRIAGE_CLASSIFIER", "false").lower() == "true",
+    "classifier_margin": float(os.getenv("TRIAGE_CLASSIFIER_MARGIN", "0.1")),
+}
+
+
+TELEMETRY_CONFIG = {
+    # Timing spans kept in memory for the Performance page.
+    "max_spans": int(os.getenv("TELEMETRY_MAX_SPANS", "20000")),
+    # Append every span to this JSON-lines file as it is recorded (off when empty).
+    "jsonl_path": os.getenv("TELEMETRY_JSONL_PATH", ""),
+    # Rewrite Prometheus-format counters here after each run, e.g. for a node_exporter textfile collector.
+    "prometheus_path": os.getenv("TELEMETRY_PROMETHEUS_PATH", ""),
+}
+
+
+REPORT_CONFIG = {
+    # Generated PDF/CSV/DOCX reports kept in memory, keyed by a hash of the results they cover.
+    "max_entries": int(os.getenv("REPORT_CACHE_ENTRIES", "16")),
+    # Background threads building large PDF reports.
+    "workers": int(os.getenv("REPORT_WORKERS", "2")),
+}
+
+
+CHUNK_CONFIG = {
+    # Merge semantic chunks under min_tokens into a neighbour and split chunks over the
+    # model's chunk_max_tokens (max_tokens when a model sets none) on sentence boundaries.
+    "enabled": os.getenv("CHUNK_NORMALIZE", "true").lower() == "true",
+    "min_tokens": int(os.getenv("CHUNK_MIN_TOKENS", "40")),
+    "max_tokens": int(os.getenv("CHUNK_MAX_TOKENS", "350")),
+}
+
+
+JOBS_CONFIG = {
+    # Checkpoints of queued and running analyses, so a rerun or restart can resume them.
+    "path": os.getenv(
+        "JOBS_DB_PATH",
+        os.path.join(os.path.expanduser("~"), ".cache", "compliance_checker", "jobs.db")
+    ),
+    # Uploaded contracts are kept here until they have been chunked.
+    "upload_dir": os.getenv(
+        "JOBS_UPLOAD_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "compliance_checker", "uploads")
+    ),
+    # Analyses run at the same time; further jobs wait in the queue.
+    "workers": int(os.getenv("JOB_WORKERS", "2")),
+    # How often the upload page and the cancel check poll a running job.
+    "poll_interval_s": float(os.getenv("JOB_POLL_INTERVAL", "1.0")),
+    # A process refreshes the jobs it owns this often; jobs whose owner has not done so for
+    # stale_after_s (or whose process is gone) are marked interrupted by any other process.
+    "heartbeat_s": float(os.getenv("JOB_HEARTBEAT_S", "10")),
+    "stale_after_s": float(os.getenv("JOB_STALE_AFTER_S", "60")),
+}
+
+
+HEDGE_CONFIG = {
+    # Send a duplicate of a slow clause request to the next model in
+    # MODEL_PREFERENCE_ORDER; the first valid answer wins and the other is cancelled.
+    "enabled": os.getenv("HEDGE_REQUESTS", "false").lower() == "true",
+    # Hedge once a request has run longer than this percentile of the model's recent latencies...
+    "percentile": float(os.getenv("HEDGE_PERCENTILE", "95")),
+    "window": int(os.getenv("HEDGE_WINDOW", "200")),
+    "min_samples": int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+    # ...or after initial_delay_s until min_samples latencies have been seen, and never before min_delay_s.
+    "initial_delay_s": float(os.getenv("HEDGE_INITIAL_DELAY", "10")),
+    "min_delay_s": float(os.getenv("HEDGE_MIN_DELAY", "0.5")),
+    # Hedges are capped at this fraction of primary requests (plus a small burst allowance).
+    "max_extra_ratio": float(os.getenv("HEDGE_MAX_EXTRA_RATIO", "0.1")),
+    "burst": int(os.getenv("HEDGE_BURST", "2")),
+}
+
+
+REVISION_CONFIG = {
+    # Clauses of a revised contract with the same normalized text as the prior
+    # version carry its analysis forward; the rest are paired with prior clauses
+    # at this embedding similarity or above and re-analyzed as modified.
+    "match_threshold": float(os.getenv("REVISION_MATCH_THRESHOLD", "0.8")),
+}
+
+
+REWRITE_CONFIG = {
+    # Classify every clause first with a small output budget, then rewrite only the
+    # clauses at `levels`; "false" asks for the rewrite in the analysis request itself.
+    "two_phase": os.getenv("TWO_PHASE_ANALYSIS", "true").lower() == "true",
+    # "background" rewrites a contract's risky clauses once they are classified; "lazy"
+    # waits until the summary page's "Show AI-Generated Modifications" is opened.
+    "mode": os.getenv("REWRITE_MODE", "background"),
+    "levels": ["High", "Medium"],
+    # Output budget of the classification request (the one-call analysis uses 500).
+    "classify_max_tokens": int(os.getenv("CLASSIFY_MAX_TOKENS", "250")),
+}
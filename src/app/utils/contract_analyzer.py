@@ -1,115 +1,1020 @@
 # contract_analyzer.py (Updated with improved fallback logic)
-from .data_handler import (
-    connect_sheet,
-    extract_text_from_file,
-    semantic_chunking,
-    get_next_id,
-    update_sheet_with_data
+from .data_handler import iter_pages, iter_clauses
+from .llm_analyzer import (
+    get_preferred_model_and_config,
+    analyze_clause_async,
+    analyze_clause_structured_async,
+    analyze_clause_batch_async,
+    pack_clause_batches,
+    estimate_tokens,
+    extract_key_clauses_async,
+    modify_clause_async,
+    StructuredOutputError
 )
-from .llm_analyzer import get_preferred_model_and_config, analyze_clause, extract_key_clauses
-from .config import MODEL_PREFERENCE_ORDER, MODEL_CONFIG
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from .llm_client import AsyncLLMClient, run_async
+from .config import (
+    MODEL_PREFERENCE_ORDER,
+    MODEL_CONFIG,
+    BATCH_CONFIG,
+    LLM_CLIENT_CONFIG,
+    PIPELINE_CONFIG,
+    INDEX_CONFIG,
+    TRIAGE_CONFIG,
+    TELEMETRY_CONFIG,
+    REWRITE_CONFIG,
+    HEALTH_CONFIG
+)
+from .clause_cache import get_clause_cache
+from .scheduler import get_scheduler
+from .health import get_breaker, healthy_model_order, breaker_stats, wait_for_model
+from .hedging import get_hedge_policy, hedge_stats
+from .clause_index import get_clause_index
+from .embedding_service import get_embedding_service
+from .triage import triage_reason, has_regulatory_signal, triage_analysis, get_triage_classifier, record_triage, triage_stats
+from .result_store import open_result_sink
+from .telemetry import get_telemetry
+import os
+import time
+import queue
+import asyncio
+import threading
+import contextvars
+
+# Marks the end of a stream on the page and clause queues.
+_STREAM_END = object()
+
+# Set when clause embeddings fail (e.g. no embedding model), so the rest of the
+# session skips near-duplicate reuse and embedding triage instead of failing on every clause.
+_embeddings_unavailable = None
+
+async def analyze_with_model(client, config, clause):
+    """
+    Runs the single-call structured analysis, falling back to the legacy
+    analyze_clause + extract_key_clauses pair when the model ignores the schema.
+    With two-phase analysis the structured call only classifies the clause;
+    rewrites come later from rewrite_clause_async.
+    """
+    try:
+        return await analyze_clause_structured_async(client, config, clause, rewrite=not REWRITE_CONFIG["two_phase"])
+    except StructuredOutputError as e:
+        print(f"⚠️ Structured output rejected for model {config['model_id']} ({e}). Using two-call analysis.")
+        get_telemetry().record(
+            "llm_fallback", model=config["model_id"], fallback_to="two-call analysis", reason=f"structured output: {e}"
+        )
+
+    (regulation, summary, risk_level, risk_percent, ai_modified_clause, ai_modified_risk_level), key_clauses = (
+        await asyncio.gather(
+            analyze_clause_async(client, config, clause),
+            extract_key_clauses_async(client, config, clause),
+        )
+    )
+    return {
+        "regulation": regulation,
+        "summary": summary,
+        "risk_level": risk_level,
+        "risk_percent": risk_percent,
+        "key_clauses": key_clauses,
+        "ai_modified_clause": ai_modified_clause,
+        "ai_modified_risk_level": ai_modified_risk_level,
+    }
+
+
+def build_clause_result(clause_id, clause, analysis):
+    """Turns an analysis dict into the UI result dict and the Google Sheets row."""
+    result = {
+        'clause_id': clause_id,
+        'clause': clause,
+        'regulation': analysis['regulation'],
+        'key_clauses': analysis['key_clauses'],
+        'risk_level': analysis['risk_level'],
+        'risk_percent': analysis['risk_percent'],
+        'summary': analysis['summary'],
+        'AI-Modified Clause': analysis['ai_modified_clause'],
+        'AI-Modified Risk Level': analysis['ai_modified_risk_level']
+    }
+
+    row = [
+        clause_id,
+        analysis['regulation'],
+        analysis['key_clauses'],
+        analysis['risk_level'],
+        analysis['risk_percent'],
+        analysis['summary'],
+        analysis['ai_modified_clause'] or "",
+        analysis['ai_modified_risk_level'] or ""
+    ]
+    return result, row
+
 
 def analyze_single_clause(clause, clause_id):
     """
-    Helper to analyze a single clause in parallel with robust model fallback.
-    It will try each model in MODEL_PREFERENCE_ORDER until one succeeds.
+    Analyze one clause from synchronous code with the same fallback as
+    analyze_single_clause_async.
     """
-    for model_name in MODEL_PREFERENCE_ORDER:
-        try:
-            print(f"Attempting to analyze Clause ID: {clause_id} with model: {model_name}")
-            config = MODEL_CONFIG.get(model_name)
-            if not config:
-                print(f"⚠️ Config for model '{model_name}' not found. Skipping.")
+    async def run():
+        async with AsyncLLMClient() as client:
+            return await analyze_single_clause_async(client, clause, clause_id)
+    return run_async(run())
+
+
+async def _attempt(client, model_name, clause, primary=True):
+    """
+    One analysis on one model, with its circuit breaker and hedge latency
+    bookkeeping. primary is False for a hedged backup request.
+    """
+    breaker = get_breaker(model_name)
+    policy = get_hedge_policy()
+    started = time.perf_counter()
+    try:
+        analysis = await analyze_with_model(client, MODEL_CONFIG[model_name], clause)
+    except asyncio.CancelledError:
+        breaker.release()
+        elapsed = time.perf_counter() - started
+        # A cancelled request took at least this long; dropping it would bias the percentile low.
+        # A backup cancelled early only shows the primary won, so it counts once past its own hedge delay.
+        if policy and (primary or elapsed >= policy.hedge_delay(model_name)):
+            policy.record_latency(model_name, elapsed)
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    if policy:
+        policy.record_latency(model_name, time.perf_counter() - started)
+    return analysis
+
+
+async def _analyze_hedged(client, clause, clause_id, model_name, backups, tried):
+    """
+    Analyzes the clause on model_name. With hedging enabled, a request still
+    running after the model's hedge delay is duplicated to the first backup not
+    yet tried; the first valid answer wins and the other request is cancelled.
+    Returns (winning model name, analysis) and adds every model used to tried.
+    """
+    tried.add(model_name)
+    policy = get_hedge_policy()
+    primary = asyncio.ensure_future(_attempt(client, model_name, clause))
+    tasks = {primary: model_name}
+    try:
+        backup = next((name for name in backups if name not in tried), None)
+        if not policy or backup is None:
+            return model_name, await primary
+        policy.record_primary()
+        delay = policy.hedge_delay(model_name)
+        await asyncio.wait({primary}, timeout=delay)
+        if primary.done() or not policy.try_acquire():
+            return model_name, await primary
+        if not get_breaker(backup).allow_request():
+            policy.release()
+            return model_name, await primary
+
+        tried.add(backup)
+        launched = time.perf_counter()
+        print(f"⏱️ Clause ID: {clause_id} still running on {model_name} after {delay:.2f}s; hedging to {backup}.")
+        tasks[asyncio.ensure_future(_attempt(client, backup, clause, primary=False))] = backup
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                winner = "primary" if task is primary else "backup"
+                elapsed = delay + time.perf_counter() - launched
+                saved = policy.estimate_saved(model_name, delay, elapsed) if winner == "backup" else 0.0
+                policy.record_outcome(winner, saved)
+                get_telemetry().record(
+                    "hedge", time.perf_counter() - launched, clause_id=clause_id,
+                    model=MODEL_CONFIG[model_name]["model_id"], backup=MODEL_CONFIG[backup]["model_id"],
+                    delay_s=round(delay, 4), winner=winner, saved_s=round(saved, 4)
+                )
+                return tasks[task], task.result()
+        policy.record_outcome(None)
+        get_telemetry().record(
+            "hedge", time.perf_counter() - launched, clause_id=clause_id,
+            model=MODEL_CONFIG[model_name]["model_id"], backup=MODEL_CONFIG[backup]["model_id"],
+            delay_s=round(delay, 4), winner=None, saved_s=0.0, status="failed"
+        )
+        raise error
+    finally:
+        # The losing request (or both, if this clause was cancelled) must not keep running.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def analyze_single_clause_async(client, clause, clause_id):
+    """
+    Helper to analyze a single clause concurrently with robust model fallback.
+    It tries the models in MODEL_PREFERENCE_ORDER whose circuit breakers are not
+    open, so an outage on one model does not cost every clause a failed request.
+    When every circuit is open, the clause waits (up to HEALTH_CONFIG["wait_s"])
+    for a cooldown to end or a probe to succeed instead of failing at once.
+    With HEDGE_CONFIG enabled, a slow request is also raced against the next model.
+    """
+    telemetry = get_telemetry()
+    started = time.perf_counter()
+    attempts = 0
+    deadline = time.monotonic() + HEALTH_CONFIG["wait_s"]
+    while True:
+        models = healthy_model_order()
+        tried = set()
+        attempts_before = attempts
+        for position, model_name in enumerate(models):
+            if model_name in tried:
                 continue
+            breaker = get_breaker(model_name)
+            if not breaker.allow_request():
+                continue
+            attempts += 1
+            try:
+                print(f"Attempting to analyze Clause ID: {clause_id} with model: {model_name}")
+                model_name, analysis = await _analyze_hedged(
+                    client, clause, clause_id, model_name, models[position + 1:], tried
+                )
+                config = MODEL_CONFIG[model_name]
 
-            regulation, summary, risk_level, risk_percent, ai_modified_clause, ai_modified_risk_level = analyze_clause(config, clause)
-            key_clauses = extract_key_clauses(config, clause)
-
-            result = {
-                'clause_id': clause_id,
-                'clause': clause,
-                'regulation': regulation,
-                'key_clauses': key_clauses,
-                'risk_level': risk_level,
-                'risk_percent': risk_percent,
-                'summary': summary,
-                'AI-Modified Clause': ai_modified_clause,
-                'AI-Modified Risk Level': ai_modified_risk_level
-            }
-
-            row = [
-                clause_id,
-                regulation,
-                key_clauses,
-                risk_level,
-                risk_percent,
-                summary
-            ]
-            
-            print(f"✅ Successfully analyzed Clause ID: {clause_id} with model: {model_name}")
-            return result, row
+                result, row = build_clause_result(clause_id, clause, analysis)
 
-        except Exception as e:
-            print(f"❌ FAILED to analyze Clause ID: {clause_id} with model: {model_name}. Error: {e}")
-            continue # Try the next model in the preference order
+                print(f"✅ Successfully analyzed Clause ID: {clause_id} with model: {model_name}")
+                telemetry.record(
+                    "clause", time.perf_counter() - started, clause_id=clause_id, model=config["model_id"],
+                    models_tried=attempts
+                )
+                return result, row
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ FAILED to analyze Clause ID: {clause_id} with model: {model_name}. Error: {e}")
+                telemetry.record(
+                    "llm_fallback", model=MODEL_CONFIG[model_name]["model_id"], clause_id=clause_id,
+                    reason=f"{type(e).__name__}: {e}".splitlines()[0]
+                )
+                continue # Try the next model in the preference order
+        # Only a pass in which every circuit turned the clause away waits for one to let it through.
+        if attempts > attempts_before or not await wait_for_model(deadline):
+            break
 
     # This part is reached only if all models fail for a clause
     print(f"🚨 ALL MODELS FAILED for Clause ID: {clause_id}. Returning empty data.")
+    telemetry.record(
+        "clause", time.perf_counter() - started, clause_id=clause_id, model=None, models_tried=attempts, status="failed"
+    )
     return None, None
 
 
-def analyze_contract_file(file_path):
+def needs_rewrite(result):
+    """Whether a result is at one of REWRITE_CONFIG's levels and has no AI-modified clause yet."""
+    return (
+        bool(result) and result.get('risk_level') in REWRITE_CONFIG["levels"]
+        and not result.get('AI-Modified Clause')
+    )
+
+
+async def rewrite_clause_async(client, clause, risk_level, clause_id=None):
     """
-    Analyze a contract file and return the analysis results.
+    Rewrites one clause with modify_clause_async, trying the models in
+    MODEL_PREFERENCE_ORDER whose circuit breakers are not open, and waiting for
+    one like analyze_single_clause_async when they all are.
+    Returns (rewritten clause, risk level), or None if every model failed.
     """
-    try:
-        wks = connect_sheet()
-        if not wks:
-            print("Failed to connect to Google Sheets")
+    telemetry = get_telemetry()
+    started = time.perf_counter()
+    deadline = time.monotonic() + HEALTH_CONFIG["wait_s"]
+    while True:
+        attempted = False
+        for model_name in healthy_model_order():
+            breaker = get_breaker(model_name)
+            if not breaker.allow_request():
+                continue
+            attempted = True
+            config = MODEL_CONFIG[model_name]
+            try:
+                rewrite = await modify_clause_async(client, config, clause, risk_level)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                print(f"❌ FAILED to rewrite Clause ID: {clause_id} with model: {model_name}. Error: {e}")
+                telemetry.record(
+                    "llm_fallback", model=config["model_id"], clause_id=clause_id,
+                    reason=f"rewrite {type(e).__name__}: {e}".splitlines()[0]
+                )
+                continue
+            breaker.record_success()
+            telemetry.record("rewrite", time.perf_counter() - started, clause_id=clause_id, model=config["model_id"])
+            return rewrite
+        if attempted or not await wait_for_model(deadline):
+            break
+    print(f"🚨 ALL MODELS FAILED to rewrite Clause ID: {clause_id}.")
+    telemetry.record("rewrite", time.perf_counter() - started, clause_id=clause_id, model=None, status="failed")
+    return None
+
+
+async def rewrite_results_async(client, results, on_rewrite=None):
+    """
+    Adds the AI-modified clause to each result dict concurrently, in place, and
+    calls on_rewrite(result) as each one succeeds. Results whose rewrite failed
+    on every model are left unchanged. Returns how many were rewritten.
+    """
+    async def rewrite(result):
+        rewrite = await rewrite_clause_async(client, result['clause'], result['risk_level'], result['clause_id'])
+        if rewrite is None:
             return None
+        # The level is the model's own assessment of the rewrite, empty if it gave none.
+        result['AI-Modified Clause'], result['AI-Modified Risk Level'] = rewrite
+        return result
+
+    rewritten = 0
+    tasks = [asyncio.ensure_future(rewrite(result)) for result in results]
+    try:
+        for outcome in asyncio.as_completed(tasks):
+            result = await outcome
+            if result is not None:
+                rewritten += 1
+                if on_rewrite:
+                    on_rewrite(result)
+    finally:
+        await _cancel_pending(tasks)
+    return rewritten
+
+
+def rewrite_results(results, on_rewrite=None):
+    """
+    Synchronous rewrite_results_async for the results that still need a rewrite
+    (see needs_rewrite), e.g. when REWRITE_CONFIG["mode"] is "lazy" and the
+    summary page asks for them.
+    """
+    pending = [result for result in results if needs_rewrite(result)]
+    if not pending:
+        return 0
+
+    async def run():
+        async with AsyncLLMClient() as client:
+            return await rewrite_results_async(client, pending, on_rewrite)
+    with get_telemetry().span("rewrite_phase", clauses=len(pending)) as span:
+        span["rewritten"] = run_async(run())
+    print(f"Rewrote {span['rewritten']} of {len(pending)} High/Medium risk clauses.")
+    return span["rewritten"]
+
+
+class ResultCollector:
+    """
+    Gathers (result, row) pairs as clauses finish and reports each one to an
+    optional on_result(result, progress) callback. result is None for a clause
+    that failed on every model. progress holds the number of clauses discovered,
+    analyzed and failed so far, and whether extraction has finished.
+    Each result is also written to the sink (a results backend), if given, so it
+    is stored while the rest of the contract is still being analyzed; results
+    are tagged with `contract` when one sink is shared by several contracts.
+    Clauses whose embedding is in `vectors` are added to the clause index once
+    analyzed, for near-duplicate reuse by later contracts, and clauses with an
+    entry in `provenance` get their page and character offsets attached.
+    High/Medium results without a rewrite (every one under two-phase analysis,
+    and reused near-duplicates) are reported at once but held back from the
+    sink and the clause index until rewrite_held has added their rewrite;
+    on_rewrite(result) is then called. In "lazy" mode nothing is held.
+    """
+
+    def __init__(self, on_result=None, discovered=0, sink=None, contract=None, on_rewrite=None):
+        self.on_result = on_result
+        self.on_rewrite = on_rewrite
+        self.sink = sink
+        self.contract = contract
+        self.vectors = {}
+        self.provenance = {}
+        self.held = {}
+        self.hold_rewrites = not (REWRITE_CONFIG["two_phase"] and REWRITE_CONFIG["mode"] == "lazy")
+        self.reused = 0
+        self.triaged = 0
+        self.rewritten = 0
+        self.pairs = []
+        self.progress = {
+            "discovered": discovered,
+            "analyzed": 0,
+            "failed": 0,
+            "extraction_done": discovered > 0,
+        }
+        self.started = time.perf_counter()
+
+    def add(self, result, row):
+        if result:
+            result.update(self.provenance.pop(result['clause_id'], {}))
+        if result and row:
+            if not self.pairs:
+                print(f"First clause result after {time.perf_counter() - self.started:.2f}s.")
+            self.pairs.append((result, row))
+            self.progress["analyzed"] += 1
+            if self.contract:
+                result["contract"] = self.contract
+            if self.hold_rewrites and needs_rewrite(result):
+                self.held[result['clause_id']] = (result, row)
+            else:
+                self._store(result, row)
+        else:
+            self.progress["failed"] += 1
+        if self.on_result:
+            self.on_result(result, dict(self.progress))
+
+    def _store(self, result, row):
+        if self.sink:
+            self.sink.write(result, row)
+        self._index(result)
 
-        expected_header = ["Clause ID", "Regulation", "Key Clauses (AI)", "Risk Level (AI)", "Risk % (AI)", "AI Summary"]
+    def add_rewrite(self, result):
+        """Stores a held result once its rewrite has been added."""
+        _, row = self.held.pop(result['clause_id'])
+        row[-2:] = [result['AI-Modified Clause'], result['AI-Modified Risk Level']]
+        self.rewritten += 1
+        self._store(result, row)
+        if self.on_rewrite:
+            self.on_rewrite(result)
 
-        current_header = wks.get_row(1, include_tailing_empty=False)
-        if current_header != expected_header:
-            wks.update_row(1, expected_header)
-            print("Header updated to match required columns.")
+    def release_held(self):
+        """Stores the held results without a rewrite, e.g. when the run is cancelled or a rewrite failed."""
+        held, self.held = self.held, {}
+        for result, row in held.values():
+            self._store(result, row)
 
-        print("Reading contract...")
-        contract_text = extract_text_from_file(file_path)
-        clauses = semantic_chunking(contract_text)
-        print(f"Extracted {len(clauses)} clauses from the document.")
+    def _index(self, result):
+        vector = self.vectors.pop(result['clause_id'], None)
+        index = get_clause_index()
+        if vector is None or not index or result['risk_level'] not in ("High", "Medium", "Low"):
+            return
+        analysis = {
+            "regulation": result['regulation'],
+            "summary": result['summary'],
+            "risk_level": result['risk_level'],
+            "risk_percent": result['risk_percent'],
+            "key_clauses": result['key_clauses'],
+        }
+        index.add(vector, result['clause'], analysis, contract=self.contract, clause_id=result['clause_id'])
 
-        starting_id = get_next_id(wks)
 
-        analysis_results = []
-        rows_to_append = []
+async def reuse_near_duplicates(indexed_clauses, collector):
+    """
+    Answers clauses that are near-duplicates of already-analyzed ones from the
+    clause index and returns the (clause_id, clause) pairs that still need the LLM.
+    A near-duplicate must also have the same numbers and defined terms. Reused
+    results record the source clause and the cosine similarity; their rewrite is
+    left empty so it is generated for this clause's own text (see needs_rewrite).
+    """
+    global _embeddings_unavailable
+    index = get_clause_index()
+    if not index or not indexed_clauses or _embeddings_unavailable:
+        return indexed_clauses
+    try:
+        vectors = await asyncio.to_thread(
+            get_embedding_service().embed_documents, [clause for _, clause in indexed_clauses]
+        )
+        matches = index.find_matches(vectors, INDEX_CONFIG["threshold"], [clause for _, clause in indexed_clauses])
+    except Exception as e:
+        _embeddings_unavailable = str(e)
+        print(f"⚠️ Near-duplicate reuse disabled for this session: {e}")
+        return indexed_clauses
+
+    remaining = []
+    for (clause_id, clause), vector, match in zip(indexed_clauses, vectors, matches):
+        if match is None:
+            collector.vectors[clause_id] = vector
+            remaining.append((clause_id, clause))
+            continue
+        result, row = build_clause_result(
+            clause_id, clause, {**match["analysis"], "ai_modified_clause": None, "ai_modified_risk_level": None}
+        )
+        result['reused_from'] = f"{match['contract'] or 'unknown'}#{match['clause_id']}"
+        result['reuse_similarity'] = match["similarity"]
+        print(
+            f"♻️ Clause ID: {clause_id} reuses the analysis of {result['reused_from']} "
+            f"(similarity {match['similarity']:.3f})."
+        )
+        index.reused += 1
+        collector.reused += 1
+        collector.add(result, row)
+    return remaining
 
-        # Parallel execution
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(analyze_single_clause, clause, starting_id + i): (i, clause)
-                for i, clause in enumerate(clauses)
-            }
 
-            for future in as_completed(futures):
+def _add_triaged(collector, clause_id, clause, reason):
+    result, row = build_clause_result(clause_id, clause, triage_analysis(clause, reason))
+    result['triage'] = reason
+    collector.vectors.pop(clause_id, None)
+    collector.triaged += 1
+    record_triage(reason)
+    collector.add(result, row)
+
+
+async def triage_locally(indexed_clauses, collector):
+    """
+    Marks clearly non-regulatory chunks (signature blocks, headings, addresses,
+    page furniture, fragments) as Low / None without a network call, using
+    keyword and regex rules. Returns the pairs that still need the LLM.
+    """
+    if not TRIAGE_CONFIG["enabled"]:
+        return indexed_clauses
+    remaining = []
+    for clause_id, clause in indexed_clauses:
+        reason = triage_reason(clause)
+        if reason:
+            _add_triaged(collector, clause_id, clause, reason)
+        else:
+            remaining.append((clause_id, clause))
+    return remaining
+
+
+async def classify_locally(indexed_clauses, collector):
+    """
+    Optional second triage pass: the embedding classifier marks chunks the rules
+    left open as non-regulatory when they sit clearly closer to the
+    non-regulatory examples. Chunks with regulatory keywords or an obligation
+    verb are never offered to it. Reuses the embeddings from the near-duplicate lookup.
+    """
+    global _embeddings_unavailable
+    if not TRIAGE_CONFIG["enabled"] or not indexed_clauses or _embeddings_unavailable:
+        return indexed_clauses
+    candidates = [pair for pair in indexed_clauses if not has_regulatory_signal(pair[1])]
+    if not candidates:
+        return indexed_clauses
+    try:
+        classifier = get_triage_classifier()
+        if classifier is None:
+            return indexed_clauses
+        missing = [pair for pair in candidates if pair[0] not in collector.vectors]
+        if missing:
+            vectors = await asyncio.to_thread(
+                get_embedding_service().embed_documents, [clause for _, clause in missing]
+            )
+            collector.vectors.update((clause_id, v) for (clause_id, _), v in zip(missing, vectors))
+        verdicts = classifier.is_non_regulatory([collector.vectors[clause_id] for clause_id, _ in candidates])
+    except Exception as e:
+        _embeddings_unavailable = str(e)
+        print(f"⚠️ Embedding triage disabled for this session: {e}")
+        return indexed_clauses
+
+    non_regulatory = {clause_id for (clause_id, _), verdict in zip(candidates, verdicts) if verdict}
+    remaining = []
+    for clause_id, clause in indexed_clauses:
+        if clause_id in non_regulatory:
+            _add_triaged(collector, clause_id, clause, "embedding classifier")
+        else:
+            remaining.append((clause_id, clause))
+    return remaining
+
+
+async def resolve_locally(indexed_clauses, collector):
+    """
+    Answers every clause that does not need an LLM call (rule triage, then
+    near-duplicate reuse, then the optional embedding classifier) and returns
+    the (clause_id, clause) pairs that still do.
+    """
+    with get_telemetry().span("local_resolution", clauses=len(indexed_clauses)) as span:
+        indexed_clauses = await triage_locally(indexed_clauses, collector)
+        indexed_clauses = await reuse_near_duplicates(indexed_clauses, collector)
+        indexed_clauses = await classify_locally(indexed_clauses, collector)
+        span["sent_to_llm"] = len(indexed_clauses)
+    return indexed_clauses
+
+
+async def _analyze_batch_on_healthy_models(client, batch, rewrite):
+    """
+    Sends a packed batch to the models in healthy_model_order, recording each
+    outcome on the model's circuit breaker like _attempt does. Clauses of a
+    request that fails move on to the next model, repacked for its token budget.
+    Returns (analyses by clause ID, model IDs that answered, clauses no model took).
+    """
+    analyses, models, remaining = {}, [], list(batch)
+    for model_name in healthy_model_order():
+        if not remaining:
+            break
+        breaker = get_breaker(model_name)
+        config = MODEL_CONFIG[model_name]
+        failed = []
+        for sub_batch in pack_clause_batches(remaining, config, rewrite=rewrite):
+            if failed or not breaker.allow_request():
+                failed.extend(sub_batch)
+                continue
+            try:
+                analyses.update(await analyze_clause_batch_async(client, config, sub_batch, rewrite=rewrite))
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                print(f"❌ Batch of {len(sub_batch)} clauses failed with model {config['model_id']}: {e}.")
+                failed.extend(sub_batch)
+                continue
+            breaker.record_success()
+            if config["model_id"] not in models:
+                models.append(config["model_id"])
+        remaining = failed
+    return analyses, models, remaining
+
+
+async def _run_clause_batch(client, batch_number, batch):
+    """
+    Analyzes one packed batch on the healthy models and retries any clause it
+    did not return, one at a time.
+    """
+    started = time.perf_counter()
+    analyses, models, unsent = await _analyze_batch_on_healthy_models(
+        client, batch, rewrite=not REWRITE_CONFIG["two_phase"]
+    )
+    status = "failed" if unsent else "ok"
+    if unsent:
+        print(f"❌ Batch {batch_number}: no model took {len(unsent)} of its clauses. Retrying them individually.")
+    latency = time.perf_counter() - started
+
+    pairs = [
+        build_clause_result(clause_id, clause, analyses[clause_id])
+        for clause_id, clause in batch if clause_id in analyses
+    ]
+    missing = [(clause_id, clause) for clause_id, clause in batch if clause_id not in analyses]
+    retried = len(missing)
+    pairs.extend(await asyncio.gather(
+        *(analyze_single_clause_async(client, clause, clause_id) for clause_id, clause in missing)
+    ))
+
+    report = {
+        "batch": batch_number,
+        "model": ", ".join(models) or None,
+        "clauses": len(batch),
+        "input_tokens_est": sum(estimate_tokens(clause) for _, clause in batch),
+        "latency_s": round(latency, 3),
+        "status": status,
+        "retried_individually": retried,
+    }
+    print(
+        f"Batch {batch_number}: {report['clauses']} clauses, ~{report['input_tokens_est']} input tokens, "
+        f"{report['latency_s']}s, {status}, {retried} retried individually."
+    )
+    get_telemetry().record(
+        "llm_batch", latency, model=report["model"], batch=batch_number, clauses=len(batch),
+        status=status, retried_individually=retried
+    )
+    return pairs, report
+
+
+async def analyze_clauses_in_batches(client, indexed_clauses, collector=None):
+    """
+    Packs (clause_id, clause) pairs into multi-clause prompts for the first healthy
+    model and analyzes the batches concurrently (see _run_clause_batch).
+    Returns (result/row pairs, per-batch report); pairs are also fed to the
+    collector as each batch completes.
+    """
+    healthy = healthy_model_order() or [name for name in MODEL_PREFERENCE_ORDER if name in MODEL_CONFIG]
+    config = MODEL_CONFIG[healthy[0]]
+    batches = pack_clause_batches(indexed_clauses, config, rewrite=not REWRITE_CONFIG["two_phase"])
+    print(f"Packed {len(indexed_clauses)} clauses into {len(batches)} batches for model {config['model_id']}.")
+
+    pairs, report = [], []
+    tasks = [
+        asyncio.ensure_future(_run_clause_batch(client, number, batch))
+        for number, batch in enumerate(batches, start=1)
+    ]
+    try:
+        for outcome in asyncio.as_completed(tasks):
+            batch_pairs, batch_report = await outcome
+            pairs.extend(batch_pairs)
+            report.append(batch_report)
+            if collector:
+                for result, row in batch_pairs:
+                    collector.add(result, row)
+    finally:
+        await _cancel_pending(tasks)
+
+    report.sort(key=lambda r: r["batch"])
+    if report:
+        avg_size = sum(r["clauses"] for r in report) / len(report)
+        avg_latency = sum(r["latency_s"] for r in report) / len(report)
+        print(f"Batch summary: {len(report)} batches, {avg_size:.1f} clauses/batch, {avg_latency:.2f}s avg latency.")
+    return pairs, report
+
+
+async def analyze_clauses_async(indexed_clauses, batch_mode=False, on_result=None, sink=None, contract=None,
+                                provenance=None, on_rewrite=None):
+    """
+    Analyzes (clause_id, clause) pairs over one pooled AsyncLLMClient and
+    returns the successful (result, row) pairs.
+    on_result(result, progress) is called as each clause completes, and
+    on_rewrite(result) as a background rewrite is added to one.
+    provenance maps clause IDs to extra fields (pages, offsets, revision status)
+    attached to their results.
+    """
+    collector = ResultCollector(
+        on_result, discovered=len(indexed_clauses), sink=sink, contract=contract, on_rewrite=on_rewrite
+    )
+    collector.provenance.update(provenance or {})
+    async with AsyncLLMClient() as client:
+        await analyze_indexed_clauses(client, indexed_clauses, collector, batch_mode)
+    return collector.pairs
+
+
+async def analyze_indexed_clauses(client, indexed_clauses, collector, batch_mode=False):
+    """
+    Analyzes (clause_id, clause) pairs on an existing client, feeding the
+    collector, then rewrites the results it held back (see rewrite_held).
+    """
+    try:
+        await _classify_indexed_clauses(client, indexed_clauses, collector, batch_mode)
+        await rewrite_held(client, collector)
+    finally:
+        collector.release_held()
+
+
+async def rewrite_held(client, collector):
+    """Second phase of two-phase analysis: rewrites the High/Medium results the collector holds."""
+    if not collector.held:
+        return
+    held = [result for result, _ in collector.held.values()]
+    with get_telemetry().span("rewrite_phase", clauses=len(held)) as span:
+        span["rewritten"] = await rewrite_results_async(client, held, collector.add_rewrite)
+    print(f"Rewrote {span['rewritten']} of {len(held)} High/Medium risk clauses.")
+
+
+async def _classify_indexed_clauses(client, indexed_clauses, collector, batch_mode):
+    indexed_clauses = await resolve_locally(indexed_clauses, collector)
+    if not indexed_clauses:
+        return
+    if batch_mode:
+        await analyze_clauses_in_batches(client, indexed_clauses, collector)
+        return
+
+    tasks = [
+        asyncio.ensure_future(analyze_single_clause_async(client, clause, clause_id))
+        for clause_id, clause in indexed_clauses
+    ]
+    try:
+        for outcome in asyncio.as_completed(tasks):
+            try:
+                result, row = await outcome
+            except Exception as e:
+                print(f"Error processing clause result: {e}")
+                result, row = None, None
+            collector.add(result, row)
+    finally:
+        await _cancel_pending(tasks)
+
+
+async def _cancel_pending(tasks):
+    """
+    Cancels the clause tasks still running, e.g. when the caller was cancelled,
+    and waits for them so none outlives the client it was started on.
+    """
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _put_until_stopped(target_queue, item, stop):
+    while not stop.is_set():
+        try:
+            target_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce_clauses(file_path, next_id, loop, clause_queue, stop, progress, provenance, on_clause=None, skip=()):
+    """
+    Extraction and chunking stages of the streaming pipeline, run off the event loop.
+    A reader thread feeds pages through a bounded queue into the chunker, and
+    finished (clause_id, clause) pairs are pushed onto the bounded asyncio queue,
+    so each stage blocks when the next one falls behind.
+    next_id() allocates the ID of each clause as it is found, and the clause's
+    pages and offsets are recorded in provenance under that ID. on_clause(clause_id,
+    clause) is called with each clause dict before it is queued; clause IDs in
+    skip are not queued for analysis.
+    """
+    page_queue = queue.Queue(maxsize=PIPELINE_CONFIG["page_queue_size"])
+
+    def read_pages():
+        try:
+            for page in iter_pages(file_path):
+                if not _put_until_stopped(page_queue, page, stop):
+                    return
+            _put_until_stopped(page_queue, _STREAM_END, stop)
+        except Exception as e:
+            _put_until_stopped(page_queue, e, stop)
+
+    def pages():
+        while True:
+            item = page_queue.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def emit(item):
+        if not stop.is_set():
+            asyncio.run_coroutine_threadsafe(clause_queue.put(item), loop).result()
+
+    # Copy the context so extraction spans are tagged with the caller's telemetry run.
+    threading.Thread(target=contextvars.copy_context().run, args=(read_pages,), daemon=True).start()
+    count = 0
+    try:
+        for clause in iter_clauses(pages(), PIPELINE_CONFIG["chunk_window_chars"]):
+            if stop.is_set():
+                return count
+            clause_id = next_id()
+            provenance[clause_id] = {key: value for key, value in clause.items() if key != "clause"}
+            if on_clause:
+                on_clause(clause_id, clause)
+            count += 1
+            progress["discovered"] = count
+            if clause_id not in skip:
+                emit((clause_id, clause["clause"]))
+        progress["extraction_done"] = True
+        emit(_STREAM_END)
+    except Exception as e:
+        emit(e)
+    return count
+
+
+async def _next_clause(clause_queue):
+    """
+    Takes the next (clause_id, clause) pair off the queue.
+    Returns None at the end of the stream and re-raises a producer error.
+    End markers are put back so the other workers see them too.
+    """
+    item = await clause_queue.get()
+    if item is _STREAM_END or isinstance(item, Exception):
+        clause_queue.put_nowait(item)
+        if isinstance(item, Exception):
+            raise item
+        return None
+    return item
+
+
+async def analyze_contract_stream(file_path, next_id, batch_mode=False, on_result=None, sink=None, contract=None,
+                                  on_clause=None, skip=(), on_rewrite=None):
+    """
+    Streaming extraction -> chunking -> analysis pipeline.
+    Pages stream into the chunker and clauses stream into the LLM workers through
+    bounded queues, so the first requests go out before the document is fully read.
+    Returns the successful (result, row) pairs; on_result(result, progress) is
+    called as each clause completes and on_rewrite(result) as a rewrite is added.
+    on_clause(clause_id, clause) sees every clause dict as it is chunked, and clause
+    IDs in skip (e.g. already analyzed by an earlier run) are chunked but not analyzed.
+    """
+    loop = asyncio.get_running_loop()
+    clause_queue = asyncio.Queue(maxsize=PIPELINE_CONFIG["clause_queue_size"])
+    stop = threading.Event()
+    collector = ResultCollector(on_result, sink=sink, contract=contract, on_rewrite=on_rewrite)
+
+    async def clause_worker(client):
+        while True:
+            item = await _next_clause(clause_queue)
+            if item is None:
+                return
+            if not await resolve_locally([item], collector):
+                continue
+            clause_id, clause = item
+            collector.add(*await analyze_single_clause_async(client, clause, clause_id))
+
+    async def run_batch(client, batch):
+        batch = await resolve_locally(batch, collector)
+        if not batch:
+            return
+        batch_pairs, _ = await _run_clause_batch(client, batch[0][0], batch)
+        for result, row in batch_pairs:
+            collector.add(result, row)
+
+    async def batch_packer(client):
+        # A single packer fills each batch before dispatching it, so batches stay
+        # close to the token budget instead of being split across many workers.
+        healthy = healthy_model_order() or [name for name in MODEL_PREFERENCE_ORDER if name in MODEL_CONFIG]
+        config = MODEL_CONFIG[healthy[0]]
+        in_flight = asyncio.Semaphore(LLM_CLIENT_CONFIG["max_concurrency"])
+        tasks = []
+        carry = None
+        while True:
+            first = carry or await _next_clause(clause_queue)
+            carry = None
+            if first is None:
+                break
+            # Keep packing clauses until the model's token budget is full or the linger time runs out.
+            batch = [first]
+            deadline = loop.time() + PIPELINE_CONFIG["batch_linger_s"]
+            while True:
                 try:
-                    result, row = future.result()
-                    if result and row: # Only append if the analysis was successful
-                        analysis_results.append(result)
-                        rows_to_append.append(row)
-                except Exception as e:
-                    print(f"Error processing future result: {e}")
-
-        
-        if analysis_results:
-            analysis_results.sort(key=lambda x: x['clause_id'])
-        if rows_to_append:
-            rows_to_append.sort(key=lambda x: x[0])
-
-        update_sheet_with_data(wks, rows_to_append)
-        print("Analysis completed and data updated in Google Sheets.")
+                    item = await asyncio.wait_for(_next_clause(clause_queue), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    break
+                if len(pack_clause_batches(batch + [item], config, rewrite=not REWRITE_CONFIG["two_phase"])) > 1:
+                    carry = item
+                    break
+                batch.append(item)
+            await in_flight.acquire()
+            task = asyncio.create_task(run_batch(client, batch))
+            task.add_done_callback(lambda _: in_flight.release())
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+
+    producer = loop.run_in_executor(
+        None, contextvars.copy_context().run,
+        _produce_clauses, file_path, next_id, loop, clause_queue, stop, collector.progress, collector.provenance,
+        on_clause, skip
+    )
+    try:
+        async with AsyncLLMClient() as client:
+            if batch_mode:
+                await batch_packer(client)
+            else:
+                await asyncio.gather(*(clause_worker(client) for _ in range(LLM_CLIENT_CONFIG["max_concurrency"])))
+            await rewrite_held(client, collector)
+    finally:
+        collector.release_held()
+        stop.set()
+        # Unblock a producer that is waiting on a full queue.
+        while not clause_queue.empty():
+            clause_queue.get_nowait()
+    clause_count = await producer
+    print(f"Extracted {clause_count} clauses from the document in streaming mode.")
+    return collector.pairs
+
+
+def analyze_contract_file(file_path, clauses=None, batch_mode=None, on_result=None, wks=None, contract_name=None):
+    """
+    Analyze a contract file and return the analysis results.
+    Pass pre-computed clauses to skip extraction and chunking.
+    batch_mode packs several clauses per request (defaults to BATCH_CONFIG["enabled"]).
+    on_result(result, progress) is called as each clause completes, for progressive display.
+    Results go to the backend selected by RESULTS_CONFIG; wks forces Google Sheets
+    onto that worksheet (e.g. a FakeWorksheet for offline runs). contract_name
+    labels the run in the local result store and defaults to the file name.
+    """
+    contract = contract_name or os.path.basename(file_path or "contract")
+    telemetry = get_telemetry()
+    run_id = telemetry.start_run(contract)
+    try:
+        sink = open_result_sink(contract, wks=wks)
+        if not sink:
+            return None
+
+        if batch_mode is None:
+            batch_mode = BATCH_CONFIG["enabled"]
+
+        # Results are written as clauses complete; closing the sink flushes
+        # whatever is still buffered.
+        with sink:
+            sink.ensure_header()
+
+            # All clause requests share one connection pool and concurrency limit.
+            if clauses is None:
+                print("Reading contract...")
+                pairs = run_async(analyze_contract_stream(
+                    file_path, sink.allocate_ids, batch_mode=batch_mode,
+                    on_result=on_result, sink=sink, contract=contract
+                ))
+            else:
+                print(f"Extracted {len(clauses)} clauses from the document.")
+                starting_id = sink.allocate_ids(len(clauses))
+                pairs = run_async(analyze_clauses_async(
+                    [(starting_id + i, clause) for i, clause in enumerate(clauses)],
+                    batch_mode=batch_mode,
+                    on_result=on_result,
+                    sink=sink,
+                    contract=contract
+                ))
+
+        analysis_results = sorted((result for result, _ in pairs), key=lambda x: x['clause_id'])
+        print("Analysis completed and results saved.")
+
+        cache = get_clause_cache()
+        if cache:
+            print(f"Clause cache: {cache.hits} hits, {cache.misses} misses this session.")
+        index = get_clause_index()
+        if index:
+            print(
+                f"Clause index: {index.size} clauses indexed, {index.reused} near-duplicates reused, "
+                f"{index.term_mismatches} sent to the LLM for differing numbers or terms this session."
+            )
+        triage = triage_stats()
+        if triage["llm_calls_saved"]:
+            reasons = ", ".join(f"{count} {reason}" for reason, count in triage["by_reason"].items())
+            print(f"Local triage: {triage['llm_calls_saved']} LLM calls saved this session ({reasons}).")
+        for lane in get_scheduler().stats():
+            print(
+                f"Scheduler {lane['model']}: {lane['completed']} completed, "
+                f"{lane['throttle_events']} throttle events, concurrency limit {lane['concurrency_limit']}."
+            )
+        hedging = hedge_stats()
+        if hedging.get("hedged_requests"):
+            print(
+                f"Hedging: {hedging['hedged_requests']} of {hedging['primary_requests']} requests hedged "
+                f"({hedging['hedge_rate']:.0%}), backup won {hedging['backup_wins']}, "
+                f"about {hedging['estimated_saved_s']:.1f}s saved this session."
+            )
+        for breaker in breaker_stats():
+            print(
+                f"Circuit {breaker['model']}: {breaker['state']}, "
+                f"recent failure rate {breaker['recent_failure_rate']:.0%}, opened {breaker['times_opened']} times."
+            )
 
         return analysis_results
 
@@ -119,10 +1024,18 @@ def analyze_contract_file(file_path):
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         return None
+    finally:
+        telemetry.end_run(run_id)
+        if TELEMETRY_CONFIG["prometheus_path"]:
+            telemetry.write_prometheus(TELEMETRY_CONFIG["prometheus_path"])
 
 
-def batch_analyze_contracts(file_paths):
-    results = {}
-    for file_path in file_paths:
-        results[file_path] = analyze_contract_file(file_path)
-    return results
\ No newline at end of file
+def batch_analyze_contracts(file_paths, wks=None):
+    """
+    Analyzes several contracts with the batch engine (process-pool chunking, one
+    shared LLM client and one results sink) and returns {file_path: results or None}.
+    """
+    from .batch_engine import BatchEngine
+    engine = BatchEngine(keep_results=True, wks=wks)
+    engine.run(file_paths)
+    return {file_path: engine.results.get(file_path) for file_path in file_paths}
@@ -1,12 +1,15 @@
 import os
-import pygsheets
-import docx
-from pypdf import PdfReader
+import time
 from dotenv import load_dotenv
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_experimental.text_splitter import SemanticChunker
+from .embedding_service import get_embedding_service, PrefetchedEmbeddings
+from .telemetry import get_telemetry
+from .chunk_normalizer import normalize_chunks, with_provenance
+
+# pygsheets, pypdf, python-docx and langchain_experimental are imported where they
+# are used, so importing this module (and the UI pages above it) stays cheap.
 
 def connect_sheet():
+    import pygsheets
     load_dotenv()
     creds_path = os.getenv("GOOGLE_SHEET_API_CRED")
     sheet_id = os.getenv("GOOGLE_SHEET_ID")
@@ -21,27 +24,155 @@ def connect_sheet():
         print(f"Connection failed: {e}")
         return None
 
-def extract_text_from_file(file_path):
+def iter_pages(file_path, docx_paragraphs_per_page=50):
+    """
+    Yields the document one page at a time so callers never hold the whole text.
+    DOCX files have no pages, so paragraphs are grouped into fixed-size blocks.
+    One extraction span is recorded per document, counting only the time spent
+    reading pages, not the time the caller holds each page.
+    """
+    if not file_path.endswith(('.pdf', '.docx')):
+        raise ValueError("Unsupported file format. Please use a .pdf or .docx file.")
+    pages = _read_pages(file_path, docx_paragraphs_per_page)
+    span = {"file": os.path.basename(file_path), "pages": 0, "chars": 0}
+    busy_s = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            page = next(pages, None)
+            busy_s += time.perf_counter() - started
+            if page is None:
+                return
+            span["pages"] += 1
+            span["chars"] += len(page)
+            yield page
+    except Exception as e:
+        span.update(status="error", error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        get_telemetry().record("extraction", busy_s, **span)
+
+def _read_pages(file_path, docx_paragraphs_per_page):
     if file_path.endswith('.pdf'):
+        from pypdf import PdfReader
         reader = PdfReader(file_path)
-        text = ""
         for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    elif file_path.endswith('.docx'):
+            yield (page.extract_text() or "") + "\n"
+    else:
+        import docx
         doc = docx.Document(file_path)
-        text = ""
+        block = []
         for para in doc.paragraphs:
-            text += para.text + "\n"
-        return text
-    else:
-        raise ValueError("Unsupported file format. Please use a .pdf or .docx file.")
+            block.append(para.text + "\n")
+            if len(block) == docx_paragraphs_per_page:
+                yield "".join(block)
+                block = []
+        if block:
+            yield "".join(block)
+
+def extract_text_from_file(file_path):
+    return "".join(iter_pages(file_path))
+
+def read_document(file_path):
+    """The document's full text and the offset at which each page starts."""
+    pages = list(iter_pages(file_path))
+    page_starts = [0]
+    for page in pages[:-1]:
+        page_starts.append(page_starts[-1] + len(page))
+    return "".join(pages), page_starts
+
+def chunk_document(file_path):
+    """
+    Extracts and chunks a whole document, returning clause dicts with the clause
+    text, its first and last page and its character offsets in the document.
+    """
+    text, page_starts = read_document(file_path)
+    if not text.strip():
+        return []
+    return with_provenance(semantic_chunking(text), text, page_starts)
 
 def semantic_chunking(text):
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    text_splitter = SemanticChunker(embeddings)
-    clauses = text_splitter.create_documents([text])
-    return [doc.page_content for doc in clauses]
+    return semantic_chunking_many([text])[0]
+
+def semantic_chunking_many(texts):
+    """
+    Chunks several documents with a single batched embedding pass.
+    Sentence windows from all documents are embedded together, then each
+    document is split against the prefetched vectors. The semantic chunks are
+    then normalized to the first model's token target (see chunk_normalizer).
+    """
+    with get_telemetry().span("chunking", documents=len(texts), chars=sum(len(text) for text in texts)) as span:
+        semantic = _semantic_chunking_many(texts, span)
+        chunks = [normalize_chunks(doc_chunks) for doc_chunks in semantic]
+        span["semantic_chunks"] = sum(len(doc_chunks) for doc_chunks in semantic)
+        span["chunks"] = sum(len(doc_chunks) for doc_chunks in chunks)
+    return chunks
+
+def _semantic_chunking_many(texts, span):
+    from langchain_experimental.text_splitter import SemanticChunker, combine_sentences
+    service = get_embedding_service()
+    text_splitter = SemanticChunker(service)
+
+    windows = []
+    for text in texts:
+        sentences = [
+            {"sentence": s, "index": i}
+            for i, s in enumerate(text_splitter._get_single_sentences_list(text))
+        ]
+        if len(sentences) > 1:
+            windows.extend(s["combined_sentence"] for s in combine_sentences(sentences, text_splitter.buffer_size))
+    windows = list(dict.fromkeys(windows))
+    started = time.perf_counter()
+    vectors = dict(zip(windows, service.embed_documents(windows)))
+    span["embedded_windows"] = len(windows)
+    span["embedding_s"] = round(time.perf_counter() - started, 4)
+
+    text_splitter = SemanticChunker(PrefetchedEmbeddings(vectors, service))
+    return [
+        [doc.page_content for doc in text_splitter.create_documents([text])]
+        for text in texts
+    ]
+
+def iter_clauses(pages, window_chars=20000):
+    """
+    Streams clause dicts (clause text, pages and document offsets, as in
+    chunk_document) out of an iterable of page texts.
+    Pages are buffered until about window_chars have accumulated, that window is
+    chunked, and every chunk except the last is yielded. The last chunk may be
+    cut off by the window edge, so its text is carried into the next window.
+    """
+    buffer, buffer_start = "", 0
+    page_starts, document_length = [], 0
+    for page in pages:
+        page_starts.append(document_length)
+        document_length += len(page)
+        buffer += page
+        if len(buffer) < window_chars:
+            continue
+        clauses = with_provenance(semantic_chunking(buffer), buffer, page_starts, buffer_start)
+        carry = clauses.pop() if clauses else None
+        # A carried chunk that already fills a window would otherwise grow without bound.
+        if carry and len(carry["clause"]) >= window_chars:
+            clauses.append(carry)
+            carry = None
+        yield from (clause for clause in clauses if clause["clause"].strip())
+        if carry and carry["char_start"] is not None:
+            buffer = buffer[carry["char_start"] - buffer_start:]
+            buffer_start = carry["char_start"]
+        elif carry:
+            # The carry could not be located; offsets for the rest of the window are approximate.
+            buffer = carry["clause"] + "\n"
+            buffer_start = max(document_length - len(buffer), 0)
+        else:
+            buffer, buffer_start = "", document_length
+    if buffer.strip():
+        clauses = with_provenance(semantic_chunking(buffer), buffer, page_starts, buffer_start)
+        yield from (clause for clause in clauses if clause["clause"].strip())
+
+def iter_semantic_chunks(pages, window_chars=20000):
+    """Streams clause texts out of an iterable of page texts (see iter_clauses)."""
+    for clause in iter_clauses(pages, window_chars):
+        yield clause["clause"]
 
 def get_next_id(wks):
     """Gets the next available Clause ID from the sheet."""
@@ -0,0 +1,183 @@
+# embedding_service.py
+import os
+import re
+import zlib
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from .config import EMBEDDING_CONFIG
+
+_service = None
+_service_lock = threading.Lock()
+
+
+class ResidentEmbeddings(Embeddings):
+    """
+    Keeps one embedding model per process: sentence-transformers ("hf"), an
+    int8-quantized ONNX export ("onnx") or hashing vectors ("hashing").
+    The model is loaded on first use; every later call only pays for inference.
+    """
+
+    def __init__(self, model_name, device="cpu", batch_size=64, num_threads=0, backend="hf",
+                 onnx_file="onnx/model_quint8_avx2.onnx", onnx_path=None, max_length=256):
+        self.model_name = model_name
+        self.backend = backend
+        self.device = device
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.onnx_file = onnx_file
+        self.onnx_path = onnx_path
+        self.max_length = max_length
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None and self.backend == "hashing":
+                    self._model = HashingEmbeddings()
+                if self._model is None and self.backend == "onnx":
+                    self._model = OnnxEmbeddings(
+                        self.model_name, self.onnx_file, self.onnx_path, self.batch_size,
+                        self.num_threads, self.max_length,
+                    )
+                if self._model is None:
+                    from langchain_huggingface import HuggingFaceEmbeddings
+                    if self.num_threads:
+                        import torch
+                        torch.set_num_threads(self.num_threads)
+                    print(f"Loading embedding model {self.model_name} on {self.device}...")
+                    self._model = HuggingFaceEmbeddings(
+                        model_name=self.model_name,
+                        model_kwargs={"device": self.device},
+                        encode_kwargs={"batch_size": self.batch_size},
+                    )
+        return self._model
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        model = self._get_model()
+        # A single model instance is shared across threads, so inference is serialized;
+        # torch and onnxruntime already spread each batch over num_threads cores.
+        with self._encode_lock:
+            return model.embed_documents(list(texts))
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Runs an ONNX export of a sentence-transformers model with onnxruntime, with the
+    same mean pooling and normalization, so CPU-only nodes need neither torch nor
+    sentence-transformers. onnx_file is a path in the model's Hugging Face repo
+    (all-MiniLM-L6-v2 ships int8-quantized exports under onnx/); onnx_path, when
+    set, is a local directory holding that file and tokenizer.json instead.
+    """
+
+    def __init__(self, model_name, onnx_file, onnx_path=None, batch_size=64, num_threads=0, max_length=256):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        if onnx_path:
+            model_file = os.path.join(onnx_path, onnx_file)
+            tokenizer_file = os.path.join(onnx_path, "tokenizer.json")
+        else:
+            from huggingface_hub import hf_hub_download
+            model_file = hf_hub_download(model_name, onnx_file)
+            tokenizer_file = hf_hub_download(model_name, "tokenizer.json")
+        print(f"Loading ONNX embedding model {model_name} ({onnx_file}, {num_threads or 'default'} threads)...")
+        self.tokenizer = Tokenizer.from_file(tokenizer_file)
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        options = ort.SessionOptions()
+        # 0 keeps onnxruntime's default of one thread per physical core.
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts):
+        # Batches are padded to their longest text, so texts of similar length are batched together.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words hashing vectors. They need no model download, so
+    benchmarks and offline runs can exercise chunking end to end; they are not
+    meant for real analysis.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(token.encode("utf-8")) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms == 0, 1.0, norms)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class PrefetchedEmbeddings(Embeddings):
+    """
+    Serves vectors that were computed ahead of time in one batched call,
+    falling back to the resident model for anything that was not prefetched.
+    """
+
+    def __init__(self, vectors, fallback):
+        self.vectors = vectors
+        self.fallback = fallback
+
+    def embed_documents(self, texts):
+        missing = [t for t in dict.fromkeys(texts) if t not in self.vectors]
+        if missing:
+            self.vectors.update(zip(missing, self.fallback.embed_documents(missing)))
+        return [self.vectors[t] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def get_embedding_service():
+    """Returns the process-wide embedding service, creating it on first call."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ResidentEmbeddings(**EMBEDDING_CONFIG)
+    return _service
@@ -0,0 +1,175 @@
+# health.py
+import time
+import asyncio
+import threading
+from collections import deque
+from .config import HEALTH_CONFIG, MODEL_CONFIG, MODEL_PREFERENCE_ORDER
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# How often a caller waiting on a half-open probe checks whether it has finished.
+_PROBE_POLL_S = 0.25
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for one model.
+    The circuit opens when the failure rate over the last `window` calls reaches
+    the threshold, stays open for `cooldown_s`, then lets one half-open probe
+    through: a success closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, name, window, min_requests, failure_rate_threshold, cooldown_s):
+        self.name = name
+        self.min_requests = min_requests
+        self.failure_rate_threshold = failure_rate_threshold
+        self.cooldown_s = cooldown_s
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.outcomes = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def _cooldown_elapsed(self, now):
+        return now - self.opened_at >= self.cooldown_s
+
+    def is_available(self):
+        """Read-only check used to order models; does not claim the half-open probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return self._cooldown_elapsed(time.monotonic())
+            return not self.probe_in_flight
+
+    def available_in(self):
+        """
+        Seconds until allow_request can succeed: 0 when closed or ready for a
+        probe, the rest of the cooldown when open, None while a probe is in flight.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            if self.state == OPEN:
+                return max(self.cooldown_s - (time.monotonic() - self.opened_at), 0.0)
+            return None if self.probe_in_flight else 0.0
+
+    def allow_request(self):
+        """Returns True if a call may go to this model, claiming the probe slot when half-open."""
+        with self._lock:
+            if self.state == OPEN and self._cooldown_elapsed(time.monotonic()):
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+                print(f"🔁 Circuit for {self.name} is half-open; sending a probe request.")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Frees a claimed probe slot without recording an outcome (e.g. on cancellation)."""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.outcomes.clear()
+                print(f"✅ Circuit for {self.name} closed again.")
+            self.probe_in_flight = False
+            self.outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self.outcomes.append(False)
+            if self.state == CLOSED and len(self.outcomes) >= self.min_requests:
+                failure_rate = self.outcomes.count(False) / len(self.outcomes)
+                if failure_rate >= self.failure_rate_threshold:
+                    self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        print(f"🚫 Circuit for {self.name} opened; skipping it for {self.cooldown_s:.0f}s.")
+
+    def stats(self):
+        with self._lock:
+            recent = len(self.outcomes)
+            return {
+                "model": self.name,
+                "state": self.state,
+                "recent_failure_rate": round(self.outcomes.count(False) / recent, 2) if recent else 0.0,
+                "successes": self.successes,
+                "failures": self.failures,
+                "times_opened": self.times_opened,
+            }
+
+
+def get_breaker(model_name):
+    """Returns the process-wide breaker for a MODEL_CONFIG entry."""
+    with _breakers_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker(
+                MODEL_CONFIG[model_name]["model_id"] if model_name in MODEL_CONFIG else model_name,
+                window=HEALTH_CONFIG["window"],
+                min_requests=HEALTH_CONFIG["min_requests"],
+                failure_rate_threshold=HEALTH_CONFIG["failure_rate_threshold"],
+                cooldown_s=HEALTH_CONFIG["cooldown_s"],
+            )
+        return _breakers[model_name]
+
+
+def healthy_model_order():
+    """
+    MODEL_PREFERENCE_ORDER with open circuits skipped, so requests go straight to
+    a healthy model. If every circuit is open, only the model whose cooldown ends
+    first is offered; its breaker decides whether a probe may go out yet.
+    """
+    configured = [name for name in MODEL_PREFERENCE_ORDER if name in MODEL_CONFIG]
+    healthy = [name for name in configured if get_breaker(name).is_available()]
+    if healthy or not configured:
+        return healthy
+    return [min(configured, key=lambda name: get_breaker(name).opened_at)]
+
+
+async def wait_for_model(deadline):
+    """
+    Waits until some configured model may take a request again (an open
+    circuit's cooldown ended, or a half-open probe finished) or until the
+    time.monotonic() deadline. Returns False if the deadline came first.
+    """
+    configured = [name for name in MODEL_PREFERENCE_ORDER if name in MODEL_CONFIG]
+    while configured:
+        waits = [get_breaker(name).available_in() for name in configured]
+        if 0.0 in waits:
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        known = [wait for wait in waits if wait is not None]
+        await asyncio.sleep(min(*known, _PROBE_POLL_S if None in waits else remaining, remaining))
+    return False
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.stats() for breaker in breakers]
@@ -0,0 +1,125 @@
+# hedging.py
+import threading
+from collections import deque
+import numpy as np
+from .config import HEDGE_CONFIG
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+class HedgePolicy:
+    """
+    Decides when a slow clause request gets a duplicate on a backup model.
+    Recent successful latencies are kept per model, and a request is hedged once
+    it has run longer than the configured percentile of its model's latencies
+    (initial_delay_s until min_samples have been seen). Hedges are capped at
+    max_extra_ratio of primary requests plus a small burst, so a slow provider
+    cannot double the request volume.
+    """
+
+    def __init__(self, percentile, window, min_samples, initial_delay_s, min_delay_s, max_extra_ratio, burst):
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.initial_delay_s = initial_delay_s
+        self.min_delay_s = min_delay_s
+        self.max_extra_ratio = max_extra_ratio
+        self.burst = burst
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self.primaries = 0
+        self.hedges = 0
+        self.denied = 0
+        self.backup_wins = 0
+        self.primary_wins = 0
+        self.saved_s = 0.0
+
+    def record_latency(self, model_name, seconds):
+        with self._lock:
+            self._latencies.setdefault(model_name, deque(maxlen=self.window)).append(seconds)
+
+    def _samples(self, model_name):
+        with self._lock:
+            return np.asarray(self._latencies.get(model_name, ()), dtype=float)
+
+    def hedge_delay(self, model_name):
+        """Seconds to wait for model_name before hedging a request to it."""
+        samples = self._samples(model_name)
+        if len(samples) < self.min_samples:
+            return max(self.initial_delay_s, self.min_delay_s)
+        return max(float(np.percentile(samples, self.percentile)), self.min_delay_s)
+
+    def record_primary(self):
+        with self._lock:
+            self.primaries += 1
+
+    def try_acquire(self):
+        """Claims budget for one hedge; returns False when the extra-volume cap is reached."""
+        with self._lock:
+            if self.hedges < self.max_extra_ratio * self.primaries + self.burst:
+                self.hedges += 1
+                return True
+            self.denied += 1
+            return False
+
+    def release(self):
+        """Returns a claimed hedge that was not sent (e.g. the backup's circuit is open)."""
+        with self._lock:
+            self.hedges -= 1
+
+    def estimate_saved(self, model_name, delay_s, elapsed_s):
+        """
+        Seconds the backup's win saved, estimated as the primary's mean latency
+        over the hedge delay (its expected latency given that it was that slow)
+        minus the time the clause actually took.
+        """
+        samples = self._samples(model_name)
+        tail = samples[samples > delay_s]
+        return max(float(tail.mean()) - elapsed_s, 0.0) if len(tail) else 0.0
+
+    def record_outcome(self, winner, saved_s=0.0):
+        """winner is "primary", "backup" or None when both requests failed."""
+        with self._lock:
+            if winner == "backup":
+                self.backup_wins += 1
+                self.saved_s += saved_s
+            elif winner == "primary":
+                self.primary_wins += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "primary_requests": self.primaries,
+                "hedged_requests": self.hedges,
+                "hedge_rate": round(self.hedges / self.primaries, 4) if self.primaries else 0.0,
+                "hedges_denied": self.denied,
+                "backup_wins": self.backup_wins,
+                "primary_wins": self.primary_wins,
+                "estimated_saved_s": round(self.saved_s, 3),
+            }
+
+
+def get_hedge_policy():
+    """Returns the process-wide hedge policy, or None when hedging is disabled."""
+    global _policy
+    if not HEDGE_CONFIG["enabled"]:
+        return None
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = HedgePolicy(
+                    percentile=HEDGE_CONFIG["percentile"],
+                    window=HEDGE_CONFIG["window"],
+                    min_samples=HEDGE_CONFIG["min_samples"],
+                    initial_delay_s=HEDGE_CONFIG["initial_delay_s"],
+                    min_delay_s=HEDGE_CONFIG["min_delay_s"],
+                    max_extra_ratio=HEDGE_CONFIG["max_extra_ratio"],
+                    burst=HEDGE_CONFIG["burst"],
+                )
+    return _policy
+
+
+def hedge_stats():
+    """Hedging counters this session; empty when hedging was never used."""
+    return _policy.stats() if _policy else {}
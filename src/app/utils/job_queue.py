@@ -0,0 +1,579 @@
+# job_queue.py
+import os
+import json
+import time
+import uuid
+import queue
+import socket
+import sqlite3
+import asyncio
+import argparse
+import threading
+from .config import JOBS_CONFIG, BATCH_CONFIG, TELEMETRY_CONFIG, REWRITE_CONFIG
+from .telemetry import get_telemetry
+
+_queue = None
+_queue_lock = threading.Lock()
+
+# Jobs in these states are owned by a worker (or waiting for one).
+ACTIVE_STATES = ("queued", "running")
+# Jobs in these states can be resumed from their checkpoints.
+RESUMABLE_STATES = ("cancelled", "interrupted", "failed", "completed")
+
+# Columns added after the first release of the job store, created on open if missing.
+_ADDED_COLUMNS = {"prior_job_id": "TEXT", "revision": "TEXT", "owner": "TEXT"}
+
+
+class JobStore:
+    """
+    SQLite checkpoints for analysis jobs. A job's clauses are saved as the
+    contract is chunked, and each clause result is saved as soon as it is
+    analyzed, so a job can be picked up again from the clauses still pending.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                contract TEXT NOT NULL,
+                file_path TEXT,
+                batch_mode INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL,
+                chunked INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                telemetry_run_id TEXT,
+                prior_job_id TEXT,
+                revision TEXT,
+                owner TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_clauses (
+                job_id TEXT NOT NULL,
+                clause_id INTEGER NOT NULL,
+                clause TEXT NOT NULL,
+                fields TEXT,
+                result TEXT,
+                analyzed_at REAL,
+                PRIMARY KEY (job_id, clause_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at);
+            """
+        )
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def create_job(self, contract, file_path, batch_mode, prior_job_id=None, owner=None):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs(job_id, contract, file_path, batch_mode, state, prior_job_id, owner, created_at, "
+            "updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, contract, file_path, int(batch_mode), prior_job_id, owner, now, now),
+        )
+        return job_id
+
+    def update_job(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def transition(self, job_id, from_states, state, **fields):
+        """Moves a job to state only if it is in one of from_states; returns whether it moved."""
+        fields.update(state=state, updated_at=time.time())
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        placeholders = ", ".join("?" * len(from_states))
+        return self._execute(
+            f"UPDATE jobs SET {assignments} WHERE job_id = ? AND state IN ({placeholders})",
+            (*fields.values(), job_id, *from_states),
+        ) > 0
+
+    def save_clauses(self, job_id, first_id, clauses, chunked=True):
+        """
+        Saves the chunked clause dicts under consecutive IDs from first_id and,
+        unless chunked is False (more clauses are still streaming in), marks the
+        job chunked. Fields besides the clause text (pages, offsets, revision
+        status) are attached to the clause's result when it is analyzed.
+        """
+        records = [
+            (job_id, first_id + i, clause["clause"],
+             json.dumps({key: value for key, value in clause.items() if key != "clause"}, default=str))
+            for i, clause in enumerate(clauses)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO job_clauses(job_id, clause_id, clause, fields) VALUES (?, ?, ?, ?)",
+                records,
+            )
+            self._conn.execute(
+                "UPDATE jobs SET chunked = MAX(chunked, ?), updated_at = ? WHERE job_id = ?",
+                (int(chunked), time.time(), job_id),
+            )
+
+    def checkpoint(self, job_id, result):
+        """Saves one clause result; a None result (the clause failed on every model) is only counted."""
+        if result is None:
+            self._execute("UPDATE jobs SET failed = failed + 1, updated_at = ? WHERE job_id = ?",
+                          (time.time(), job_id))
+            return
+        self._execute(
+            "UPDATE job_clauses SET result = ?, analyzed_at = ? WHERE job_id = ? AND clause_id = ?",
+            (json.dumps(result, default=str), time.time(), job_id, result["clause_id"]),
+        )
+
+    def pending_clauses(self, job_id):
+        """(clause_id, clause, fields) for the clauses of a job without a saved result."""
+        return [
+            (row["clause_id"], row["clause"], json.loads(row["fields"] or "{}"))
+            for row in self._query(
+                "SELECT clause_id, clause, fields FROM job_clauses "
+                "WHERE job_id = ? AND result IS NULL ORDER BY clause_id",
+                (job_id,),
+            )
+        ]
+
+    def clause_ids(self, job_id):
+        """(clause_id, analyzed) for every saved clause of a job, in clause order."""
+        return [
+            (row["clause_id"], bool(row["analyzed"]))
+            for row in self._query(
+                "SELECT clause_id, result IS NOT NULL AS analyzed FROM job_clauses "
+                "WHERE job_id = ? ORDER BY clause_id",
+                (job_id,),
+            )
+        ]
+
+    def results(self, job_id):
+        """The saved result dicts of a job, in clause order."""
+        return [
+            json.loads(row["result"])
+            for row in self._query(
+                "SELECT result FROM job_clauses WHERE job_id = ? AND result IS NOT NULL ORDER BY clause_id",
+                (job_id,),
+            )
+        ]
+
+    _STATUS_SQL = """
+        SELECT jobs.*,
+               COUNT(job_clauses.clause_id) AS total,
+               COUNT(job_clauses.result) AS analyzed
+        FROM jobs LEFT JOIN job_clauses ON job_clauses.job_id = jobs.job_id
+    """
+
+    def job(self, job_id):
+        """Status dict of one job (see jobs), or None if it does not exist."""
+        rows = self._query(f"{self._STATUS_SQL} WHERE jobs.job_id = ? GROUP BY jobs.job_id", (job_id,))
+        return _with_pending(rows[0]) if rows else None
+
+    def jobs(self, limit=20):
+        """
+        Status dicts of the latest jobs: the jobs row plus `total` (clauses
+        chunked), `analyzed` (clauses with a saved result) and `pending`.
+        """
+        return [
+            _with_pending(row) for row in self._query(
+                f"{self._STATUS_SQL} GROUP BY jobs.job_id ORDER BY jobs.created_at DESC LIMIT ?", (limit,)
+            )
+        ]
+
+    def heartbeat(self, owner):
+        """Refreshes updated_at of the active jobs owned by owner, so other processes leave them alone."""
+        return self._execute(
+            "UPDATE jobs SET updated_at = ? WHERE owner = ? AND state IN ('queued', 'running')",
+            (time.time(), owner),
+        )
+
+    def interrupt_stale(self, owner, stale_after_s):
+        """
+        Marks queued or running jobs of other owners as interrupted when the owner
+        is gone: its process no longer exists on this host, or it has not sent a
+        heartbeat for stale_after_s. Jobs of live processes are left running.
+        """
+        cutoff = time.time() - stale_after_s
+        interrupted = 0
+        for row in self._query(
+            "SELECT job_id, owner, updated_at FROM jobs "
+            "WHERE state IN ('queued', 'running') AND (owner IS NULL OR owner != ?)",
+            (owner,),
+        ):
+            if row["updated_at"] >= cutoff and _owner_alive(row["owner"]):
+                continue
+            # Compare updated_at as well, so a heartbeat that lands in between wins.
+            interrupted += self._execute(
+                "UPDATE jobs SET state = 'interrupted', updated_at = ? "
+                "WHERE job_id = ? AND state IN ('queued', 'running') AND updated_at = ?",
+                (time.time(), row["job_id"], row["updated_at"]),
+            )
+        return interrupted
+
+
+def job_owner():
+    """Owner tag of this process's jobs: host, pid and a per-queue suffix, so a reused pid is not mistaken for it."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _owner_alive(owner):
+    """Whether the process behind an owner tag still runs; owners on other hosts count as alive."""
+    if not owner:
+        return False
+    host, _, rest = owner.partition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(rest.partition(":")[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+def _with_pending(row):
+    row["pending"] = row["total"] - row["analyzed"]
+    row["revision"] = json.loads(row["revision"]) if row["revision"] else None
+    return row
+
+
+class JobQueue:
+    """
+    Runs contract analyses on worker threads, off the Streamlit script, with
+    every clause result checkpointed in a JobStore as it completes. submit()
+    returns a job ID at once; pages poll status() and results(), and jobs can be
+    cancelled and later resumed from the clauses still pending. Clauses that
+    failed on every model stay pending, so resuming a finished job retries them.
+    """
+
+    def __init__(self, store=None, workers=None, upload_dir=None):
+        self.store = store or JobStore(JOBS_CONFIG["path"])
+        self.upload_dir = upload_dir or JOBS_CONFIG["upload_dir"]
+        os.makedirs(self.upload_dir, exist_ok=True)
+        self._pending = queue.Queue()
+        self._cancel = {}
+        self._cancel_lock = threading.Lock()
+        self.owner = job_owner()
+        # Jobs of processes that died wait for a resume; other live processes keep theirs.
+        self.store.interrupt_stale(self.owner, JOBS_CONFIG["stale_after_s"])
+        threading.Thread(target=self._heartbeat, name="analysis-job-heartbeat", daemon=True).start()
+        for number in range(workers or JOBS_CONFIG["workers"]):
+            threading.Thread(target=self._work, name=f"analysis-job-{number}", daemon=True).start()
+
+    def submit(self, contract, data=None, file_path=None, batch_mode=None, prior_job_id=None):
+        """
+        Queues a contract given as bytes (data) or a path and returns the job ID.
+        The file is copied into upload_dir, so it survives until the job has chunked it.
+        With prior_job_id the contract is analyzed as a revision of that job's
+        contract: clauses whose text is unchanged carry its results forward and
+        only added or modified clauses go to the LLM.
+        """
+        if batch_mode is None:
+            batch_mode = BATCH_CONFIG["enabled"]
+        extension = os.path.splitext(file_path or contract)[1].lower()
+        if extension not in (".pdf", ".docx"):
+            raise ValueError("Unsupported file format. Please use a .pdf or .docx file.")
+        if data is None:
+            with open(file_path, "rb") as f:
+                data = f.read()
+        upload_path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}{extension}")
+        with open(upload_path, "wb") as f:
+            f.write(data)
+        job_id = self.store.create_job(contract, upload_path, batch_mode, prior_job_id, owner=self.owner)
+        self._pending.put(job_id)
+        print(f"Job {job_id}: queued {contract}.")
+        return job_id
+
+    def resume(self, job_id):
+        """Queues a stopped job again; returns False if it is still active or does not exist."""
+        if not self.store.transition(job_id, RESUMABLE_STATES, "queued", error=None, finished_at=None,
+                                     owner=self.owner):
+            return False
+        self._pending.put(job_id)
+        print(f"Job {job_id}: resumed.")
+        return True
+
+    def cancel(self, job_id):
+        """Stops a job after the clauses in flight; results saved so far are kept."""
+        if self.store.transition(job_id, ("queued",), "cancelled", finished_at=time.time()):
+            return True
+        with self._cancel_lock:
+            event = self._cancel.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def rewrite(self, job_id, results=None):
+        """
+        Adds the missing AI-modified clauses to a job's High/Medium results (see
+        contract_analyzer.rewrite_results) and saves them to the job and the
+        results backends (see result_store.save_rewrites). results defaults to the job's saved results and is updated
+        in place. Returns how many clauses were rewritten.
+        """
+        from .contract_analyzer import rewrite_results
+        from .result_store import save_rewrites
+        results = self.store.results(job_id) if results is None else results
+        rewritten = []
+
+        def save(result):
+            self.store.checkpoint(job_id, result)
+            rewritten.append(result)
+        rewrite_results(results, on_rewrite=save)
+        save_rewrites(rewritten)
+        return len(rewritten)
+
+    def status(self, job_id):
+        return self.store.job(job_id)
+
+    def results(self, job_id):
+        return self.store.results(job_id)
+
+    def jobs(self, limit=20):
+        return self.store.jobs(limit)
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until the job stops and returns its status."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if not status or status["state"] not in ACTIVE_STATES:
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                return status
+            time.sleep(JOBS_CONFIG["poll_interval_s"] / 4)
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(JOBS_CONFIG["heartbeat_s"])
+            try:
+                self.store.heartbeat(self.owner)
+                self.store.interrupt_stale(self.owner, JOBS_CONFIG["stale_after_s"])
+            except sqlite3.Error as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+
+    def _work(self):
+        while True:
+            job_id = self._pending.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                print(f"❌ Job {job_id} crashed: {e}")
+
+    def _run(self, job_id):
+        cancel = threading.Event()
+        with self._cancel_lock:
+            self._cancel[job_id] = cancel
+        telemetry = get_telemetry()
+        try:
+            job = self.store.job(job_id)
+            run_id = telemetry.start_run(job["contract"])
+            # A job cancelled while it waited in the queue is skipped.
+            if not self.store.transition(job_id, ("queued",), "running", started_at=time.time(),
+                                         failed=0, telemetry_run_id=run_id, owner=self.owner):
+                telemetry.end_run(run_id)
+                return
+            try:
+                self._analyze_job(job, cancel)
+                state = "cancelled" if cancel.is_set() else "completed"
+                self.store.update_job(job_id, state=state, finished_at=time.time())
+                status = self.store.job(job_id)
+                print(f"Job {job_id}: {state}, {status['analyzed']} of {status['total']} clauses analyzed, "
+                      f"{status['failed']} failed.")
+            except Exception as e:
+                print(f"❌ Job {job_id} failed: {e}")
+                self.store.update_job(job_id, state="failed", error=f"{type(e).__name__}: {e}",
+                                      finished_at=time.time())
+            finally:
+                telemetry.end_run(run_id)
+                if TELEMETRY_CONFIG["prometheus_path"]:
+                    telemetry.write_prometheus(TELEMETRY_CONFIG["prometheus_path"])
+        finally:
+            with self._cancel_lock:
+                self._cancel.pop(job_id, None)
+
+    def _analyze_job(self, job, cancel):
+        from .result_store import open_result_sink
+        from .llm_client import run_async
+
+        job_id = job["job_id"]
+        sink = open_result_sink(job["contract"])
+        if not sink:
+            raise RuntimeError("Could not open the results backend.")
+        with sink:
+            sink.ensure_header()
+            if not job["chunked"] and not job["prior_job_id"]:
+                # A new contract streams: clauses are saved and analyzed as they are chunked.
+                run_async(self._until_cancelled(self._stream(job, sink), cancel))
+            else:
+                if not job["chunked"]:
+                    self._chunk_revision(job, sink)
+                pending = self.store.pending_clauses(job_id)
+                if pending and not cancel.is_set():
+                    run_async(self._until_cancelled(self._analyze_pending(job, pending, sink), cancel))
+        # A resumed job may have results stored without their rewrite by a run
+        # cancelled during the rewrite phase; a first run rewrote its own.
+        resumed = job["started_at"] is not None
+        if resumed and REWRITE_CONFIG["two_phase"] and REWRITE_CONFIG["mode"] == "background" and not cancel.is_set():
+            self.rewrite(job_id)
+
+    async def _stream(self, job, sink):
+        """
+        Analyzes a new contract through the streaming pipeline, so the first
+        results arrive before the whole document is chunked. Each clause is saved
+        as it is chunked and its result as it completes. A stream stopped early
+        leaves the job unchunked with its upload kept: resuming re-chunks the
+        document, reuses the saved clause IDs in order and skips the clauses
+        that already have a result.
+        """
+        from .contract_analyzer import analyze_contract_stream
+        job_id = job["job_id"]
+        saved = self.store.clause_ids(job_id)
+        saved_ids = iter([clause_id for clause_id, _ in saved])
+
+        def next_id():
+            clause_id = next(saved_ids, None)
+            return sink.allocate_ids() if clause_id is None else clause_id
+
+        await analyze_contract_stream(
+            job["file_path"], next_id,
+            batch_mode=bool(job["batch_mode"]),
+            on_result=lambda result, progress: self.store.checkpoint(job_id, result),
+            on_rewrite=lambda result: self.store.checkpoint(job_id, result),
+            sink=sink,
+            contract=job["contract"],
+            on_clause=lambda clause_id, clause: self.store.save_clauses(job_id, clause_id, [clause], False),
+            skip={clause_id for clause_id, analyzed in saved if analyzed},
+        )
+        self.store.update_job(job_id, chunked=1)
+        print(f"Job {job_id}: extracted {self.store.job(job_id)['total']} clauses from {job['contract']}.")
+        self._discard_upload(job)
+
+    def _chunk_revision(self, job, sink):
+        from .revision import chunk_revision, carry_forward
+        job_id = job["job_id"]
+        prior_job = self.store.job(job["prior_job_id"])
+        if not prior_job:
+            raise ValueError(f"Prior job {job['prior_job_id']} does not exist.")
+        # A revision is aligned with the prior version as a whole, so it is chunked up front.
+        clauses, carried, summary = chunk_revision(
+            job["file_path"], self.store.results(prior_job["job_id"]), prior_job["contract"]
+        )
+        self.store.update_job(job_id, revision=json.dumps(summary, default=str))
+        print(
+            f"Job {job_id}: revision of {prior_job['contract']}: {summary['unchanged']} clauses unchanged, "
+            f"{summary['modified']} modified, {summary['added']} added, {len(summary['removed'])} removed."
+        )
+        first_id = sink.allocate_ids(len(clauses)) if clauses else 0
+        self.store.save_clauses(job_id, first_id, clauses)
+        print(f"Job {job_id}: extracted {len(clauses)} clauses from {job['contract']}.")
+        for i, prior in carried.items():
+            result, row = carry_forward(prior, first_id + i, clauses[i])
+            result["contract"] = job["contract"]
+            sink.write(result, row)
+            self.store.checkpoint(job_id, result)
+        self._discard_upload(job)
+
+    @staticmethod
+    def _discard_upload(job):
+        # The clauses are checkpointed, so the upload is no longer needed to resume.
+        try:
+            os.unlink(job["file_path"])
+        except OSError:
+            pass
+
+    async def _analyze_pending(self, job, pending, sink):
+        from .contract_analyzer import analyze_clauses_async
+        job_id = job["job_id"]
+        await analyze_clauses_async(
+            [(clause_id, clause) for clause_id, clause, _ in pending],
+            batch_mode=bool(job["batch_mode"]),
+            on_result=lambda result, progress: self.store.checkpoint(job_id, result),
+            on_rewrite=lambda result: self.store.checkpoint(job_id, result),
+            sink=sink,
+            contract=job["contract"],
+            provenance={clause_id: fields for clause_id, _, fields in pending},
+        )
+
+    @staticmethod
+    async def _until_cancelled(coroutine, cancel):
+        """Runs coroutine, cancelling it once the job's cancel event is set."""
+        task = asyncio.ensure_future(coroutine)
+        while not task.done():
+            await asyncio.wait({task}, timeout=JOBS_CONFIG["poll_interval_s"])
+            if cancel.is_set() and not task.done():
+                task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not cancel.is_set():
+                raise
+
+
+def get_job_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run and inspect checkpointed analysis jobs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="Analyze a contract as a job and wait for it.")
+    run.add_argument("path")
+    run.add_argument("--batch-mode", action="store_true", help="Pack several clauses per LLM request.")
+    run.add_argument("--prior-job", help="Analyze as a revision of this job's contract.")
+    resume = subparsers.add_parser("resume", help="Resume a stopped job and wait for it.")
+    resume.add_argument("job_id")
+    subparsers.add_parser("list", help="List the latest jobs.")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for job in JobStore(JOBS_CONFIG["path"]).jobs():
+            print(f"{job['job_id']} {job['state']:<11} {job['analyzed']}/{job['total']} clauses, "
+                  f"{job['failed']} failed  {job['contract']}")
+        return
+
+    jobs = JobQueue(workers=1)
+    if args.command == "run":
+        job_id = jobs.submit(os.path.basename(args.path), file_path=args.path, batch_mode=args.batch_mode or None,
+                             prior_job_id=args.prior_job)
+    else:
+        job_id = args.job_id
+        if not jobs.resume(job_id):
+            parser.error(f"job {job_id} does not exist or cannot be resumed")
+    try:
+        status = jobs.wait(job_id)
+    except KeyboardInterrupt:
+        # Ctrl+C cancels the job; the checkpoints so far are kept for a later resume.
+        jobs.cancel(job_id)
+        status = jobs.wait(job_id)
+    print(f"Job {job_id}: {status['state']}, {status['analyzed']} of {status['total']} clauses analyzed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,108 @@
 # llm_analyzer.py (Updated with stricter rule)
 
 import os
-import requests
-from groq import Groq
-from groq.types.chat.chat_completion import ChatCompletion
-from .config import MODEL_CONFIG, MODEL_PREFERENCE_ORDER
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import re
+import json
+from .config import MODEL_CONFIG, MODEL_PREFERENCE_ORDER, LLM_CLIENT_CONFIG, REWRITE_CONFIG
+from .clause_cache import get_clause_cache
+from .llm_client import AsyncLLMClient, run_async
+from .scheduler import estimate_tokens
+from .health import get_breaker
+from .telemetry import get_telemetry
+from .providers import get_provider_client
+import asyncio
+
+# Bump these whenever a prompt changes so cached results from the old prompt are not reused.
+ANALYSIS_PROMPT_VERSION = "analysis-v1"
+KEY_CLAUSES_PROMPT_VERSION = "key-clauses-v1"
+STRUCTURED_PROMPT_VERSION = "structured-v1"
+CLASSIFY_PROMPT_VERSION = "classify-v1"
+REWRITE_PROMPT_VERSION = "rewrite-v2"
+
+RISK_LEVELS = ("High", "Medium", "Low")
+# Last line of a rewrite reply: the model's risk level for the rewritten clause.
+_REWRITE_RISK_LINE = re.compile(r"\n\s*\**risk level\**\s*:\s*\**\s*(high|medium|low)\b[^\n]*\s*$", re.IGNORECASE)
+REGULATIONS = ("GDPR", "HIPAA", "Other", "None")
+
+# JSON schema sent with the single-call analysis prompt; parse_structured_analysis enforces it.
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "required": [
+        "regulation", "summary", "risk_level", "risk_percent",
+        "key_phrases", "ai_modified_clause", "ai_modified_risk_level"
+    ],
+    "properties": {
+        "regulation": {"type": "string", "enum": list(REGULATIONS)},
+        "summary": {"type": "string"},
+        "risk_level": {"type": "string", "enum": list(RISK_LEVELS)},
+        "risk_percent": {"type": "integer", "minimum": 0, "maximum": 100},
+        "key_phrases": {"type": "array", "items": {"type": "string"}},
+        "ai_modified_clause": {"type": "string"},
+        "ai_modified_risk_level": {"type": "string", "enum": list(RISK_LEVELS)},
+    },
+}
+
+
+# The first pass of two-phase analysis (see REWRITE_CONFIG) classifies without the rewrite.
+CLASSIFICATION_SCHEMA = {
+    "type": "object",
+    "required": [key for key in ANALYSIS_SCHEMA["required"] if not key.startswith("ai_modified_")],
+    "properties": {
+        key: value for key, value in ANALYSIS_SCHEMA["properties"].items() if not key.startswith("ai_modified_")
+    },
+}
+
+
+CLASSIFICATION_FIELD_RULES = (
+    "Field rules:\n"
+    "- summary: 1-2 sentences, under 100 words.\n"
+    "- risk_percent: risk as an integer from 0 to 100.\n"
+    "- key_phrases: the most important phrases describing the clause's core obligation or purpose.\n"
+)
+
+
+ANALYSIS_FIELD_RULES = CLASSIFICATION_FIELD_RULES + (
+    "- ai_modified_clause: rewrite any High or Medium risk clause to reduce its risk. "
+    "If the original risk is Low, return the original clause.\n"
+    "- ai_modified_risk_level: reassess the rewritten clause's risk. Must be Low.\n"
+)
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a model reply does not match ANALYSIS_SCHEMA."""
 
 def get_preferred_model_and_config():
     for model_name in MODEL_PREFERENCE_ORDER:
         config = MODEL_CONFIG.get(model_name)
         if config:
+            breaker = get_breaker(model_name)
+            if not breaker.allow_request():
+                print(f"⏭️ Circuit for {config['model_id']} is open. Skipping {model_name}.")
+                continue
             try:
                 if config["provider"] == "groq":
                     api_key = os.getenv("GROQ_API_KEY")
                     if not api_key:
+                        breaker.release()
                         print(f"❌ GROQ_API_KEY not found. Skipping {model_name}.")
                         continue
-                    test_client = Groq(api_key=api_key)
-                    test_client.models.list()
-                    config["client"] = test_client
+                    get_provider_client("groq").models.list()
                 elif config["provider"] == "github":
                     pat = os.getenv("GITHUB_PAT")
                     if not pat:
+                        breaker.release()
                         print(f"❌ GITHUB_PAT not found. Skipping {model_name}.")
                         continue
+                breaker.record_success()
                 print(f"✅ Using model: {config['model_id']} from {config['provider']}")
                 return config
             except Exception as e:
+                breaker.record_failure()
                 print(f"❌ Model {config['model_id']} from {config['provider']} failed. Trying next model... Error: {e}")
                 continue
     raise Exception("All configured models failed to connect.")
 
-def _call_github_models_api(config, prompt, max_tokens):
+def _call_github_models_api(config, prompt, max_tokens, json_mode=False):
     pat = os.getenv("GITHUB_PAT")
     headers = {
         "Authorization": f"Bearer {pat}",
@@ -44,14 +114,336 @@ def _call_github_models_api(config, prompt, max_tokens):
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": max_tokens
     }
-    response = requests.post(config["api_url"], headers=headers, json=data)
+    if json_mode:
+        data["response_format"] = {"type": "json_object"}
+    response = get_provider_client("github").post(
+        config["api_url"],
+        headers=headers,
+        json=data,
+        timeout=(LLM_CLIENT_CONFIG["connect_timeout_s"], LLM_CLIENT_CONFIG["request_timeout_s"])
+    )
     response.raise_for_status()
     result = response.json()
     return result["choices"][0]["message"]["content"].strip()
 
+def _complete(config, prompt, max_tokens, json_mode=False):
+    """Sends a single-turn prompt to the configured provider and returns the reply text."""
+    json_mode = json_mode and config.get("json_mode", False)
+    with get_telemetry().span(
+        "llm_attempt", model=config["model_id"], provider=config["provider"], attempt=1,
+        prompt_tokens=estimate_tokens(prompt), max_tokens=max_tokens, sync=True,
+    ) as span:
+        if config["provider"] == "groq":
+            kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+            chat = get_provider_client("groq").chat.completions.create(
+                model=config["model_id"],
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                **kwargs,
+            )
+            if chat.usage:
+                span["prompt_tokens"] = chat.usage.prompt_tokens
+                span["completion_tokens"] = chat.usage.completion_tokens
+            return chat.choices[0].message.content.strip()
+        elif config["provider"] == "github":
+            return _call_github_models_api(config, prompt, max_tokens=max_tokens, json_mode=json_mode)
+        else:
+            raise ValueError(f"Unknown provider: {config['provider']}")
+
+def _extract_json_object(text):
+    # Models sometimes wrap JSON in markdown fences or add a sentence around it.
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise StructuredOutputError("No JSON object in model reply.")
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Invalid JSON in model reply: {e}")
+
+def _normalize_choice(value, choices, field):
+    if not isinstance(value, str):
+        raise StructuredOutputError(f"'{field}' must be a string.")
+    for choice in choices:
+        if value.strip().lower() == choice.lower():
+            return choice
+    raise StructuredOutputError(f"'{field}' must be one of {', '.join(choices)}, got '{value}'.")
+
+def parse_structured_analysis(text, schema=ANALYSIS_SCHEMA):
+    """
+    Validates a model reply against ANALYSIS_SCHEMA (or CLASSIFICATION_SCHEMA)
+    and returns the analysis dict.
+    Raises StructuredOutputError instead of silently defaulting missing fields.
+    """
+    return validate_analysis(_extract_json_object(text), schema)
+
+def validate_analysis(data, schema=ANALYSIS_SCHEMA):
+    """
+    Checks one decoded analysis object against the schema and normalizes its
+    values. Under CLASSIFICATION_SCHEMA the rewrite fields are left as None.
+    """
+    if not isinstance(data, dict):
+        raise StructuredOutputError("Analysis is not a JSON object.")
+    missing = [key for key in schema["required"] if key not in data]
+    if missing:
+        raise StructuredOutputError(f"Missing fields: {', '.join(missing)}.")
+
+    regulation = data["regulation"]
+    if isinstance(regulation, list):
+        regulation = ", ".join(str(r) for r in regulation)
+    regulations = [
+        _normalize_choice(part, REGULATIONS, "regulation")
+        for part in str(regulation).replace("/", ",").split(",") if part.strip()
+    ]
+    if not regulations:
+        raise StructuredOutputError("'regulation' is empty.")
+
+    risk_percent = data["risk_percent"]
+    if isinstance(risk_percent, str):
+        risk_percent = risk_percent.replace("%", "").strip()
+    try:
+        risk_percent = int(float(risk_percent))
+    except (TypeError, ValueError):
+        raise StructuredOutputError(f"'risk_percent' is not a number: {data['risk_percent']!r}.")
+    if not 0 <= risk_percent <= 100:
+        raise StructuredOutputError(f"'risk_percent' out of range: {risk_percent}.")
+
+    key_phrases = data["key_phrases"]
+    if isinstance(key_phrases, str):
+        key_phrases = key_phrases.split(",")
+    if not isinstance(key_phrases, list):
+        raise StructuredOutputError("'key_phrases' must be a list of strings.")
+
+    summary = data["summary"]
+    if not isinstance(summary, str) or not summary.strip():
+        raise StructuredOutputError("'summary' must be a non-empty string.")
+    ai_modified_clause = ai_modified_risk_level = None
+    if "ai_modified_clause" in schema["required"]:
+        ai_modified_clause = data["ai_modified_clause"]
+        if not isinstance(ai_modified_clause, str):
+            raise StructuredOutputError("'ai_modified_clause' must be a string.")
+        ai_modified_clause = ai_modified_clause.strip()
+        ai_modified_risk_level = _normalize_choice(
+            data["ai_modified_risk_level"], RISK_LEVELS, "ai_modified_risk_level"
+        )
+
+    return {
+        "regulation": ", ".join(dict.fromkeys(regulations)),
+        "summary": summary.strip(),
+        "risk_level": _normalize_choice(data["risk_level"], RISK_LEVELS, "risk_level"),
+        "risk_percent": f"{risk_percent}%",
+        "key_clauses": ", ".join(str(p).strip() for p in key_phrases if str(p).strip()),
+        "ai_modified_clause": ai_modified_clause,
+        "ai_modified_risk_level": ai_modified_risk_level,
+    }
+
+def _structured_spec(rewrite):
+    """(cache kind, prompt version, schema, field rules) of the full analysis or the classification pass."""
+    if rewrite:
+        return "structured", STRUCTURED_PROMPT_VERSION, ANALYSIS_SCHEMA, ANALYSIS_FIELD_RULES
+    return "classification", CLASSIFY_PROMPT_VERSION, CLASSIFICATION_SCHEMA, CLASSIFICATION_FIELD_RULES
+
+def analyze_clause_structured(config, clause, rewrite=True):
+    """
+    Analyzes a clause and extracts its key phrases in one JSON-mode request.
+    With rewrite=False only the classification is asked for, under the smaller
+    REWRITE_CONFIG["classify_max_tokens"] budget; see modify_clause for the rewrite.
+    Raises StructuredOutputError when the reply does not follow the schema.
+    """
+    kind, version, schema, _ = _structured_spec(rewrite)
+    cache = get_clause_cache()
+    if cache:
+        cached = cache.get(kind, config["model_id"], version, clause)
+        if cached is not None:
+            return cached
+
+    reply = _complete(config, _structured_prompt(clause, rewrite), max_tokens=_structured_max_tokens(rewrite),
+                      json_mode=True)
+    return _store_structured(cache, config, clause, parse_structured_analysis(reply, schema), rewrite)
+
+async def analyze_clause_structured_async(client, config, clause, rewrite=True):
+    """Async variant of analyze_clause_structured that sends the request through an AsyncLLMClient."""
+    kind, version, schema, _ = _structured_spec(rewrite)
+    cache = get_clause_cache()
+    if cache:
+        cached = cache.get(kind, config["model_id"], version, clause)
+        if cached is not None:
+            return cached
+
+    reply = await client.complete(
+        config, _structured_prompt(clause, rewrite), max_tokens=_structured_max_tokens(rewrite), json_mode=True
+    )
+    return _store_structured(cache, config, clause, parse_structured_analysis(reply, schema), rewrite)
+
+def _structured_max_tokens(rewrite):
+    return 500 if rewrite else REWRITE_CONFIG["classify_max_tokens"]
+
+def _structured_prompt(clause, rewrite=True):
+    _, _, schema, rules = _structured_spec(rewrite)
+    return (
+        f"Analyze this contract clause for compliance risk. "
+        f"Respond with a single JSON object and nothing else, matching this JSON schema:\n"
+        f"{json.dumps(schema)}\n"
+        f"{rules}\n"
+        f"Clause: {clause}"
+    )
+
+def _store_structured(cache, config, clause, analysis, rewrite=True):
+    if cache:
+        kind, version, _, _ = _structured_spec(rewrite)
+        cache.put(kind, config["model_id"], version, clause, analysis)
+    return analysis
+
+def estimate_output_tokens(clause, rewrite=True):
+    # The rewrite can be as long as the clause itself, plus the fixed analysis fields.
+    return estimate_tokens(clause) + 150 if rewrite else 150
+
+def pack_clause_batches(items, config, rewrite=True):
+    """
+    Greedily packs (clause_id, clause) pairs into batches that fit the model's
+    batch_max_input_tokens and batch_max_output_tokens budgets.
+    A clause that exceeds a budget on its own still gets a batch of one.
+    Without the rewrite (rewrite=False) each clause needs far less output, so
+    more clauses fit a batch.
+    """
+    _, _, schema, rules = _structured_spec(rewrite)
+    input_budget = config.get("batch_max_input_tokens", 4000)
+    output_budget = config.get("batch_max_output_tokens", 4000)
+    prompt_overhead = estimate_tokens(json.dumps(schema) + rules) + 100
+
+    batches, current = [], []
+    input_tokens, output_tokens = prompt_overhead, 0
+    for clause_id, clause in items:
+        clause_input = estimate_tokens(clause) + 10
+        clause_output = estimate_output_tokens(clause, rewrite)
+        if current and (input_tokens + clause_input > input_budget or output_tokens + clause_output > output_budget):
+            batches.append(current)
+            current, input_tokens, output_tokens = [], prompt_overhead, 0
+        current.append((clause_id, clause))
+        input_tokens += clause_input
+        output_tokens += clause_output
+    if current:
+        batches.append(current)
+    return batches
+
+def analyze_clause_batch(config, items, rewrite=True):
+    """
+    Analyzes several (clause_id, clause) pairs in one request, classification
+    only when rewrite is False (see analyze_clause_structured).
+    Returns {clause_id: analysis} for every clause that came back valid; clauses
+    that are missing or invalid in the reply are simply absent so the caller can
+    retry them one at a time. Raises StructuredOutputError if the reply cannot be parsed.
+    """
+    analyses, pending = _split_cached_batch(config, items, rewrite)
+    if not pending:
+        return analyses
+
+    prompt, max_tokens = _batch_prompt(config, pending, rewrite)
+    reply = _complete(config, prompt, max_tokens=max_tokens, json_mode=True)
+    analyses.update(_parse_batch_reply(config, reply, pending, rewrite))
+    return analyses
+
+async def analyze_clause_batch_async(client, config, items, rewrite=True):
+    """Async variant of analyze_clause_batch."""
+    analyses, pending = _split_cached_batch(config, items, rewrite)
+    if not pending:
+        return analyses
+
+    prompt, max_tokens = _batch_prompt(config, pending, rewrite)
+    reply = await client.complete(config, prompt, max_tokens=max_tokens, json_mode=True)
+    analyses.update(_parse_batch_reply(config, reply, pending, rewrite))
+    return analyses
+
+def _split_cached_batch(config, items, rewrite=True):
+    kind, version, _, _ = _structured_spec(rewrite)
+    cache = get_clause_cache()
+    analyses, pending = {}, []
+    for clause_id, clause in items:
+        cached = cache.get(kind, config["model_id"], version, clause) if cache else None
+        if cached is not None:
+            analyses[clause_id] = cached
+        else:
+            pending.append((clause_id, clause))
+    return analyses, pending
+
+def _batch_prompt(config, pending, rewrite=True):
+    _, _, schema, rules = _structured_spec(rewrite)
+    batch_schema = {
+        "type": "object",
+        "required": ["results"],
+        "properties": {
+            "results": {
+                "type": "array",
+                "items": {
+                    **schema,
+                    "required": ["clause_id"] + schema["required"],
+                    "properties": {"clause_id": {"type": "integer"}, **schema["properties"]},
+                },
+            }
+        },
+    }
+    clauses_text = "\n\n".join(f"[Clause {clause_id}]\n{clause}" for clause_id, clause in pending)
+    prompt = (
+        f"Analyze each of the following {len(pending)} contract clauses for compliance risk. "
+        f"Respond with a single JSON object and nothing else, matching this JSON schema:\n"
+        f"{json.dumps(batch_schema)}\n"
+        f"Return exactly one entry in 'results' per clause, with 'clause_id' set to the number "
+        f"shown in that clause's [Clause N] header.\n"
+        f"{rules}\n"
+        f"Clauses:\n{clauses_text}"
+    )
+    max_tokens = min(
+        config.get("batch_max_output_tokens", 4000),
+        sum(estimate_output_tokens(clause, rewrite) for _, clause in pending) + 50,
+    )
+    return prompt, max_tokens
+
+def _parse_batch_reply(config, reply, pending, rewrite=True):
+    data = _extract_json_object(reply)
+    entries = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        raise StructuredOutputError("Batch reply has no 'results' list.")
+
+    cache = get_clause_cache()
+    clauses_by_id = dict(pending)
+    analyses = {}
+    for entry in entries:
+        try:
+            clause_id = int(entry["clause_id"])
+            analysis = validate_analysis(entry, _structured_spec(rewrite)[2])
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"⚠️ Dropping invalid batch entry from model {config['model_id']}: {e}")
+            continue
+        if clause_id not in clauses_by_id:
+            continue
+        analyses[clause_id] = _store_structured(cache, config, clauses_by_id[clause_id], analysis, rewrite)
+    return analyses
+
 def analyze_clause(config, clause):
+    cache = get_clause_cache()
+    if cache:
+        cached = cache.get("analysis", config["model_id"], ANALYSIS_PROMPT_VERSION, clause)
+        if cached is not None:
+            return tuple(cached)
+
+    result = _complete(config, _analysis_prompt(clause), max_tokens=400)
+    return _parse_analysis_reply(cache, config, clause, result)
+
+async def analyze_clause_async(client, config, clause):
+    cache = get_clause_cache()
+    if cache:
+        cached = cache.get("analysis", config["model_id"], ANALYSIS_PROMPT_VERSION, clause)
+        if cached is not None:
+            return tuple(cached)
+
+    result = await client.complete(config, _analysis_prompt(clause), max_tokens=400)
+    return _parse_analysis_reply(cache, config, clause, result)
+
+def _analysis_prompt(clause):
     # This prompt is updated with the stricter rule for AI modification.
-    prompt = (
+    return (
         f"Analyze this contract clause for compliance risk. Return the result in this format ONLY:\n"
         f"Regulation: <GDPR/HIPAA/Other/None>\n"
         f"Summary: <your 1-2 sentence summary under 100 words>\n"
@@ -62,18 +454,7 @@ def analyze_clause(config, clause):
         f"Clause: {clause}"
     )
 
-    if config["provider"] == "groq":
-        chat: ChatCompletion = config["client"].chat.completions.create(
-            model=config["model_id"],
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=400,
-        )
-        result = chat.choices[0].message.content.strip()
-    elif config["provider"] == "github":
-        result = _call_github_models_api(config, prompt, max_tokens=400)
-    else:
-        raise ValueError(f"Unknown provider: {config['provider']}")
-
+def _parse_analysis_reply(cache, config, clause, result):
     regulation = "N/A"
     summary = "N/A"
     risk_level = "Unknown"
@@ -95,70 +476,121 @@ def analyze_clause(config, clause):
         elif line.startswith("AI-Modified Risk Level:"):
             ai_modified_risk_level = line.replace("AI-Modified Risk Level:", "").strip()
 
-    return regulation, summary, risk_level, risk_percent, ai_modified_clause, ai_modified_risk_level
+    analysis = (regulation, summary, risk_level, risk_percent, ai_modified_clause, ai_modified_risk_level)
+    # Only cache answers that actually parsed, so a malformed reply is retried next time.
+    if cache and risk_level != "Unknown":
+        cache.put("analysis", config["model_id"], ANALYSIS_PROMPT_VERSION, clause, list(analysis))
+    return analysis
 
 def extract_key_clauses(config, clause):
-    prompt = (
+    cache = get_clause_cache()
+    if cache:
+        cached = cache.get("key_clauses", config["model_id"], KEY_CLAUSES_PROMPT_VERSION, clause)
+        if cached is not None:
+            return cached
+
+    result = _complete(config, _key_clauses_prompt(clause), max_tokens=100)
+    return _store_key_clauses(cache, config, clause, result)
+
+async def extract_key_clauses_async(client, config, clause):
+    cache = get_clause_cache()
+    if cache:
+        cached = cache.get("key_clauses", config["model_id"], KEY_CLAUSES_PROMPT_VERSION, clause)
+        if cached is not None:
+            return cached
+
+    result = await client.complete(config, _key_clauses_prompt(clause), max_tokens=100)
+    return _store_key_clauses(cache, config, clause, result)
+
+def _key_clauses_prompt(clause):
+    return (
         f"Read the following contract clause. "
         f"Extract the most important phrases that summarize its core obligation or purpose. "
         f"Return only the phrases as a comma-separated list. "
         f"Clause: {clause}"
     )
 
-    if config["provider"] == "groq":
-        chat: ChatCompletion = config["client"].chat.completions.create(
-            model=config["model_id"],
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=100,
-        )
-        result = chat.choices[0].message.content.strip()
-    elif config["provider"] == "github":
-        result = _call_github_models_api(config, prompt, max_tokens=100)
-    else:
-        raise ValueError(f"Unknown provider: {config['provider']}")
+def _store_key_clauses(cache, config, clause, result):
+    if cache and result:
+        cache.put("key_clauses", config["model_id"], KEY_CLAUSES_PROMPT_VERSION, clause, result)
     return result
 
-def analyze_clauses_parallel(config, clauses, max_workers=5):
+async def _gather_clauses(analyze, config, clauses, max_workers):
+    async with AsyncLLMClient(max_concurrency=max_workers) as client:
+        return await asyncio.gather(
+            *(analyze(client, config, c) for c in clauses), return_exceptions=True
+        )
+
+def _run_parallel(analyze, config, clauses, max_workers, label):
     results = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(analyze_clause, config, c): c for c in clauses}
-        for future in as_completed(futures):
-            try:
-                results.append(future.result())
-            except Exception as e:
-                print(f"Error analyzing clause: {e}")
+    for outcome in run_async(_gather_clauses(analyze, config, clauses, max_workers)):
+        if isinstance(outcome, Exception):
+            print(f"Error {label}: {outcome}")
+        else:
+            results.append(outcome)
     return results
 
+def analyze_clauses_parallel(config, clauses, max_workers=5):
+    return _run_parallel(analyze_clause_async, config, clauses, max_workers, "analyzing clause")
+
 def extract_clauses_parallel(config, clauses, max_workers=5):
-    results = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(extract_key_clauses, config, c): c for c in clauses}
-        for future in as_completed(futures):
-            try:
-                results.append(future.result())
-            except Exception as e:
-                print(f"Error extracting key clause: {e}")
-    return results
+    return _run_parallel(extract_key_clauses_async, config, clauses, max_workers, "extracting key clause")
 
 def modify_clause(config, clause, risk_level):
+    """
+    Rewrites a High or Medium risk clause to reduce its risk, the second phase of
+    two-phase analysis, and returns (rewritten clause, its risk level as the
+    model assessed it, or "" if it gave none); Low risk clauses are returned as
+    they are. Raises ValueError when the model returns no text.
+    """
     if risk_level.lower() == "low":
-        return clause
+        return clause, "Low"
 
-    prompt = (
+    cache = get_clause_cache()
+    if cache:
+        cached = cache.get("rewrite", config["model_id"], REWRITE_PROMPT_VERSION, f"{risk_level}\n{clause}")
+        if cached is not None:
+            return _parse_rewrite(cached)
+
+    reply = _complete(config, _rewrite_prompt(clause, risk_level), max_tokens=estimate_output_tokens(clause))
+    return _store_rewrite(cache, config, clause, risk_level, reply)
+
+async def modify_clause_async(client, config, clause, risk_level):
+    """Async variant of modify_clause."""
+    if risk_level.lower() == "low":
+        return clause, "Low"
+
+    cache = get_clause_cache()
+    if cache:
+        cached = cache.get("rewrite", config["model_id"], REWRITE_PROMPT_VERSION, f"{risk_level}\n{clause}")
+        if cached is not None:
+            return _parse_rewrite(cached)
+
+    reply = await client.complete(
+        config, _rewrite_prompt(clause, risk_level), max_tokens=estimate_output_tokens(clause)
+    )
+    return _store_rewrite(cache, config, clause, risk_level, reply)
+
+def _rewrite_prompt(clause, risk_level):
+    return (
         f"The following contract clause has been assessed as {risk_level} risk. "
         f"Rewrite this clause to make it compliant with relevant regulations (e.g., GDPR, HIPAA), "
-        f"while keeping the legal meaning intact. Return only the rewritten clause text.\n\n"
+        f"while keeping the legal meaning intact. Return only the rewritten clause text, followed by a last line "
+        f"'Risk Level: <High|Medium|Low>' with your assessment of the rewritten clause's risk.\n\n"
         f"Original Clause:\n{clause}"
     )
 
-    if config["provider"] == "groq":
-        chat = config["client"].chat.completions.create(
-            model=config["model_id"],
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=300,
-        )
-        return chat.choices[0].message.content.strip()
-    elif config["provider"] == "github":
-        return _call_github_models_api(config, prompt, max_tokens=300)
-    else:
-        raise ValueError(f"Unknown provider: {config['provider']}")
\ No newline at end of file
+def _parse_rewrite(reply):
+    """(rewritten clause, risk level) from a rewrite reply; the level is "" when the model left it out."""
+    match = _REWRITE_RISK_LINE.search(reply)
+    if not match:
+        return reply.strip(), ""
+    return reply[:match.start()].strip(), match.group(1).capitalize()
+
+def _store_rewrite(cache, config, clause, risk_level, reply):
+    rewrite, level = _parse_rewrite(reply or "")
+    if not rewrite:
+        raise ValueError(f"Model {config['model_id']} returned an empty rewrite.")
+    if cache:
+        cache.put("rewrite", config["model_id"], REWRITE_PROMPT_VERSION, f"{risk_level}\n{clause}", reply.strip())
+    return rewrite, level
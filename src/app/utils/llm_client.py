@@ -0,0 +1,143 @@
+# llm_client.py
+import os
+import time
+import asyncio
+import threading
+import httpx
+from .config import LLM_CLIENT_CONFIG, SCHEDULER_CONFIG
+from .scheduler import get_scheduler, parse_retry_after, estimate_tokens
+from .telemetry import get_telemetry
+
+
+class RateLimitError(Exception):
+    """Raised when a model keeps answering 429 after the scheduler's retries."""
+
+    def __init__(self, model_id, retry_after):
+        super().__init__(f"{model_id} is rate limited (retry after {retry_after:.1f}s)")
+        self.model_id = model_id
+        self.retry_after = retry_after
+
+
+def _provider_headers(provider):
+    if provider == "groq":
+        return {"Authorization": f"Bearer {os.getenv('GROQ_API_KEY')}"}
+    elif provider == "github":
+        return {
+            "Authorization": f"Bearer {os.getenv('GITHUB_PAT')}",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+class AsyncLLMClient:
+    """
+    asyncio chat-completions client for the Groq and GitHub Models endpoints.
+    Each provider gets one keep-alive connection pool, every request has a timeout,
+    and a single semaphore caps the number of requests in flight. Requests are
+    admitted by the process-wide RateLimitScheduler, and 429s are retried on the
+    same model after Retry-After instead of falling straight through to the next one.
+    Use it as an async context manager so the pools are closed when the run ends.
+    """
+
+    def __init__(self, max_concurrency=None, request_timeout_s=None):
+        self.max_concurrency = max_concurrency or LLM_CLIENT_CONFIG["max_concurrency"]
+        self.request_timeout_s = request_timeout_s or LLM_CLIENT_CONFIG["request_timeout_s"]
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._pools = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        for pool in self._pools.values():
+            await pool.aclose()
+        self._pools.clear()
+
+    def _pool(self, provider):
+        if provider not in self._pools:
+            self._pools[provider] = httpx.AsyncClient(
+                headers={"Content-Type": "application/json", **_provider_headers(provider)},
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=LLM_CLIENT_CONFIG["max_keepalive_connections"],
+                ),
+                timeout=httpx.Timeout(
+                    self.request_timeout_s, connect=LLM_CLIENT_CONFIG["connect_timeout_s"]
+                ),
+            )
+        return self._pools[provider]
+
+    async def complete(self, config, prompt, max_tokens, json_mode=False):
+        """Sends a single-turn prompt and returns the reply text."""
+        data = {
+            "model": config["model_id"],
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+        }
+        if json_mode and config.get("json_mode", False):
+            data["response_format"] = {"type": "json_object"}
+
+        pool = self._pool(config["provider"])
+        scheduler = get_scheduler()
+        telemetry = get_telemetry()
+        prompt_tokens = estimate_tokens(prompt)
+        retry_after = SCHEDULER_CONFIG["default_retry_after_s"]
+        for attempt in range(1, SCHEDULER_CONFIG["max_throttle_retries"] + 2):
+            # One span per HTTP attempt: queueing for the scheduler slot, then the request itself.
+            with telemetry.span(
+                "llm_attempt", model=config["model_id"], provider=config["provider"], attempt=attempt,
+                prompt_tokens=prompt_tokens, max_tokens=max_tokens,
+            ) as span:
+                queued = time.perf_counter()
+                async with scheduler.slot(config, prompt_tokens + max_tokens) as lane:
+                    span["queue_s"] = round(time.perf_counter() - queued, 4)
+                    sent = time.perf_counter()
+                    async with self._semaphore:
+                        response = await pool.post(config["api_url"], json=data)
+                    span["latency_s"] = round(time.perf_counter() - sent, 4)
+                    span["http_status"] = response.status_code
+                    if response.status_code == 429:
+                        retry_after = parse_retry_after(response.headers, SCHEDULER_CONFIG["default_retry_after_s"])
+                        lane.on_throttle(retry_after)
+                        span["status"] = "throttled"
+                        span["retry_reason"] = f"429, retry after {retry_after:.1f}s"
+                        continue
+                    response.raise_for_status()
+                    lane.on_success()
+                    body = response.json()
+                    # Providers report exact usage; keep the estimate when they do not.
+                    usage = body.get("usage") or {}
+                    span["prompt_tokens"] = usage.get("prompt_tokens", prompt_tokens)
+                    span["completion_tokens"] = usage.get("completion_tokens")
+                    return body["choices"][0]["message"]["content"].strip()
+        raise RateLimitError(config["model_id"], retry_after)
+
+
+def run_async(coro):
+    """
+    Runs a coroutine to completion from synchronous code.
+    If the calling thread already has a running event loop (e.g. inside a notebook),
+    the coroutine runs on a helper thread with its own loop instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    outcome = {}
+
+    def runner():
+        try:
+            outcome["result"] = asyncio.run(coro)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
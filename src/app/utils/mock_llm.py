@@ -0,0 +1,169 @@
+# mock_llm.py
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+_RISKS = [("High", 80), ("Medium", 55), ("Low", 15)]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent clause requests would otherwise overflow the listen backlog.
+    request_queue_size = 512
+
+
+def _clause_risk(clause):
+    # Deterministic per clause text, so repeated runs see the same answers.
+    return _RISKS[int(hashlib.md5(clause.encode("utf-8")).hexdigest(), 16) % len(_RISKS)]
+
+
+def _analysis(clause):
+    risk_level, risk_percent = _clause_risk(clause)
+    return {
+        "regulation": "GDPR" if risk_level != "Low" else "None",
+        "summary": f"Mock summary of a {risk_level.lower()} risk clause.",
+        "risk_level": risk_level,
+        "risk_percent": risk_percent,
+        "key_phrases": clause.split()[:3],
+        "ai_modified_clause": clause if risk_level == "Low" else "Mock rewrite with safeguards.",
+        "ai_modified_risk_level": "Low",
+    }
+
+
+def _structured(clause, prompt):
+    analysis = _analysis(clause)
+    if "ai_modified_clause" not in prompt:
+        # The classification pass of two-phase analysis leaves the rewrite out.
+        analysis.pop("ai_modified_clause")
+        analysis.pop("ai_modified_risk_level")
+    return analysis
+
+
+def mock_reply(prompt):
+    """Answers each prompt shape llm_analyzer sends in the format its parser expects."""
+    if "[Clause " in prompt and "'results'" in prompt:
+        clauses_text = prompt.split("Clauses:\n", 1)[-1]
+        parts = re.split(r"\[Clause (\d+)\]\n", clauses_text)
+        results = [
+            {"clause_id": int(clause_id), **_structured(text.strip(), prompt)}
+            for clause_id, text in zip(parts[1::2], parts[2::2])
+        ]
+        return json.dumps({"results": results})
+    clause = prompt.rsplit("Clause: ", 1)[-1]
+    if "matching this JSON schema" in prompt:
+        return json.dumps(_structured(clause, prompt))
+    if "Return the result in this format ONLY" in prompt:
+        a = _analysis(clause)
+        return (
+            f"Regulation: {a['regulation']}\nSummary: {a['summary']}\nRisk: {a['risk_level']}\n"
+            f"Risk Percentage: {a['risk_percent']}%\nAI-Modified Clause: {a['ai_modified_clause']}\n"
+            f"AI-Modified Risk Level: {a['ai_modified_risk_level']}"
+        )
+    if "comma-separated list" in prompt:
+        return ", ".join(clause.split()[:3])
+    return "Mock rewrite with safeguards.\nRisk Level: Low"
+
+
+class MockLLMServer:
+    """
+    Local stand-in for the Groq and GitHub Models chat-completions endpoints.
+    Each request waits latency_s (scaled by a lognormal jitter), then fails with
+    a 500 at error_rate, answers 429 with Retry-After at throttle_rate, or
+    returns a reply shaped for the prompt, after a further token_latency_s per
+    completion token. Use it as a context manager.
+    """
+
+    def __init__(self, latency_s=0.3, jitter=0.3, error_rate=0.0, throttle_rate=0.0, retry_after_s=1.0, seed=0,
+                 token_latency_s=0.0):
+        self.latency_s = latency_s
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after_s = retry_after_s
+        self.token_latency_s = token_latency_s
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "completion_tokens": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _outcome(self):
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._random.random()
+            delay = self.latency_s * (self._random.lognormvariate(0, self.jitter) if self.jitter else 1.0)
+        if roll < self.error_rate:
+            return "errors", delay
+        if roll < self.error_rate + self.throttle_rate:
+            return "throttled", delay
+        return "ok", delay
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                outcome, delay = server._outcome()
+                headers = {"Content-Type": "application/json"}
+                completion_tokens = 0
+                if outcome == "errors":
+                    status, payload = 500, {"error": {"message": "mock server error"}}
+                elif outcome == "throttled":
+                    status, payload = 429, {"error": {"message": "mock rate limit"}}
+                    headers["Retry-After"] = str(server.retry_after_s)
+                else:
+                    prompt = body.get("messages", [{}])[-1].get("content", "")
+                    reply = mock_reply(prompt)
+                    completion_tokens = max(len(reply) // 4, 1)
+                    status, payload = 200, {
+                        "choices": [{"message": {"content": reply}}],
+                        "usage": {"prompt_tokens": max(len(prompt) // 4, 1), "completion_tokens": completion_tokens},
+                    }
+                    delay += completion_tokens * server.token_latency_s
+                time.sleep(delay)
+                with server._lock:
+                    server.stats[outcome] += 1
+                    server.stats["completion_tokens"] += completion_tokens
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client cancelled the request (e.g. a cancelled job) while it waited.
+                    self.close_connection = True
+
+        return Handler
+
+    def start(self):
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1/chat/completions"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
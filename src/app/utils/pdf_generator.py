@@ -1,9 +1,29 @@
-from io import BytesIO
+import csv
+from io import BytesIO, StringIO
+from xml.sax.saxutils import escape
+import docx
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 
-def generate_rewritten_pdf(df):
+REPORT_COLUMNS = ["clause_id", "risk_level", "clause", "AI-Modified Clause", "AI-Modified Risk Level"]
+
+def _report_rows(df):
+    for row in df.to_dict("records"):
+        yield (
+            row["clause_id"],
+            row.get("risk_level", "Unknown"),
+            row["clause"],
+            row.get("AI-Modified Clause") or "⚠️ Not available",
+            row.get("AI-Modified Risk Level") or "",
+        )
+
+def generate_rewritten_pdf(df, on_progress=None):
+    """
+    Builds the rewritten-clauses PDF. on_progress(fraction) is called as
+    ReportLab lays out the pages, so a caller building it in the background
+    can show how far along a large report is.
+    """
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     styles = getSampleStyleSheet()
@@ -12,24 +32,51 @@ def generate_rewritten_pdf(df):
     story.append(Paragraph("<b>AI-Rewritten Contract Clauses Report</b>", styles["Title"]))
     story.append(Spacer(1, 20))
 
-    for _, row in df.iterrows():
-        clause_id = row["clause_id"]
-        original = row["clause"]
-        modified = row.get("AI-Modified Clause", "⚠️ Not available")
-        original_risk = row.get("risk_level", "Unknown")
-
+    for clause_id, original_risk, original, modified, _ in _report_rows(df):
         story.append(Paragraph(f"<b>Clause ID: {clause_id}</b>", styles["h2"]))
         story.append(Spacer(1, 12))
-        
-        
+
+
         story.append(Paragraph(f"<b>Original Risk Level:</b> {original_risk}", styles["h3"]))
         story.append(Paragraph("<b>Original Clause:</b>", styles["h3"]))
-        story.append(Paragraph(original, styles["Normal"]))
+        # Clause text is plain text, but Paragraph parses markup; escape &, < and >.
+        story.append(Paragraph(escape(str(original)), styles["Normal"]))
         story.append(Spacer(1, 12))
         story.append(Paragraph("<b>AI-Modified Clause:</b>", styles["h3"]))
-        story.append(Paragraph(modified, styles["Normal"]))
+        story.append(Paragraph(escape(str(modified)), styles["Normal"]))
         story.append(Spacer(1, 24))
 
+    if on_progress:
+        total = {"size": len(story)}
+
+        def progress(kind, value):
+            if kind == "SIZE_EST":
+                total["size"] = max(value, 1)
+            elif kind == "PROGRESS":
+                on_progress(min(value / total["size"], 1.0))
+
+        doc.setProgressCallBack(progress)
     doc.build(story)
     buffer.seek(0)
-    return buffer.getvalue()
\ No newline at end of file
+    return buffer.getvalue()
+
+def generate_rewritten_csv(df):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Clause ID", "Original Risk Level", "Original Clause", "AI-Modified Clause", "New Risk Level"])
+    writer.writerows(_report_rows(df))
+    return buffer.getvalue().encode("utf-8")
+
+def generate_rewritten_docx(df):
+    document = docx.Document()
+    document.add_heading("AI-Rewritten Contract Clauses Report", level=0)
+    for clause_id, original_risk, original, modified, _ in _report_rows(df):
+        document.add_heading(f"Clause ID: {clause_id}", level=1)
+        document.add_paragraph(f"Original Risk Level: {original_risk}")
+        document.add_heading("Original Clause:", level=2)
+        document.add_paragraph(str(original))
+        document.add_heading("AI-Modified Clause:", level=2)
+        document.add_paragraph(str(modified))
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
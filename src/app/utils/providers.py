@@ -0,0 +1,42 @@
+# providers.py
+import os
+import threading
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _groq_client():
+    from groq import Groq
+    return Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+
+def _github_session():
+    # Reuses keep-alive connections for synchronous GitHub Models calls.
+    import requests
+    return requests.Session()
+
+
+# provider -> factory for its synchronous client. Factories import their SDK,
+# so a provider's dependencies are only loaded when it is first called.
+PROVIDER_FACTORIES = {
+    "groq": _groq_client,
+    "github": _github_session,
+}
+
+
+def get_provider_client(provider):
+    """Returns the process-wide synchronous client for a provider, building it on first use."""
+    if provider not in _clients:
+        if provider not in PROVIDER_FACTORIES:
+            raise ValueError(f"Unknown provider: {provider}")
+        with _clients_lock:
+            if provider not in _clients:
+                _clients[provider] = PROVIDER_FACTORIES[provider]()
+    return _clients[provider]
+
+
+def reset_provider_clients():
+    """Drops the cached clients, e.g. after an API key changes."""
+    with _clients_lock:
+        _clients.clear()
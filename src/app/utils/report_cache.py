@@ -0,0 +1,116 @@
+# report_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .config import REPORT_CONFIG
+from .pdf_generator import REPORT_COLUMNS, generate_rewritten_pdf, generate_rewritten_csv, generate_rewritten_docx
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# format -> (builder, mime type, file name)
+REPORT_FORMATS = {
+    "pdf": (generate_rewritten_pdf, "application/pdf", "ai_rewritten_clauses_report.pdf"),
+    "csv": (generate_rewritten_csv, "text/csv", "ai_rewritten_clauses_report.csv"),
+    "docx": (
+        generate_rewritten_docx,
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "ai_rewritten_clauses_report.docx",
+    ),
+}
+
+
+def report_key(df):
+    """Content hash of the rows a report is built from, independent of the frame's index."""
+    columns = [column for column in REPORT_COLUMNS if column in df]
+    hashes = pd.util.hash_pandas_object(df[columns].astype("string"), index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()
+
+
+class ReportCache:
+    """
+    Generated reports keyed by (result-set hash, format), least recently used
+    evicted first. Formats can be built inline with get_or_build or in the
+    background with request, which records progress so the page can poll
+    status() instead of blocking a rerun on a large PDF.
+    """
+
+    def __init__(self, max_entries=None, workers=None):
+        self.max_entries = max_entries or REPORT_CONFIG["max_entries"]
+        self._reports = OrderedDict()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or REPORT_CONFIG["workers"], thread_name_prefix="report"
+        )
+
+    def get(self, key, fmt):
+        with self._lock:
+            data = self._reports.get((key, fmt))
+            if data is not None:
+                self._reports.move_to_end((key, fmt))
+            return data
+
+    def _store(self, key, fmt, data):
+        with self._lock:
+            self._reports[(key, fmt)] = data
+            self._reports.move_to_end((key, fmt))
+            while len(self._reports) > self.max_entries:
+                evicted, _ = self._reports.popitem(last=False)
+                # The build that produced the evicted bytes no longer has anything to serve.
+                self._jobs.pop(evicted, None)
+
+    def get_or_build(self, key, fmt, df):
+        data = self.get(key, fmt)
+        if data is None:
+            data = REPORT_FORMATS[fmt][0](df)
+            self._store(key, fmt, data)
+        return data
+
+    def request(self, key, fmt, df):
+        """Starts building the report in the background unless it is cached or already being built."""
+        with self._lock:
+            if (key, fmt) in self._reports:
+                return
+            job = self._jobs.get((key, fmt))
+            if job and job["state"] == "building":
+                return
+            job = {"state": "building", "progress": 0.0, "error": None}
+            self._jobs[(key, fmt)] = job
+        # The builder works on its own copy, so a rerun that replaces the frame cannot change it mid-build.
+        self._executor.submit(self._build, key, fmt, df.copy(), job)
+
+    def _build(self, key, fmt, df, job):
+        builder = REPORT_FORMATS[fmt][0]
+        try:
+            if fmt == "pdf":
+                data = builder(df, on_progress=lambda fraction: job.update(progress=fraction))
+            else:
+                data = builder(df)
+            self._store(key, fmt, data)
+            job.update(state="ready", progress=1.0)
+        except Exception as e:
+            print(f"❌ Building the {fmt} report failed: {e}")
+            job.update(state="failed", error=str(e))
+
+    def status(self, key, fmt):
+        """{"state": "ready" | "building" | "failed" | "missing", "progress": 0..1, "error": ...}"""
+        if self.get(key, fmt) is not None:
+            return {"state": "ready", "progress": 1.0, "error": None}
+        with self._lock:
+            job = self._jobs.get((key, fmt))
+            # A finished build whose report has since been evicted has to be requested again.
+            if not job or job["state"] == "ready":
+                return {"state": "missing", "progress": 0.0, "error": None}
+            return dict(job)
+
+
+def get_report_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache()
+    return _cache
@@ -0,0 +1,392 @@
+# result_store.py
+import os
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from .config import RESULTS_CONFIG
+from .telemetry import get_telemetry
+
+_store = None
+_store_lock = threading.Lock()
+
+RESULT_COLUMNS = [
+    "contract", "run_id", "clause_id", "clause", "regulation", "key_clauses", "risk_level",
+    "risk_percent", "summary", "ai_modified_clause", "ai_modified_risk_level", "analyzed_at",
+    "reused_from", "reuse_similarity", "page_start", "page_end", "char_start", "char_end",
+    "revision_status", "prior_clause_id",
+]
+
+# Columns added after the first release of the store, created on open if missing.
+_ADDED_COLUMNS = {
+    "reused_from": "TEXT", "reuse_similarity": "REAL",
+    "page_start": "INTEGER", "page_end": "INTEGER", "char_start": "INTEGER", "char_end": "INTEGER",
+    "revision_status": "TEXT", "prior_clause_id": "INTEGER",
+}
+
+
+def _percent_value(risk_percent):
+    try:
+        return float(str(risk_percent).strip().rstrip("%"))
+    except ValueError:
+        return None
+
+
+class ResultStore:
+    """
+    Local SQLite store for clause analysis results, usable instead of (or next to)
+    Google Sheets. Rows are bulk-inserted per run and indexed by contract,
+    clause id, regulation and risk level so history and cross-contract reports
+    are answered locally.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS clause_results (
+                contract TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                clause_id INTEGER NOT NULL,
+                clause TEXT,
+                regulation TEXT,
+                key_clauses TEXT,
+                risk_level TEXT,
+                risk_percent REAL,
+                summary TEXT,
+                ai_modified_clause TEXT,
+                ai_modified_risk_level TEXT,
+                analyzed_at REAL NOT NULL,
+                reused_from TEXT,
+                reuse_similarity REAL,
+                page_start INTEGER,
+                page_end INTEGER,
+                char_start INTEGER,
+                char_end INTEGER,
+                revision_status TEXT,
+                prior_clause_id INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_contract ON clause_results(contract, run_id);
+            CREATE INDEX IF NOT EXISTS idx_results_clause_id ON clause_results(clause_id);
+            CREATE INDEX IF NOT EXISTS idx_results_regulation ON clause_results(regulation);
+            CREATE INDEX IF NOT EXISTS idx_results_risk ON clause_results(risk_level);
+            CREATE TABLE IF NOT EXISTS id_counters (
+                name TEXT PRIMARY KEY,
+                next_id INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO id_counters(name, next_id) VALUES ('clause_id', 1);
+            """
+        )
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(clause_results)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE clause_results ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+
+    def allocate_ids(self, count=1):
+        """
+        Reserves `count` consecutive clause IDs and returns the first one.
+        The counter lives in the database and is advanced under SQLite's write
+        lock, so batch and job workers sharing the store never get the same IDs.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Rows written before the counter existed are skipped too.
+                start = self._conn.execute(
+                    "SELECT MAX(next_id, (SELECT COALESCE(MAX(clause_id), 0) + 1 FROM clause_results)) "
+                    "FROM id_counters WHERE name = 'clause_id'"
+                ).fetchone()[0]
+                self._conn.execute(
+                    "UPDATE id_counters SET next_id = ? WHERE name = 'clause_id'", (start + count,)
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return start
+
+    def insert_results(self, contract, run_id, results):
+        """Bulk-inserts UI result dicts in one transaction; a result's own `contract` key wins."""
+        now = time.time()
+        records = [
+            (
+                r.get("contract", contract), run_id, r["clause_id"], r.get("clause"),
+                r.get("regulation"), r.get("key_clauses"), r.get("risk_level"),
+                _percent_value(r.get("risk_percent")), r.get("summary"),
+                r.get("AI-Modified Clause"), r.get("AI-Modified Risk Level"), now,
+                r.get("reused_from"), r.get("reuse_similarity"),
+                r.get("page_start"), r.get("page_end"), r.get("char_start"), r.get("char_end"),
+                r.get("revision_status"), r.get("prior_clause_id"),
+            )
+            for r in results
+        ]
+        with self._lock, get_telemetry().span("result_store_write", rows=len(records)):
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO clause_results({', '.join(RESULT_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(RESULT_COLUMNS))})",
+                    records,
+                )
+        return len(records)
+
+    def update_rewrites(self, results):
+        """Saves the AI-modified clause of results rewritten after they were stored (two-phase analysis)."""
+        records = [
+            (r.get("AI-Modified Clause"), r.get("AI-Modified Risk Level"), r.get("contract"), r["clause_id"])
+            for r in results
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE clause_results SET ai_modified_clause = ?, ai_modified_risk_level = ? "
+                "WHERE contract = ? AND clause_id = ?",
+                records,
+            )
+        return len(records)
+
+    def writer(self, contract):
+        return ResultStoreWriter(self, contract)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def history(self, contract=None, regulation=None, risk_level=None, latest_only=False, limit=1000):
+        """Clause results matching the filters, newest run first."""
+        conditions, params = [], []
+        for column, value in (("contract", contract), ("regulation", regulation), ("risk_level", risk_level)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if latest_only:
+            conditions.append(
+                "run_id = (SELECT r.run_id FROM clause_results r WHERE r.contract = clause_results.contract "
+                "ORDER BY r.analyzed_at DESC LIMIT 1)"
+            )
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(
+            f"SELECT * FROM clause_results {where} ORDER BY analyzed_at DESC, clause_id LIMIT ?",
+            (*params, limit),
+        )
+
+    def contracts(self):
+        return [row["contract"] for row in self._query(
+            "SELECT contract FROM clause_results GROUP BY contract ORDER BY MAX(analyzed_at) DESC"
+        )]
+
+    def risk_report(self):
+        """Per-contract clause counts by risk level and average risk, across all runs."""
+        return self._query(
+            """
+            SELECT contract,
+                   COUNT(DISTINCT run_id) AS runs,
+                   COUNT(*) AS clauses,
+                   SUM(risk_level = 'High') AS high,
+                   SUM(risk_level = 'Medium') AS medium,
+                   SUM(risk_level = 'Low') AS low,
+                   ROUND(AVG(risk_percent), 1) AS avg_risk_percent,
+                   MAX(analyzed_at) AS last_analyzed
+            FROM clause_results
+            GROUP BY contract
+            ORDER BY high DESC, avg_risk_percent DESC
+            """
+        )
+
+    def regulation_report(self):
+        return self._query(
+            """
+            SELECT regulation, COUNT(*) AS clauses, COUNT(DISTINCT contract) AS contracts,
+                   ROUND(AVG(risk_percent), 1) AS avg_risk_percent
+            FROM clause_results
+            GROUP BY regulation
+            ORDER BY clauses DESC
+            """
+        )
+
+
+class ResultStoreWriter:
+    """Per-run sink over a ResultStore, with the same interface as SheetSink."""
+
+    def __init__(self, store, contract, batch_size=None):
+        self.store = store
+        self.contract = contract
+        self.run_id = uuid.uuid4().hex
+        self.batch_size = batch_size or RESULTS_CONFIG["batch_size"]
+        self.rows_written = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def ensure_header(self):
+        pass
+
+    def allocate_ids(self, count=1):
+        return self.store.allocate_ids(count)
+
+    def write(self, result, row):
+        with self._lock:
+            self._buffer.append(result)
+            if len(self._buffer) < self.batch_size:
+                return
+            pending, self._buffer = self._buffer, []
+        self.rows_written += self.store.insert_results(self.contract, self.run_id, pending)
+
+    def close(self):
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        if pending:
+            self.rows_written += self.store.insert_results(self.contract, self.run_id, pending)
+        print(f"Result store: {self.rows_written} rows saved for {self.contract}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FanOutSink:
+    """Writes every result to several sinks; clause IDs come from the first one."""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def ensure_header(self):
+        for sink in self.sinks:
+            sink.ensure_header()
+
+    def allocate_ids(self, count=1):
+        return self.sinks[0].allocate_ids(count)
+
+    def write(self, result, row):
+        for sink in self.sinks:
+            sink.write(result, row)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def get_result_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResultStore(RESULTS_CONFIG["path"])
+    return _store
+
+
+def resolve_backend(backend=None, wks=None):
+    """
+    The results backend to use, with "auto" resolved to "sheets" or "sqlite".
+    Passing wks selects "sheets" unless the backend is "both" (see open_result_sink).
+    """
+    backend = backend or RESULTS_CONFIG["backend"]
+    if wks is not None and backend != "both":
+        # An explicit worksheet (e.g. a FakeWorksheet) always receives the results.
+        return "sheets"
+    if backend == "auto":
+        creds_path = os.getenv("GOOGLE_SHEET_API_CRED")
+        backend = "sheets" if creds_path and os.path.exists(creds_path) else "sqlite"
+    return backend
+
+
+def save_rewrites(results, wks=None, backend=None):
+    """
+    Saves rewrites added to results after they were stored (lazy or post-run
+    rewrites of two-phase analysis) to every configured backend, like
+    open_result_sink. Returns False if Google Sheets is required but unreachable.
+    """
+    from .sheet_writer import update_sheet_rewrites
+    from .data_handler import connect_sheet
+
+    if not results:
+        return True
+    backend = resolve_backend(backend, wks)
+    saved = True
+    if backend in ("sheets", "both"):
+        wks = wks or connect_sheet()
+        if wks:
+            update_sheet_rewrites(wks, results)
+        else:
+            print("Failed to connect to Google Sheets; rewrites were not saved there.")
+            saved = False
+    if backend in ("sqlite", "both"):
+        get_result_store().update_rewrites(results)
+    return saved
+
+
+def open_result_sink(contract, wks=None, backend=None):
+    """
+    Opens the configured results backend for one analysis run.
+    backend is "sheets", "sqlite", "both" or "auto" (Sheets when credentials are
+    configured, otherwise the local store). Passing wks forces the Sheets backend
+    onto that worksheet. Returns None if Google Sheets is required but unreachable.
+    """
+    from .sheet_writer import SheetSink
+    from .data_handler import connect_sheet
+
+    backend = resolve_backend(backend, wks)
+    sinks = []
+    if backend in ("sheets", "both"):
+        wks = wks or connect_sheet()
+        if not wks:
+            print("Failed to connect to Google Sheets")
+            return None
+        sinks.append(SheetSink(wks))
+    if backend in ("sqlite", "both"):
+        sinks.append(get_result_store().writer(contract))
+    if not sinks:
+        raise ValueError(f"Unknown results backend: {backend}")
+    return sinks[0] if len(sinks) == 1 else FanOutSink(sinks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the local analysis result store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    history = subparsers.add_parser("history", help="List stored clause results.")
+    history.add_argument("--contract")
+    history.add_argument("--regulation")
+    history.add_argument("--risk", dest="risk_level")
+    history.add_argument("--latest", action="store_true", help="Only the latest run of each contract.")
+    history.add_argument("--limit", type=int, default=50)
+    subparsers.add_parser("contracts", help="List analyzed contracts.")
+    subparsers.add_parser("report", help="Risk counts per contract.")
+    subparsers.add_parser("regulations", help="Clause counts per regulation.")
+    args = parser.parse_args()
+
+    store = ResultStore(RESULTS_CONFIG["path"])
+    if args.command == "history":
+        rows = store.history(args.contract, args.regulation, args.risk_level, args.latest, args.limit)
+        for row in rows:
+            print(f"{row['contract']} #{row['clause_id']}: {row['regulation']} / {row['risk_level']} "
+                  f"({row['risk_percent']}%) {row['summary']}")
+    elif args.command == "contracts":
+        for contract in store.contracts():
+            print(contract)
+    elif args.command == "report":
+        for row in store.risk_report():
+            print(f"{row['contract']}: {row['clauses']} clauses over {row['runs']} runs, "
+                  f"High {row['high']}, Medium {row['medium']}, Low {row['low']}, avg risk {row['avg_risk_percent']}%")
+    else:
+        for row in store.regulation_report():
+            print(f"{row['regulation']}: {row['clauses']} clauses in {row['contracts']} contracts, "
+                  f"avg risk {row['avg_risk_percent']}%")
+
+
+if __name__ == "__main__":
+    main()
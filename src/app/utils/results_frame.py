@@ -0,0 +1,90 @@
+# results_frame.py
+import pandas as pd
+
+RISK_LEVELS = ["High", "Medium", "Low"]
+
+TEXT_COLUMNS = ["clause", "key_clauses", "summary", "AI-Modified Clause"]
+
+PROVENANCE_COLUMNS = ["page_start", "page_end", "char_start", "char_end"]
+
+# Higher is riskier; used to compare a clause's risk with its prior version's.
+_RISK_RANK = {"Low": 0, "Medium": 1, "High": 2}
+
+
+def build_results_frame(results):
+    """
+    One typed DataFrame of the UI result dicts: risk_percent as a float (NaN when
+    unparseable), risk levels as an ordered High > Medium > Low categorical,
+    regulation as a categorical, and a boolean `compliant` (Low risk) column.
+    """
+    df = pd.DataFrame(results or [])
+    for column in ["clause_id", "regulation", "risk_level", "risk_percent", "AI-Modified Risk Level", *TEXT_COLUMNS]:
+        if column not in df:
+            df[column] = pd.Series(dtype="object")
+    df["clause_id"] = pd.to_numeric(df["clause_id"], errors="coerce").astype("Int64")
+    # Page and character provenance, when the clauses came from the chunker.
+    for column in PROVENANCE_COLUMNS:
+        values = df[column] if column in df else pd.Series(pd.NA, index=df.index, dtype="object")
+        df[column] = pd.to_numeric(values, errors="coerce").astype("Int64")
+    df["risk_percent"] = _percent_values(df["risk_percent"])
+    for column in ["risk_level", "AI-Modified Risk Level"]:
+        df[column] = pd.Categorical(df[column], categories=RISK_LEVELS, ordered=True)
+    df["regulation"] = df["regulation"].fillna("None").astype("category")
+    for column in TEXT_COLUMNS:
+        df[column] = df[column].fillna("").astype("string")
+    df["compliant"] = (df["risk_level"] == "Low").to_numpy()
+    # Revision runs (see utils.revision) carry each clause's status and prior risk.
+    if "revision_status" in df:
+        df["revision_status"] = df["revision_status"].astype("string")
+        df["prior_clause_id"] = pd.to_numeric(df["prior_clause_id"], errors="coerce").astype("Int64")
+        df["prior_risk_level"] = pd.Categorical(df["prior_risk_level"], categories=RISK_LEVELS, ordered=True)
+        df["prior_risk_percent"] = _percent_values(df["prior_risk_percent"])
+    return df
+
+
+def _percent_values(values):
+    """Percent strings such as "75%" (or plain numbers) as floats, NaN when unparseable."""
+    return pd.to_numeric(
+        values.astype("string").str.replace("%", "", regex=False).str.strip(), errors="coerce"
+    ).astype("float64")
+
+
+def risk_changes(df):
+    """
+    The added and modified clauses of a revision run, with their risk against
+    the prior version's: `change` is "riskier", "safer", "same" or "new".
+    Returns None for results that did not come from a revision run.
+    """
+    if "revision_status" not in df:
+        return None
+    changed = df[df["revision_status"].isin(["modified", "added"])].copy()
+    current = changed["risk_level"].astype("object").map(_RISK_RANK)
+    prior = changed["prior_risk_level"].astype("object").map(_RISK_RANK)
+    changed["change"] = "same"
+    changed.loc[current > prior, "change"] = "riskier"
+    changed.loc[current < prior, "change"] = "safer"
+    changed.loc[prior.isna(), "change"] = "new"
+    changed["risk_delta"] = changed["risk_percent"] - changed["prior_risk_percent"]
+    return changed
+
+
+def risk_summary(df):
+    """Counts, ratios and averages the dashboard pages show, computed column-wise."""
+    total = len(df)
+    counts = df["risk_level"].value_counts()
+    compliant = int(df["compliant"].sum())
+    avg_risk = df["risk_percent"].mean()
+    regulation = df["regulation"].astype("string")
+    return {
+        "total": total,
+        "high": int(counts.get("High", 0)),
+        "medium": int(counts.get("Medium", 0)),
+        "low": int(counts.get("Low", 0)),
+        "compliant": compliant,
+        "non_compliant": total - compliant,
+        "compliance_rate": compliant / total * 100 if total else 0.0,
+        "avg_risk": 0.0 if pd.isna(avg_risk) else float(avg_risk),
+        "gdpr": int(regulation.str.contains("GDPR", regex=False).sum()),
+        "hipaa": int(regulation.str.contains("HIPAA", regex=False).sum()),
+        "mentions_liability": bool(df["key_clauses"].str.contains("liability", case=False, regex=False).any()),
+    }
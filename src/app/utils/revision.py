@@ -0,0 +1,167 @@
+# revision.py
+import hashlib
+from difflib import SequenceMatcher
+import numpy as np
+from .config import REVISION_CONFIG
+from .clause_cache import normalize_clause
+
+
+def _fingerprint(clause):
+    return hashlib.sha256(normalize_clause(clause).encode("utf-8")).hexdigest()
+
+
+def _unit_rows(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _similarities(new_texts, prior_texts):
+    """Cosine similarities of the clause embeddings, or difflib ratios when no embedding model is available."""
+    try:
+        from .embedding_service import get_embedding_service
+        vectors = _unit_rows(get_embedding_service().embed_documents(new_texts + prior_texts))
+        return vectors[:len(new_texts)] @ vectors[len(new_texts):].T
+    except Exception as e:
+        print(f"⚠️ Clause embeddings unavailable ({e}); aligning revisions by text similarity.")
+        return np.array([
+            [SequenceMatcher(None, new, prior, autojunk=False).quick_ratio() for prior in prior_texts]
+            for new in new_texts
+        ])
+
+
+def align_clauses(clauses, prior_results, match_threshold=None):
+    """
+    Aligns the clause texts of a new version with the result dicts of the prior one.
+    Clauses with the same normalized text are matched first; the rest are paired
+    greedily, most similar first, while their embedding similarity reaches
+    match_threshold. Returns (matches, removed): matches[i] is (status, prior
+    result or None, similarity) for clause i, with status "unchanged", "modified"
+    or "added", and removed holds the prior results left unmatched.
+    """
+    match_threshold = REVISION_CONFIG["match_threshold"] if match_threshold is None else match_threshold
+    matches = [("added", None, None)] * len(clauses)
+    unmatched_prior = set(range(len(prior_results)))
+
+    by_fingerprint = {}
+    for j, prior in enumerate(prior_results):
+        by_fingerprint.setdefault(_fingerprint(prior["clause"]), []).append(j)
+    for i, clause in enumerate(clauses):
+        candidates = by_fingerprint.get(_fingerprint(clause))
+        if candidates:
+            j = candidates.pop(0)
+            matches[i] = ("unchanged", prior_results[j], 1.0)
+            unmatched_prior.discard(j)
+
+    new_left = [i for i, match in enumerate(matches) if match[1] is None]
+    prior_left = sorted(unmatched_prior)
+    if new_left and prior_left:
+        similarity = _similarities(
+            [normalize_clause(clauses[i]) for i in new_left],
+            [normalize_clause(prior_results[j]["clause"]) for j in prior_left],
+        )
+        paired_new, paired_prior = set(), set()
+        for a, b in zip(*np.unravel_index(np.argsort(-similarity, axis=None), similarity.shape)):
+            if similarity[a, b] < match_threshold:
+                break
+            if a in paired_new or b in paired_prior:
+                continue
+            paired_new.add(a)
+            paired_prior.add(b)
+            j = prior_left[b]
+            matches[new_left[a]] = ("modified", prior_results[j], round(float(similarity[a, b]), 4))
+            unmatched_prior.discard(j)
+
+    return matches, [prior_results[j] for j in sorted(unmatched_prior)]
+
+
+def _revision_fields(status, prior, similarity):
+    return {
+        "revision_status": status,
+        "prior_clause_id": prior["clause_id"] if prior else None,
+        "prior_risk_level": prior.get("risk_level") if prior else None,
+        "prior_risk_percent": prior.get("risk_percent") if prior else None,
+        "revision_similarity": similarity,
+    }
+
+
+def chunk_revision(file_path, prior_results, prior_label=None):
+    """
+    Chunks a revised contract against the prior version's results, so an edit
+    only produces new clauses where the text changed. Each prior clause found
+    verbatim in the new text, in order, is kept as a clause of its own; only the
+    text between those anchors is chunked afresh and aligned with the prior
+    clauses left over (see align_clauses).
+    Returns (clauses, carried, summary): the clause dicts in document order with
+    pages, offsets and revision fields; the indexes of unchanged clauses mapped
+    to the prior result they carry forward; and counts per status plus the
+    removed clauses.
+    """
+    from .data_handler import read_document, semantic_chunking_many
+    from .chunk_normalizer import TextLocator, clause_at, with_provenance
+
+    text, page_starts = read_document(file_path)
+    locator = TextLocator(text)
+    pieces, leftover, cursor = [], [], 0
+    for prior in sorted(prior_results, key=lambda result: result["clause_id"]):
+        span = locator.locate(prior["clause"], prefix_fallback=False)
+        if span is None:
+            leftover.append(prior)
+            continue
+        if text[cursor:span[0]].strip():
+            pieces.append((cursor, span[0], None))
+        pieces.append((span[0], span[1], prior))
+        cursor = span[1]
+    if text[cursor:].strip():
+        pieces.append((cursor, len(text), None))
+
+    gaps = [(start, end) for start, end, prior in pieces if prior is None]
+    gap_chunks = iter(semantic_chunking_many([text[start:end] for start, end in gaps]) if gaps else [])
+    clauses, carried, fresh = [], {}, []
+    for start, end, prior in pieces:
+        if prior is not None:
+            carried[len(clauses)] = prior
+            clauses.append({**clause_at(text[start:end].strip(), start, end, page_starts),
+                            **_revision_fields("unchanged", prior, 1.0)})
+            continue
+        for clause in with_provenance(next(gap_chunks), text[start:end], page_starts, start):
+            if clause["clause"].strip():
+                fresh.append(len(clauses))
+                clauses.append(clause)
+
+    matches, removed = align_clauses([clauses[i]["clause"] for i in fresh], leftover)
+    for i, (status, prior, similarity) in zip(fresh, matches):
+        clauses[i].update(_revision_fields(status, prior, similarity))
+        if status == "unchanged":
+            carried[i] = prior
+
+    counts = {
+        status: sum(1 for clause in clauses if clause["revision_status"] == status)
+        for status in ("unchanged", "modified", "added")
+    }
+    summary = {
+        "prior": prior_label,
+        **counts,
+        "removed": [
+            {field: prior.get(field) for field in ("clause_id", "clause", "risk_level", "risk_percent", "summary")}
+            for prior in removed
+        ],
+    }
+    return clauses, carried, summary
+
+
+def carry_forward(prior_result, clause_id, clause):
+    """The UI result and sheet row for an unchanged clause, reusing the prior version's analysis."""
+    from .contract_analyzer import build_clause_result
+    analysis = {
+        "regulation": prior_result.get("regulation"),
+        "summary": prior_result.get("summary"),
+        "risk_level": prior_result.get("risk_level"),
+        "risk_percent": prior_result.get("risk_percent"),
+        "key_clauses": prior_result.get("key_clauses"),
+        "ai_modified_clause": prior_result.get("AI-Modified Clause"),
+        "ai_modified_risk_level": prior_result.get("AI-Modified Risk Level"),
+    }
+    result, row = build_clause_result(clause_id, clause["clause"], analysis)
+    result.update({key: value for key, value in clause.items() if key != "clause"})
+    return result, row
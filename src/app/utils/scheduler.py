@@ -0,0 +1,168 @@
+# scheduler.py
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from contextlib import asynccontextmanager
+from .config import SCHEDULER_CONFIG
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) used for rate and batch budgeting."""
+    return len(text) // 4 + 1
+
+
+def parse_retry_after(headers, default):
+    """Reads a Retry-After header given in seconds or as an HTTP date."""
+    value = headers.get("retry-after")
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """
+    Per-minute budget that refills continuously.
+    reserve() always takes the tokens and returns how long the caller must wait
+    for the bucket to climb back out of debt, so waiters are served in order.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+        self.available -= min(amount, self.capacity)
+        return -self.available / self.rate if self.available < 0 else 0.0
+
+
+class ModelLane:
+    """
+    Admission control for one provider/model pair: RPM and TPM token buckets,
+    a pause honoring Retry-After, and an AIMD concurrency limit.
+    """
+
+    def __init__(self, name, rpm=None, tpm=None):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.limit = float(SCHEDULER_CONFIG["initial_concurrency"])
+        self.in_flight = 0
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.completed = 0
+        self.throttle_events = 0
+        self._lock = threading.Lock()
+
+    async def acquire(self, tokens):
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    if now >= self.paused_until and self.in_flight < int(self.limit):
+                        self.in_flight += 1
+                        wait = max(
+                            self.requests.reserve(1) if self.requests else 0.0,
+                            self.tokens.reserve(tokens) if self.tokens else 0.0,
+                        )
+                        break
+                    delay = max(self.paused_until - now, SCHEDULER_CONFIG["poll_interval_s"])
+                await asyncio.sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.release()
+                raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def on_success(self):
+        with self._lock:
+            self.completed += 1
+            # Additive increase: roughly one extra slot per full window of successes.
+            self.limit = min(
+                float(SCHEDULER_CONFIG["max_concurrency_per_model"]),
+                self.limit + SCHEDULER_CONFIG["additive_increase"] / self.limit,
+            )
+
+    def on_throttle(self, retry_after):
+        with self._lock:
+            self.throttle_events += 1
+            self.limit = max(1.0, self.limit * SCHEDULER_CONFIG["multiplicative_decrease"])
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        print(f"⏳ {self.name} throttled; pausing {retry_after:.1f}s, concurrency limit now {int(self.limit)}.")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.name,
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "concurrency_limit": int(self.limit),
+                "completed": self.completed,
+                "throttle_events": self.throttle_events,
+                "paused_for_s": round(max(self.paused_until - time.monotonic(), 0.0), 1),
+            }
+
+
+class RateLimitScheduler:
+    """Process-wide registry of ModelLanes, shared by every analysis run and event loop."""
+
+    def __init__(self):
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def lane(self, config):
+        key = f"{config['provider']}:{config['model_id']}"
+        with self._lock:
+            if key not in self._lanes:
+                self._lanes[key] = ModelLane(key, config.get("rpm"), config.get("tpm"))
+            return self._lanes[key]
+
+    @asynccontextmanager
+    async def slot(self, config, tokens):
+        """Waits for rate budget and a concurrency slot on the model's lane."""
+        lane = self.lane(config)
+        await lane.acquire(tokens)
+        try:
+            yield lane
+        finally:
+            lane.release()
+
+    def stats(self):
+        with self._lock:
+            lanes = list(self._lanes.values())
+        return [lane.stats() for lane in lanes]
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RateLimitScheduler()
+    return _scheduler
@@ -0,0 +1,276 @@
+# sheet_writer.py
+import os
+import json
+import time
+import argparse
+import threading
+import contextvars
+from .config import SHEETS_CONFIG
+from .telemetry import get_telemetry
+
+SHEET_HEADER = [
+    "Clause ID", "Regulation", "Key Clauses (AI)", "Risk Level (AI)", "Risk % (AI)", "AI Summary",
+    "AI-Modified Clause", "AI-Modified Risk Level",
+]
+
+# Next free clause ID per worksheet, shared by every sink in the process.
+_id_cursors = {}
+_id_cursors_lock = threading.Lock()
+
+
+def _sheet_key(wks):
+    try:
+        return f"{wks.spreadsheet.id}:{wks.id}"
+    except AttributeError:
+        return str(id(wks))
+
+
+class SheetSink:
+    """
+    Buffered writer for the analysis worksheet.
+    The header and the next clause ID are read once (one column, not the whole
+    sheet) and then cached for the process. Appended rows are flushed on a
+    background thread whenever batch_size rows are waiting or the oldest has
+    waited flush_interval_s, with retries; rows that still fail are spooled to
+    a local file instead of being lost. An idle sink's thread sleeps until rows
+    arrive or the sink is closed.
+    """
+
+    def __init__(self, wks, batch_size=None, flush_interval_s=None, max_retries=None):
+        self.wks = wks
+        self.batch_size = batch_size or SHEETS_CONFIG["batch_size"]
+        self.flush_interval_s = flush_interval_s or SHEETS_CONFIG["flush_interval_s"]
+        self.max_retries = SHEETS_CONFIG["max_retries"] if max_retries is None else max_retries
+        self.rows_written = 0
+        self.flushes = 0
+        self.failed_rows = []
+        self._key = _sheet_key(wks)
+        self._buffer = []
+        # When the oldest buffered row arrived; the flush interval counts from it.
+        self._buffered_at = None
+        self._condition = threading.Condition()
+        self._closed = False
+        # The flush thread inherits the caller's context, so its spans belong to the caller's run.
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,), daemon=True)
+        self._thread.start()
+
+    def ensure_header(self, header=SHEET_HEADER):
+        current_header = self.wks.get_row(1, include_tailing_empty=False)
+        if current_header != header:
+            self.wks.update_row(1, header)
+            print("Header updated to match required columns.")
+
+    def _load_id_cursor(self):
+        # Only the ID column is read, and only the first time this worksheet is seen.
+        ids = self.wks.get_col(1, include_tailing_empty=False)
+        numeric = [int(v) for v in ids[1:] if str(v).strip().isdigit()]
+        return max(max(numeric, default=0) + 1, len(ids))
+
+    def allocate_ids(self, count=1):
+        """Reserves `count` consecutive clause IDs and returns the first one."""
+        with _id_cursors_lock:
+            if self._key not in _id_cursors:
+                _id_cursors[self._key] = self._load_id_cursor()
+            start = _id_cursors[self._key]
+            _id_cursors[self._key] = start + count
+        return start
+
+    def append(self, rows):
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("SheetSink is closed.")
+            if not rows:
+                return
+            was_idle = not self._buffer
+            if was_idle:
+                self._buffered_at = time.monotonic()
+            self._buffer.extend(rows)
+            # The first rows wake the flush thread from its idle wait to start the interval.
+            if was_idle or len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+
+    def write(self, result, row):
+        """Results-backend interface: only the sheet row is stored."""
+        self.append([row])
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and len(self._buffer) < self.batch_size:
+                    if not self._buffer:
+                        self._condition.wait()
+                        continue
+                    remaining = self.flush_interval_s - (time.monotonic() - self._buffered_at)
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(timeout=remaining)
+                rows, self._buffer = self._buffer, []
+                closed = self._closed
+            if rows:
+                self._write(rows)
+            if closed:
+                return
+
+    def _write(self, rows):
+        rows.sort(key=lambda row: row[0])
+        for attempt in range(self.max_retries + 1):
+            try:
+                with get_telemetry().span("sheet_write", rows=len(rows), attempt=attempt + 1):
+                    self.wks.append_table(rows)
+                self.rows_written += len(rows)
+                self.flushes += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"❌ Sheet write of {len(rows)} rows failed after {attempt + 1} attempts: {e}")
+                    self._spool(rows)
+                    return
+                delay = SHEETS_CONFIG["retry_backoff_s"] * (2 ** attempt)
+                print(f"⚠️ Sheet write failed ({e}); retrying in {delay:.1f}s.")
+                time.sleep(delay)
+
+    def _spool(self, rows):
+        self.failed_rows.extend(rows)
+        path = SHEETS_CONFIG["spool_path"]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as spool:
+            for row in rows:
+                spool.write(json.dumps({"sheet": self._key, "row": row}) + "\n")
+        print(f"Saved {len(rows)} unsent rows to {path}.")
+
+    def close(self):
+        """Flushes everything still buffered and stops the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        print(f"Sheet writer: {self.rows_written} rows in {self.flushes} writes, {len(self.failed_rows)} spooled.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def update_sheet_rewrites(wks, results):
+    """
+    Fills in the AI-modified clause and risk level of rows already in the sheet,
+    for rewrites added after their results were stored (two-phase analysis).
+    Rows are found by clause ID with one read of the ID column. Returns how many
+    rows were updated.
+    """
+    ids = wks.get_col(1, include_tailing_empty=False)
+    row_numbers = {str(value).strip(): number for number, value in enumerate(ids, start=1) if number > 1}
+    offset = SHEET_HEADER.index("AI-Modified Clause")
+    updated = 0
+    with get_telemetry().span("sheet_write", rows=len(results), attempt=1):
+        for result in results:
+            number = row_numbers.get(str(result["clause_id"]))
+            if number is None:
+                print(f"⚠️ Clause ID {result['clause_id']} is not in the sheet; its rewrite was not saved there.")
+                continue
+            values = [result.get("AI-Modified Clause") or "", result.get("AI-Modified Risk Level") or ""]
+            try:
+                wks.update_row(number, values, col_offset=offset)
+            except Exception as e:
+                print(f"❌ Saving the rewrite of Clause ID {result['clause_id']} to the sheet failed: {e}")
+                continue
+            updated += 1
+    return updated
+
+
+class FakeWorksheet:
+    """
+    In-memory stand-in for a pygsheets Worksheet, for offline runs and benchmarks.
+    Every call sleeps for latency_s (plus per_row_latency_s per row read or written)
+    and write calls fail with probability fail_rate; busy_s totals the simulated API time.
+    """
+
+    def __init__(self, latency_s=0.0, per_row_latency_s=0.0, fail_rate=0.0, rows=None):
+        import random
+        self.latency_s = latency_s
+        self.per_row_latency_s = per_row_latency_s
+        self.fail_rate = fail_rate
+        self.rows = [list(r) for r in (rows or [])]
+        self.calls = {}
+        self.busy_s = 0.0
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+
+    def _call(self, name, rows_touched=0, write=False):
+        delay = self.latency_s + rows_touched * self.per_row_latency_s
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.busy_s += delay
+        time.sleep(delay)
+        if write and self._random.random() < self.fail_rate:
+            raise ConnectionError("Simulated Sheets API failure")
+
+    def get_row(self, row, include_tailing_empty=True):
+        self._call("get_row", 1)
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def update_row(self, index, values, col_offset=0):
+        self._call("update_row", 1, write=True)
+        with self._lock:
+            while len(self.rows) < index:
+                self.rows.append([])
+            row = self.rows[index - 1]
+            row.extend([""] * (col_offset + len(values) - len(row)))
+            row[col_offset:col_offset + len(values)] = list(values)
+
+    def get_col(self, col, include_tailing_empty=True):
+        self._call("get_col", len(self.rows))
+        return [r[col - 1] if len(r) >= col else "" for r in self.rows]
+
+    def get_all_values(self, include_tailing_empty=True, **kwargs):
+        self._call("get_all_values", len(self.rows) * 6)
+        return [list(r) for r in self.rows]
+
+    def append_table(self, values, **kwargs):
+        self._call("append_table", len(values), write=True)
+        with self._lock:
+            self.rows.extend(list(v) for v in values)
+
+
+def main():
+    from .data_handler import get_next_id, update_sheet_with_data
+
+    parser = argparse.ArgumentParser(description="Compare the legacy sheet path with SheetSink on a FakeWorksheet.")
+    parser.add_argument("--contracts", type=int, default=20)
+    parser.add_argument("--clauses", type=int, default=150)
+    parser.add_argument("--history", type=int, default=20000, help="Rows already in the sheet.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per API call.")
+    parser.add_argument("--per-row-latency", type=float, default=0.00005)
+    args = parser.parse_args()
+
+    def fake_sheet():
+        history = [[i, "None", "", "Low", "0%", ""] for i in range(1, args.history + 1)]
+        return FakeWorksheet(args.latency, args.per_row_latency, rows=[SHEET_HEADER] + history)
+
+    wks = fake_sheet()
+    started = time.perf_counter()
+    for _ in range(args.contracts):
+        wks.get_row(1)
+        start = get_next_id(wks)
+        update_sheet_with_data(wks, [[start + i, "None", "", "Low", "0%", ""] for i in range(args.clauses)])
+    legacy = time.perf_counter() - started
+
+    wks = fake_sheet()
+    started = time.perf_counter()
+    for _ in range(args.contracts):
+        with SheetSink(wks) as sink:
+            sink.ensure_header()
+            start = sink.allocate_ids(args.clauses)
+            for i in range(args.clauses):
+                sink.append([[start + i, "None", "", "Low", "0%", ""]])
+    buffered = time.perf_counter() - started
+
+    print(json.dumps({"legacy_s": round(legacy, 3), "sheet_sink_s": round(buffered, 3), "api_calls": wks.calls}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
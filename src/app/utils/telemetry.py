@@ -0,0 +1,209 @@
+# telemetry.py
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+from .config import TELEMETRY_CONFIG
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+# Run the spans of the current thread or task belong to; falls back to the latest run.
+_current_run = contextvars.ContextVar("telemetry_run", default=None)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Telemetry:
+    """
+    Structured timing spans for the analysis pipeline.
+    Every span records a stage (extraction, chunking, llm_attempt, sheet_write, ...),
+    its duration and free-form attributes, tagged with the run it belongs to.
+    The latest max_spans spans are kept in memory for the Performance page,
+    optionally appended to a JSON-lines file as they are recorded, and folded
+    into process-lifetime counters that are exported in the Prometheus text format.
+    """
+
+    def __init__(self, max_spans=None, jsonl_path=None):
+        self.max_spans = max_spans or TELEMETRY_CONFIG["max_spans"]
+        self.jsonl_path = jsonl_path
+        self.runs = {}
+        self.last_run_id = None
+        self._spans = deque(maxlen=self.max_spans)
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def start_run(self, label):
+        """Starts a run and makes it current for this thread and the tasks it starts."""
+        run_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self.runs[run_id] = {"run_id": run_id, "label": label, "started_at": time.time(), "duration_s": None}
+            self.last_run_id = run_id
+            # Only the most recent runs are listed; their spans age out of the deque anyway.
+            while len(self.runs) > 50:
+                self.runs.pop(next(iter(self.runs)))
+        _current_run.set(run_id)
+        return run_id
+
+    def end_run(self, run_id):
+        with self._lock:
+            run = self.runs.get(run_id)
+            if run:
+                run["duration_s"] = round(time.time() - run["started_at"], 4)
+
+    def current_run_id(self):
+        return _current_run.get() or self.last_run_id
+
+    def record(self, stage, duration_s=0.0, **attrs):
+        """Records a finished span; duration_s is 0 for point events such as a model fallback."""
+        span = {
+            "run_id": self.current_run_id(),
+            "stage": stage,
+            "start": round(time.time() - duration_s, 4),
+            "duration_s": round(duration_s, 4),
+            "status": "ok",
+            **attrs,
+        }
+        self.ingest(span)
+        return span
+
+    def ingest(self, span):
+        with self._lock:
+            self._spans.append(span)
+            self._count(span)
+            if self.jsonl_path:
+                if self._file is None:
+                    self._file = open(self.jsonl_path, "a", encoding="utf-8")
+                self._file.write(json.dumps(span, default=str) + "\n")
+                self._file.flush()
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        """
+        Times the block as one span. The yielded dict is recorded as the span's
+        attributes, so the block can add results such as token counts; an
+        exception marks the span as an error (or cancelled) and is re-raised.
+        """
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs.setdefault("status", "cancelled" if isinstance(e, (asyncio.CancelledError, GeneratorExit)) else "error")
+            if attrs["status"] == "error":
+                attrs.setdefault("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - started, **attrs)
+
+    def _count(self, span):
+        def add(name, labels, value):
+            key = (name, tuple(sorted(labels.items())))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+        stage, status = span["stage"], span.get("status", "ok")
+        add("compliance_stage_spans_total", {"stage": stage, "status": status}, 1)
+        add("compliance_stage_seconds_total", {"stage": stage}, span.get("duration_s") or 0.0)
+        if stage == "llm_attempt":
+            model = span.get("model", "unknown")
+            add("compliance_llm_requests_total", {"model": model, "status": status}, 1)
+            for kind in ("prompt", "completion"):
+                if span.get(f"{kind}_tokens"):
+                    add("compliance_llm_tokens_total", {"model": model, "kind": kind}, span[f"{kind}_tokens"])
+        elif stage == "llm_fallback":
+            add("compliance_llm_fallbacks_total", {"model": span.get("model", "unknown")}, 1)
+        elif stage == "hedge":
+            model = span.get("model", "unknown")
+            add("compliance_llm_hedges_total", {"model": model, "winner": span.get("winner") or "none"}, 1)
+            add("compliance_llm_hedge_saved_seconds_total", {"model": model}, span.get("saved_s") or 0.0)
+
+    def spans(self, run_id=None, stage=None, since=None):
+        with self._lock:
+            spans = list(self._spans)
+        return [
+            span for span in spans
+            if (run_id is None or span["run_id"] == run_id)
+            and (stage is None or span["stage"] == stage)
+            and (since is None or span["start"] >= since)
+        ]
+
+    def to_jsonl(self, run_id=None):
+        return "".join(json.dumps(span, default=str) + "\n" for span in self.spans(run_id))
+
+    def prometheus_text(self):
+        """Process-lifetime counters in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            label_text = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels)
+            lines.append(f"{name}{{{label_text}}} {round(value, 4)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the counters for a node_exporter textfile collector."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+def stage_summary(spans):
+    """Span count, total, mean and p95 duration per stage, slowest stage first."""
+    durations = {}
+    for span in spans:
+        durations.setdefault(span["stage"], []).append(span.get("duration_s") or 0.0)
+    summary = []
+    for stage, values in durations.items():
+        values = np.asarray(values)
+        summary.append({
+            "stage": stage,
+            "spans": len(values),
+            "total_s": round(float(values.sum()), 4),
+            "mean_s": round(float(values.mean()), 4),
+            "p95_s": round(float(np.percentile(values, 95)), 4),
+        })
+    return sorted(summary, key=lambda row: row["total_s"], reverse=True)
+
+
+def get_telemetry():
+    global _telemetry
+    if _telemetry is None:
+        with _telemetry_lock:
+            if _telemetry is None:
+                _telemetry = Telemetry(jsonl_path=TELEMETRY_CONFIG["jsonl_path"] or None)
+    return _telemetry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize spans exported as JSON lines.")
+    parser.add_argument("path", help="JSON-lines file written with TELEMETRY_JSONL_PATH.")
+    parser.add_argument("--run", help="Only this run ID.")
+    parser.add_argument("--prometheus", action="store_true", help="Print the spans as Prometheus counters.")
+    args = parser.parse_args()
+
+    telemetry = Telemetry(max_spans=10 ** 7)
+    with open(args.path, encoding="utf-8") as f:
+        for line in f:
+            span = json.loads(line)
+            if not args.run or span.get("run_id") == args.run:
+                telemetry.ingest(span)
+    if args.prometheus:
+        print(telemetry.prometheus_text(), end="")
+        return
+    for row in stage_summary(telemetry.spans()):
+        print(f"{row['stage']}: {row['spans']} spans, {row['total_s']}s total, "
+              f"{row['mean_s']}s mean, {row['p95_s']}s p95")
+
+
+if __name__ == "__main__":
+    main()
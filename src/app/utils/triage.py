@@ -0,0 +1,184 @@
+# triage.py
+import re
+import threading
+import numpy as np
+from .config import TRIAGE_CONFIG
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+# Session counters: chunks answered locally, by reason.
+_stats = {}
+_stats_lock = threading.Lock()
+
+# Any of these keeps a chunk on the LLM path, however short or boilerplate it looks.
+REGULATORY_PATTERN = re.compile(
+    r"\b(gdpr|hipaa|ccpa|data|personal information|privacy|phi|health|medical|patient|confidential\w*|"
+    r"liabilit\w*|liable|indemn\w*|breach\w*|secur\w*|consent|retention|retain|encrypt\w*|audit\w*|"
+    r"complian\w*|comply|regulat\w*|laws?|jurisdiction|warrant\w*|terminat\w*|damages|penalt\w*|"
+    r"(sub-?)?processors?|controllers?|third part(y|ies)|disclos\w*|notif\w*)\b",
+    re.IGNORECASE,
+)
+
+# A modal or obligation verb means the chunk binds someone; such chunks always go to the LLM.
+OBLIGATION_PATTERN = re.compile(
+    r"\b(shall|may|must|will|should|agrees?|agreed|waives?|waived|waiver|undertakes?|covenants?|"
+    r"warrants?|represents?|acknowledges?|releases?|indemnif\w*|prohibit\w*|restrict\w*|non-?compet\w*|"
+    r"non-?solicit\w*)\b",
+    re.IGNORECASE,
+)
+# Quantities (amounts, durations) in a short all-caps or title-case line make it a clause, not a heading.
+QUANTITY_PATTERN = re.compile(
+    r"\d|\b(one|two|three|four|five|six|seven|eight|nine|ten|twelve|twenty|thirty|hundred|thousand|million)\b",
+    re.IGNORECASE,
+)
+
+SIGNATURE_PATTERN = re.compile(
+    r"in witness whereof|\bsignature\b|authorized signatory|^\s*(by|name|title|date|its|signed)\s*:",
+    re.IGNORECASE | re.MULTILINE,
+)
+ADDRESS_PATTERN = re.compile(
+    r"\b(street|st\.|avenue|ave\.|suite|road|rd\.|boulevard|blvd\.|floor|p\.?\s?o\.?\s?box)\b.*\b\d{5}(-\d{4})?\b",
+    re.IGNORECASE,
+)
+PAGE_FURNITURE_PATTERN = re.compile(
+    r"^\s*(page \d+( of \d+)?|\d+|exhibit [a-z0-9]+|schedule [a-z0-9]+|this page intentionally left blank\.?)\s*$",
+    re.IGNORECASE,
+)
+HEADING_PATTERN = re.compile(
+    r"^\s*((article|section|clause|schedule|exhibit|part)\b|\d+(\.\d+)*\.?\s)",
+    re.IGNORECASE,
+)
+# Section numbering ("Article 4.", "7.2", "Section IV") skipped before looking for quantities in a heading.
+NUMBERING_PATTERN = re.compile(
+    r"^\s*((article|section|clause|schedule|exhibit|part)\s+)?(\d+(\.\d+)*|[ivxlc]+\b|[a-z]\b)?[.):]?\s+",
+    re.IGNORECASE,
+)
+
+# Short labelled examples for the optional nearest-centroid classifier.
+REGULATORY_EXAMPLES = [
+    "The processor shall notify the controller without undue delay after becoming aware of a personal data breach.",
+    "Protected health information may only be used or disclosed as permitted by this agreement.",
+    "Each party shall keep the other party's confidential information secret and use it only for this agreement.",
+    "The supplier's total liability under this agreement shall not exceed the fees paid in the prior twelve months.",
+    "Customer data shall be encrypted at rest and in transit and deleted on termination.",
+    "The vendor shall indemnify the company against all claims arising from its breach of applicable law.",
+]
+NON_REGULATORY_EXAMPLES = [
+    "IN WITNESS WHEREOF, the parties have executed this agreement as of the date first written above.",
+    "By: ____________ Name: ____________ Title: ____________ Date: ____________",
+    "Article 4. Payment Terms",
+    "Acme Corporation, 100 Main Street, Suite 200, Springfield, IL 62701",
+    "This page intentionally left blank.",
+    "The headings in this agreement are for convenience only.",
+]
+
+
+def _is_address(text):
+    """Whether the chunk is mostly an address: the line holding street and ZIP code is at least half of it."""
+    match = ADDRESS_PATTERN.search(text)
+    if not match:
+        return False
+    line_start = text.rfind("\n", 0, match.start()) + 1
+    line_end = text.find("\n", match.end())
+    line = text[line_start:len(text) if line_end == -1 else line_end]
+    return len(line.split()) * 2 >= len(text.split())
+
+
+def _is_heading(text):
+    words = text.split()
+    if len(words) > 12 or text.endswith((".", ";", ",")):
+        return False
+    numbering = NUMBERING_PATTERN.match(text)
+    if QUANTITY_PATTERN.search(text[numbering.end() if numbering else 0:]):
+        return False
+    capitalized = sum(1 for word in words if word[:1].isupper())
+    return bool(text.isupper() or HEADING_PATTERN.match(text) or capitalized * 2 >= len(words))
+
+
+def has_regulatory_signal(text):
+    """True when a chunk names a regulation or states an obligation; such chunks always reach the LLM."""
+    return bool(REGULATORY_PATTERN.search(text) or OBLIGATION_PATTERN.search(text))
+
+
+def triage_reason(clause):
+    """
+    Returns why a chunk is clearly not a regulatory clause (signature block,
+    address, heading or page furniture), or None if it should go to the LLM.
+    Chunks with regulatory keywords or an obligation verb are never triaged.
+    Short chunks are not triaged for being short: the chunk normalizer already
+    merges fragments into their neighbours.
+    """
+    text = clause.strip()
+    if not text:
+        return "empty"
+    if has_regulatory_signal(text):
+        return None
+    if SIGNATURE_PATTERN.search(text):
+        return "signature block"
+    if _is_address(text):
+        return "address"
+    if PAGE_FURNITURE_PATTERN.match(text):
+        return "page furniture"
+    if _is_heading(text):
+        return "heading"
+    return None
+
+
+class CentroidClassifier:
+    """
+    Nearest-centroid classifier over clause embeddings. A chunk is called
+    non-regulatory when it is closer to the non-regulatory examples than to
+    the regulatory ones by at least `margin` (cosine).
+    """
+
+    def __init__(self, embeddings, margin):
+        self.margin = margin
+        regulatory = np.asarray(embeddings.embed_documents(REGULATORY_EXAMPLES), dtype=np.float32)
+        other = np.asarray(embeddings.embed_documents(NON_REGULATORY_EXAMPLES), dtype=np.float32)
+        self.centroids = np.vstack([regulatory.mean(axis=0), other.mean(axis=0)])
+        self.centroids /= np.linalg.norm(self.centroids, axis=1, keepdims=True)
+
+    def is_non_regulatory(self, vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        scores = (matrix / np.where(norms == 0, 1.0, norms)) @ self.centroids.T
+        return list(scores[:, 1] - scores[:, 0] >= self.margin)
+
+
+def get_triage_classifier():
+    """Returns the embedding classifier, or None unless TRIAGE_CONFIG enables it."""
+    global _classifier
+    if not TRIAGE_CONFIG["classifier"]:
+        return None
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                from .embedding_service import get_embedding_service
+                _classifier = CentroidClassifier(get_embedding_service(), TRIAGE_CONFIG["classifier_margin"])
+    return _classifier
+
+
+def triage_analysis(clause, reason):
+    """The Low / None analysis recorded for a chunk that skipped the LLM."""
+    return {
+        "regulation": "None",
+        "summary": f"Not a regulatory clause ({reason}); classified locally without an LLM call.",
+        "risk_level": "Low",
+        "risk_percent": "0%",
+        "key_clauses": "",
+        "ai_modified_clause": clause,
+        "ai_modified_risk_level": "Low",
+    }
+
+
+def record_triage(reason):
+    with _stats_lock:
+        _stats[reason] = _stats.get(reason, 0) + 1
+
+
+def triage_stats():
+    """Chunks triaged this session by reason; each one saved at least one LLM request."""
+    with _stats_lock:
+        by_reason = dict(_stats)
+    return {"llm_calls_saved": sum(by_reason.values()), "by_reason": by_reason}